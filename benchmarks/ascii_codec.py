@@ -0,0 +1,117 @@
+"""
+Per-message cost of AsciiEncoding before and after per-exchange codecs were precompiled. The "before" numbers are
+reproduced with the string helpers AsciiEncoding used to compose for every message, kept here as the baseline.
+
+    python -m benchmarks.ascii_codec
+"""
+from dataclasses import dataclass, fields, Field
+from typing import Collection, Dict, Mapping, Type
+import timeit
+from hardsync.encodings import AsciiEncoding
+from hardsync.interfaces import Exchange
+from hardsync.types import DecodedExchange, FieldNotFoundError, Stringable
+
+NUMBER = 100_000
+
+
+class MeasureVoltage(Exchange):
+    @dataclass
+    class Request:
+        channel: int
+        integration_time: float
+        averages: int
+
+    @dataclass
+    class Response:
+        voltage: float
+        current: float
+        overrange: int
+
+
+REQUEST_VALUES = {'channel': 3, 'integration_time': 0.25, 'averages': 16}
+RESPONSE = b'MeasureVoltageResponse(voltage=1.2345,current=0.0012,overrange=0)\n'
+
+
+def _encode_args(exchange: Type[Exchange], values: Mapping[str, Stringable | str]) -> str:
+    encoded_args = ''
+    for key, val in values.items():
+        encoded_args += f'{key}{AsciiEncoding.argument_assigner}{val}{AsciiEncoding.argument_delimiter}'
+    encoded_args = encoded_args.removesuffix(AsciiEncoding.argument_delimiter)
+    return encoded_args
+
+
+def _arg_string(contents: str) -> str:
+    start = contents.index(AsciiEncoding.argument_beginner)
+    stop = contents.index(AsciiEncoding.argument_ender)
+    return contents[start+1:stop]
+
+
+def _decode_args(exchange: Type[Exchange], contents: str, request=True) -> Dict[str, Stringable | str]:
+    inner_string = _arg_string(contents=contents)
+    args = inner_string.split(AsciiEncoding.argument_delimiter) if inner_string else []
+    values = {}
+    if request:
+        decode_fields = fields(exchange.Request)
+    else:
+        decode_fields = fields(exchange.Response)
+
+    for arg in args:
+        key, value = arg.split(AsciiEncoding.argument_assigner)
+        target_type = _lookup_field_type(name=key, available_fields=decode_fields)
+        values[key] = target_type(value)
+
+    return values
+
+
+def _lookup_field_type(name: str, available_fields: Collection[Field]):
+    for field in available_fields:
+        if field.name == name:
+            return field.type
+    raise FieldNotFoundError(f'Could not find field {name} in exchange')
+
+
+def _decode_name(contents: str) -> str:
+    end = contents.index(AsciiEncoding.argument_beginner)
+    return contents[:end]
+
+
+def uncompiled_encode(exchange, values, is_request=True) -> bytes:
+    encoded_args = _encode_args(exchange=exchange, values=values)
+    r = 'Request' if is_request else 'Response'
+    encoded_string = exchange.identifier() + r + '(' + encoded_args + ')' + AsciiEncoding.exchange_terminator
+    return encoded_string.encode('ascii')
+
+
+def uncompiled_decode(exchange, contents: bytes) -> DecodedExchange:
+    decoded_str = contents.decode('ascii')
+    decoded_name = _decode_name(contents=decoded_str)
+    is_request = not decoded_name.endswith('Response')
+    decoded_args = _decode_args(contents=decoded_str, exchange=exchange, request=is_request)
+    return DecodedExchange(name=decoded_name, values=decoded_args)
+
+
+def per_message_us(statement) -> float:
+    return min(timeit.repeat(statement, number=NUMBER, repeat=5)) / NUMBER * 1e6
+
+
+def main():
+    assert uncompiled_decode(MeasureVoltage, RESPONSE) == AsciiEncoding.decode(MeasureVoltage, RESPONSE)
+    assert uncompiled_encode(MeasureVoltage, REQUEST_VALUES) == AsciiEncoding.encode(MeasureVoltage, REQUEST_VALUES)
+
+    results = {
+        'encode': (
+            per_message_us(lambda: uncompiled_encode(MeasureVoltage, REQUEST_VALUES)),
+            per_message_us(lambda: AsciiEncoding.encode(MeasureVoltage, REQUEST_VALUES)),
+        ),
+        'decode': (
+            per_message_us(lambda: uncompiled_decode(MeasureVoltage, RESPONSE)),
+            per_message_us(lambda: AsciiEncoding.decode(MeasureVoltage, RESPONSE)),
+        ),
+    }
+    print(f"{'':8}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, (before, after) in results.items():
+        print(f"{name:8}{before:14.2f}{after:14.2f}{before / after:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
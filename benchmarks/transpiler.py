@@ -0,0 +1,57 @@
+"""
+Time to transpile a large C++ input to Arduino before and after the rule set was compiled into a single scan. The
+input is the cpp/src sources concatenated COPIES times. The "before" numbers are reproduced by applying each rule in
+turn and splicing the text at every match, as the transpiler used to.
+
+    python -m benchmarks.transpiler
+"""
+from pathlib import Path
+import re
+import timeit
+from hardsync.transpiler import (
+    TARGETS, Targets, transpile, template_to_regex, var_names_from_template, populate_template,
+)
+
+COPIES = 100
+SOURCES_DIR = Path(__file__).resolve().parent.parent / 'cpp' / 'src'
+
+
+def uncompiled_transpile_template(template: str, replacement_template: str, input_text: str) -> str:
+    regex = template_to_regex(template)
+    matches = re.finditer(pattern=regex, string=input_text)
+    var_names = var_names_from_template(template)
+
+    modified_text = input_text
+    for match in reversed(list(matches)):
+        replacements = {var: match.group(var) for var in var_names}
+        replacement_string = populate_template(replacement_template, replacements=replacements)
+        modified_text = modified_text[0:match.start()] + replacement_string + modified_text[match.end():]
+    return modified_text
+
+
+def uncompiled_transpile(input_text: str, template_mapping) -> str:
+    modified_text = input_text
+    for template, replacement_template in template_mapping.items():
+        modified_text = uncompiled_transpile_template(template, replacement_template, modified_text)
+    return modified_text
+
+
+def load_sources() -> str:
+    paths = sorted(SOURCES_DIR.glob('*.cpp')) + sorted(SOURCES_DIR.glob('*.h'))
+    return ''.join(path.read_text() for path in paths)
+
+
+def main():
+    mapping = TARGETS[Targets.ARDUINO]
+    input_text = load_sources() * COPIES
+    assert uncompiled_transpile(input_text, mapping) == transpile(input_text=input_text, template_mapping=mapping)
+
+    before = min(timeit.repeat(lambda: uncompiled_transpile(input_text, mapping), number=1, repeat=3))
+    after = min(timeit.repeat(lambda: transpile(input_text=input_text, template_mapping=mapping), number=1, repeat=3))
+    print(f"input: {len(input_text) / 1e6:.1f} MB ({COPIES} copies of {SOURCES_DIR.name})")
+    print(f"{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+    print(f"{before * 1e3:14.1f}{after * 1e3:14.1f}{before / after:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
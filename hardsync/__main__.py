@@ -2,16 +2,20 @@ import platform
 import click
 import os
 import logging
-import configparser
 from pathlib import Path
 import hardsync
 from hardsync.generators.python import generate as generate_python
 from hardsync.generators.arduino import generate as generate_arduino
 from hardsync.generators.common import write, preface_string, Language
 from hardsync.defaults import DEFAULT_ENCODING, DEFAULT_CHANNEL
-from hardsync.discovery import pyserial_discover
-from hardsync.dynamics import apply_defaults
+from hardsync.discovery import pyserial_discover, DISCOVERY_BAUD_RATES, MULTI_BAUD_TIMEOUT
+from hardsync.config import DeviceCache
+from hardsync.dynamics import apply_defaults, get_exchanges
+from hardsync.manifest import (
+    Manifest, contract_fingerprint, contract_hash, content_digest, load_manifest, save_manifest, is_up_to_date,
+)
 from hardsync.utils import dump as dump_info, wrap_assertion_error
+from hardsync.types import PopulatedFile
 import importlib
 import importlib.util
 from types import ModuleType
@@ -37,7 +41,13 @@ def load_contract(contract_path: Path) -> ModuleType:
 
 
 def generate(contract: ModuleType, output_dir: Path, force=False):
+    fingerprint = contract_fingerprint(contract)
+    if not force and is_up_to_date(output_dir, manifest=load_manifest(output_dir), fingerprint=fingerprint):
+        logger.info(f"Generated files in {output_dir} are up to date with the contract. Nothing to do.")
+        return
+
     type_mapping = contract.TypeMapping
+    manifest = Manifest(fingerprint=fingerprint, files={}, main_files=[])
 
     arduino_files = generate_arduino(contract=contract, type_mapping=type_mapping)
     arduino_output_dir = output_dir / 'firmware'
@@ -48,12 +58,23 @@ def generate(contract: ModuleType, output_dir: Path, force=False):
     for file in arduino_files:
         preface = preface_string(language=Language.ARDUINO)
         write(file=file, dirname=arduino_output_dir, force=force, preface=preface)
+        record_file(manifest, path=Path('firmware') / file.filename, file=file, preface=preface)
 
     python_files = generate_python(contract=contract)
 
     for file in python_files:
         preface = preface_string(language=Language.PYTHON)
         write(file=file, dirname=output_dir, force=force, preface=preface)
+        record_file(manifest, path=Path(file.filename), file=file, preface=preface)
+
+    save_manifest(output_dir, manifest)
+
+
+def record_file(manifest: Manifest, path: Path, file: PopulatedFile, preface: str):
+    if file.is_main:
+        manifest.main_files.append(path.as_posix())
+    else:
+        manifest.files[path.as_posix()] = content_digest(preface + file.content)
 
 
 @click.group(invoke_without_command=True)
@@ -94,19 +115,45 @@ def dump():
     click.echo(info)
 
 
-@main.command(help="Automatic device discovery. If using custom encoding, make sure to run hardsync cconfig first.")
-def discover():
-    parser = configparser.ConfigParser()
-    parser.read('hardsync.ini')
-    try:
-        preferred_serial = parser['DEFAULT']['device_serial']
-    except KeyError:
-        preferred_serial = ''
+@main.command(help="Automatic device discovery. Pass the device's contract if it uses a custom encoding or channel.")
+@click.option(
+    '--contract',
+    type=str,
+    required=False,
+    help="path to the contract the device's firmware was generated from. Without one, every baud rate is tried."
+)
+def discover(contract: str):
+    device_cache = DeviceCache()
+    preferred_serial = device_cache.preferred_serial
+
+    if contract:
+        contract_module = load_contract(contract_path=Path(contract))
+        serial_numbers = pyserial_discover(
+            encoding=contract_module.Encoding,
+            channel=contract_module.Channel,
+            preferred_serial=preferred_serial,
+            device_cache=device_cache,
+            contract_hash=contract_hash(contract_module),
+            capabilities=[exchange.identifier() for exchange in get_exchanges(contract_module)],
+        )
+    else:
+        # Firmware generated without a custom encoding speaks the default one, at whatever rate its contract set
+        serial_numbers = pyserial_discover(
+            encoding=DEFAULT_ENCODING,
+            channel=DEFAULT_CHANNEL,
+            preferred_serial=preferred_serial,
+            device_cache=device_cache,
+            baud_rates=DISCOVERY_BAUD_RATES,
+            timeout=MULTI_BAUD_TIMEOUT,
+        )
+    for serial_number in serial_numbers:
+        device = device_cache.get(serial_number)
+        if device is not None:
+            click.echo(
+                f"{serial_number}: {device.port} at {device.baud_rate} baud, "
+                f"contract {device.contract_hash or 'unknown'}, hardsync {device.hardsync_version or 'unknown'}"
+            )
 
-    # HACK. THIS REQUIRES CONTRACT TO BE SPECIFIED AND PARSED TO GET THE ENCODING
-    # AND WILL NOT WORK IF THE USER IS USING A CUSTOM OR NON-ASCII ENCODING
-    channel = DEFAULT_CHANNEL
-    serial_numbers = pyserial_discover(encoding=DEFAULT_ENCODING, channel=channel, preferred_serial=preferred_serial)
     if len(serial_numbers) == 1:
         if serial_numbers[0] != preferred_serial:
             click.echo("")
@@ -121,12 +168,9 @@ def discover():
 @main.command(help="Configure your hardsync project with device and system-specific information")
 @click.option('--device-serial', type=str, required=False)
 def config(device_serial: str):
-    parser = configparser.ConfigParser()
-    parser['DEFAULT'] = {'device_serial': device_serial}
-
     logger.info("Writing hardsync.ini file...")
-    with open('hardsync.ini', 'w') as file:
-        parser.write(file)
+    # Devices remembered by discovery are kept, so the next run can still go straight to their ports
+    DeviceCache().set_preferred_serial(device_serial or '')
 
     logger.info("Done.")
 
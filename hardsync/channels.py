@@ -1,32 +1,373 @@
 from hardsync.interfaces import Channel
+from hardsync.config import DeviceCache, KnownDevice
 from hardsync.types import BaudRateT
 from contextlib import contextmanager
-from serial import Serial
-from serial.tools import list_ports
+from typing import Callable, Optional, Dict, Iterable, List, NamedTuple, Tuple
+from asyncio import StreamReader, StreamWriter
+from serial import Serial, SerialException
+from serial.tools import list_ports, list_ports_linux
+import serial_asyncio
+import logging
+import os
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+PORT_ADDED = 'added'
+PORT_REMOVED = 'removed'
+# How often a PortWatcher checks for devices being plugged in or removed
+DEFAULT_WATCH_INTERVAL = 0.5
+# Directories whose listings change whenever a serial device appears or disappears. Listing them is far cheaper than
+# list_ports.comports(), which reads a dozen sysfs attributes for every tty.
+if sys.platform.startswith('linux'):
+    WATCHED_DIRECTORIES = ('/dev/serial/by-id', '/sys/class/tty')
+elif sys.platform == 'darwin':
+    WATCHED_DIRECTORIES = ('/dev',)
+else:
+    WATCHED_DIRECTORIES = ()
+
+
+class PortEvent(NamedTuple):
+    kind: str
+    serial_number: str
+    device: str
+
+
+PortCallback = Callable[[PortEvent], None]
+
+
+class PortIndex:
+    """
+    Process-wide map of device serial numbers to port device paths, shared by every channel. Scanning ports with
+    list_ports.comports() walks sysfs/udev and is slow on hosts with many adapters, so we only rescan when a lookup
+    misses, or the cached device path has disappeared or now belongs to another device. While a PortWatcher keeps the
+    map current, misses are trusted and never rescan.
+
+    Subscribers are told whenever a refresh finds that a device appeared, disappeared or moved to another port.
+    """
+    def __init__(self):
+        self._devices: Dict[str, str] = {}
+        self._ports: List = []
+        self._subscribers: List[PortCallback] = []
+        self._lock = threading.Lock()
+        self.watched = False
+
+    def refresh(self, ports: Optional[Iterable] = None) -> List[PortEvent]:
+        if ports is None:
+            ports = list_ports.comports()
+        ports = list(ports)
+        devices = {port.serial_number: port.device for port in ports if port.serial_number}
+        with self._lock:
+            previous = self._devices
+            self._devices = devices
+            self._ports = ports
+            subscribers = list(self._subscribers)
+
+        events = _port_events(previous, devices)
+        for event in events:
+            for callback in subscribers:
+                try:
+                    callback(event)
+                except Exception:
+                    logger.exception(f"Port event callback failed for {event}")
+        return events
+
+    def invalidate(self, serial_number: Optional[str] = None) -> None:
+        with self._lock:
+            if serial_number is None:
+                self._devices = {}
+            else:
+                self._devices.pop(serial_number, None)
+
+    def lookup(self, serial_number: str) -> Optional[str]:
+        device = self._devices.get(serial_number)
+        if device is not None and _device_present(device, serial_number):
+            return device
+        if self.watched and device is None:
+            return None
+
+        self.refresh()
+        return self._devices.get(serial_number)
+
+    def ports(self) -> List:
+        """
+        The ports found by the last refresh, as returned by list_ports.comports().
+        """
+        with self._lock:
+            return list(self._ports)
+
+    def subscribe(self, callback: PortCallback) -> None:
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: PortCallback) -> None:
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+
+def _port_events(previous: Dict[str, str], current: Dict[str, str]) -> List[PortEvent]:
+    events = []
+    for serial_number, device in previous.items():
+        if current.get(serial_number) != device:
+            events.append(PortEvent(kind=PORT_REMOVED, serial_number=serial_number, device=device))
+    for serial_number, device in current.items():
+        if previous.get(serial_number) != device:
+            events.append(PortEvent(kind=PORT_ADDED, serial_number=serial_number, device=device))
+    return events
+
+
+def _device_present(device: str, serial_number: Optional[str] = None) -> bool:
+    # Windows COM ports are not filesystem paths, so we can only cheaply check presence on posix systems.
+    if os.name != 'posix':
+        return True
+    if not os.path.exists(device):
+        return False
+    if not serial_number:
+        return True
+    # Another device may have been enumerated on the same path since serial_number was last seen there
+    found_serial = _serial_number_at(device)
+    return found_serial is None or found_serial == serial_number
+
+
+def _serial_number_at(device: str) -> Optional[str]:
+    """
+    Serial number of the USB device behind a port, read straight from sysfs, or None where it cannot be read cheaply.
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        return list_ports_linux.SysFS(device).serial_number
+    except (OSError, ValueError):
+        return None
+
+
+def _port_snapshot() -> Optional[Tuple]:
+    """
+    Listings of WATCHED_DIRECTORIES, or None where there is no cheap way to tell that ports have changed.
+    """
+    if not WATCHED_DIRECTORIES:
+        return None
+    snapshot = []
+    for directory in WATCHED_DIRECTORIES:
+        try:
+            snapshot.append(tuple(sorted(os.listdir(directory))))
+        except OSError:
+            # /dev/serial/by-id only exists while at least one USB serial device is plugged in
+            snapshot.append(None)
+    return tuple(snapshot)
+
+
+class PortWatcher:
+    """
+    Background thread keeping a PortIndex current as devices are plugged in and removed, so that channels resolve
+    ports without rescanning and persistent channels hear about unplugged devices straight away. Each poll only lists
+    a couple of directories, and ports are rescanned when those listings change. Where there are no such directories
+    (Windows), list_ports.comports() itself is polled.
+    """
+    def __init__(self, index: PortIndex, interval: float = DEFAULT_WATCH_INTERVAL):
+        self.index = index
+        self.interval = interval
+        self._snapshot: Optional[Tuple] = None
+        self._scanned = False
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def poll(self) -> List[PortEvent]:
+        """
+        Rescans ports if they may have changed since the last poll, and returns what changed.
+        """
+        # Take the snapshot before scanning, so a device plugged in during the scan is picked up by the next poll
+        snapshot = _port_snapshot()
+        if self._scanned and snapshot is not None and snapshot == self._snapshot:
+            return []
+        self._snapshot = snapshot
+        self._scanned = True
+        return self.index.refresh()
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self.poll()
+        self.index.watched = True
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='hardsync-port-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.index.watched = False
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Failed to poll serial ports")
+
+    def __enter__(self) -> 'PortWatcher':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+PORT_INDEX = PortIndex()
+# Not started by default. Long-running processes that keep persistent channels open call PORT_WATCHER.start().
+PORT_WATCHER = PortWatcher(PORT_INDEX)
 
 
 class SerialChannel(Channel):
-    def __init__(self, baud_rate: BaudRateT, channel_identifier: str):
+    def __init__(
+            self,
+            baud_rate: BaudRateT,
+            channel_identifier: str,
+            persistent: bool = False,
+            device_cache: Optional[DeviceCache] = None,
+            contract_hash: str = '',
+    ):
         super().__init__(baud_rate=baud_rate)
         self.channel_identifier = channel_identifier
+        self.persistent = persistent
+        # Where devices were last seen. Without one, every new process scans the host's ports to find the device.
+        self.device_cache = device_cache
+        # The contract the device must run. With no device configured, one discovery found running it is used.
+        self.contract_hash = contract_hash
+        self._serial: Optional[Serial] = None
 
     @staticmethod
     def _find_port_by_serial(serial_number: str) -> str:
-        for port in list_ports.comports():
-            if port.serial_number == serial_number:
-                return port.device
+        device = PORT_INDEX.lookup(serial_number)
+        if device is not None:
+            return device
         raise DeviceNotFoundError(f"Could not find device with serial number {serial_number}.")
 
+    @property
+    def serial_number(self) -> str:
+        # An empty channel_identifier means the device configured with `hardsync config`
+        if self.channel_identifier or self.device_cache is None:
+            return self.channel_identifier
+        preferred_serial = self.device_cache.preferred_serial
+        if preferred_serial:
+            return preferred_serial
+        compatible = self.device_cache.compatible(self.contract_hash)
+        return compatible[0].serial_number if compatible else ''
+
+    def _known_port(self) -> Optional[str]:
+        if self.device_cache is None:
+            return None
+        known = self.device_cache.get(self.serial_number)
+        # After a replug the path the device was last seen on often belongs to another board
+        if known is not None and _device_present(known.port, known.serial_number):
+            return known.port
+        return None
+
+    def _resolve_port(self) -> str:
+        return self._known_port() or self._find_port_by_serial(serial_number=self.serial_number)
+
+    def _remember_port(self, port: str) -> None:
+        if self.device_cache is not None and self.serial_number:
+            device = KnownDevice(serial_number=self.serial_number, port=port, baud_rate=self.baud_rate)
+            self.device_cache.remember(device)
+
+    def _forget_port(self) -> None:
+        if self.device_cache is not None:
+            self.device_cache.forget(self.serial_number)
+        PORT_INDEX.invalidate(self.serial_number)
+
+    def _open_serial(self) -> Serial:
+        known_port = self._known_port()
+        if known_port is not None:
+            try:
+                return Serial(port=known_port, baudrate=self.baud_rate)
+            except SerialException:
+                # The device has moved since it was last seen, so fall back to scanning for it
+                self._forget_port()
+
+        port = self._find_port_by_serial(serial_number=self.serial_number)
+        ser = Serial(port=port, baudrate=self.baud_rate)
+        self._remember_port(port)
+        return ser
+
+    @property
+    def is_connected(self) -> bool:
+        return self._serial is not None and self._serial.is_open
+
+    def connect(self) -> Serial:
+        """
+        Opens the underlying port if it is not already open and returns it. Opening most Arduinos toggles DTR and
+        resets the board, so persistent channels hold on to this handle until close() is called.
+        """
+        if not self.is_connected:
+            self._serial = self._open_serial()
+            PORT_INDEX.subscribe(self._on_port_event)
+        return self._serial
+
+    def close(self) -> None:
+        PORT_INDEX.unsubscribe(self._on_port_event)
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+    def _on_port_event(self, event: PortEvent) -> None:
+        ser = self._serial
+        if event.kind != PORT_REMOVED or event.serial_number != self.serial_number or ser is None:
+            return
+        if ser.port != event.device:
+            return
+        # Closing the dead handle makes a read blocked on it fail now rather than at its timeout, and the next
+        # connect() opens the port the device reappears on
+        logger.info(f"Device {event.serial_number} was removed from {event.device}")
+        ser.close()
+
     @contextmanager
     def open(self) -> Serial:
+        if self.persistent or self.is_connected:
+            ser = self.connect()
+            try:
+                yield ser
+            except SerialException:
+                # The handle is dead (device unplugged or reset). Drop it so the next open() reconnects.
+                self.close()
+                self._forget_port()
+                raise
+            return
+
         ser = None
         try:
-            port = self._find_port_by_serial(serial_number=self.channel_identifier)
-            ser = Serial(port=port, baudrate=self.baud_rate)
+            ser = self._open_serial()
             yield ser
         finally:
             ser.close() if ser else None
 
+    async def open_async(self) -> Tuple[StreamReader, StreamWriter]:
+        """
+        Opens a non-blocking connection whose reads and writes are driven by the event loop's file-descriptor
+        readiness. The caller owns the returned streams and closes the writer when done.
+        """
+        port = self._resolve_port()
+        streams = await serial_asyncio.open_serial_connection(url=port, baudrate=self.baud_rate)
+        self._remember_port(port)
+        return streams
+
+    def __enter__(self) -> 'SerialChannel':
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
 
 class DeviceNotFoundError(Exception):
     pass
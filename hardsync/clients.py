@@ -1,9 +1,21 @@
 import logging
 from dataclasses import is_dataclass, dataclass
-from typing import TypeVar, Type, Mapping, Dict, Any
-from hardsync.interfaces import Channel, Exchange, Encoding, Client
+from typing import (
+    TypeVar, Type, Mapping, Dict, Any, Sequence, Tuple, List, Optional, Iterator, AsyncIterator, Iterable
+)
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import queue
+import threading
+import time
+from hardsync.interfaces import Channel, Exchange, Encoding, Client, StreamDecoder
 from hardsync.types import ReceivedErrorResponse, DecodedExchange
-from contextlib import contextmanager
+from hardsync.channels import SerialChannel
+from hardsync.columns import ResponseColumns, collect
+from hardsync.dynamics import stream_start_exchange, stream_stop_exchange, STREAM_PERIOD_FIELD
+from contextlib import contextmanager, asynccontextmanager
+from serial import SerialException
+import asyncio
 
 T = TypeVar('T')
 
@@ -14,6 +26,29 @@ class DeviceNotFoundError(Exception):
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The hardware serial RX buffer on AVR Arduinos (Uno, Nano, Mega) is 64 bytes. Bytes beyond this that arrive before
+# the sketch reads them are silently dropped, so pipelined requests must never have more than this in flight.
+DEFAULT_RX_BUFFER_SIZE = 64
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_STREAM_BUFFER_SIZE = 4096
+DEFAULT_STREAM_STOP_TIMEOUT = 1.0
+DEFAULT_STREAM_READ_SIZE = 4096
+
+
+def stream_start_values(exchange: Type[Exchange], request_values: Mapping, rate_hz: float) -> Dict[str, Any]:
+    if not exchange.streaming:
+        raise ValueError(f"{exchange.identifier()} is not a streaming exchange")
+    if rate_hz <= 0:
+        raise ValueError(f"rate_hz must be positive, got {rate_hz}")
+    return {STREAM_PERIOD_FIELD: round(1_000_000 / rate_hz), **request_values}
+
+
+def terminator_bytes(encoding: Type[Encoding]) -> bytes:
+    terminator = encoding.exchange_terminator
+    if isinstance(terminator, str):
+        terminator = terminator.encode('ascii')
+    return terminator
+
 
 @dataclass
 class BaseClient(Client):
@@ -24,21 +59,139 @@ class BaseClient(Client):
     """
     channel: Channel
     encoding: Type[Encoding]
+    reconnect_attempts: int = 1
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+    rx_buffer_size: int = DEFAULT_RX_BUFFER_SIZE
 
     def request(self, request_values: Mapping, exchange: Type[Exchange]) -> DecodedExchange:
         encoded_representation = self.encoding.encode(exchange=exchange, values=request_values, is_request=True)
 
+        attempt = 0
+        while True:
+            try:
+                with self.channel.open() as ch:
+                    return self._transact(ch=ch, encoded_representation=encoded_representation, exchange=exchange)
+            except SerialException as e:
+                if attempt >= self.reconnect_attempts:
+                    raise
+                attempt += 1
+                logger.warning(f"Lost connection to device ({e}). Reconnecting, attempt {attempt}...")
+
+    def request_pipelined(
+            self,
+            requests: Sequence[Tuple[Type[Exchange], Mapping]],
+            max_in_flight: Optional[int] = None,
+    ) -> List[DecodedExchange]:
+        """
+        Writes requests back-to-back without waiting for each response, then matches the in-order responses to their
+        exchanges. At most max_in_flight requests, and at most rx_buffer_size bytes of requests, are outstanding at
+        once so the device receive buffer never overflows. A request larger than the buffer is sent on its own.
+        """
+        encoded_requests = [
+            (exchange, self.encoding.encode(exchange=exchange, values=values, is_request=True))
+            for exchange, values in requests
+        ]
+        return list(self._pipelined(encoded_requests=encoded_requests, max_in_flight=max_in_flight))
+
+    def request_columns(
+            self,
+            exchange: Type[Exchange],
+            request_values: Iterable[Mapping],
+            max_in_flight: Optional[int] = None,
+    ) -> ResponseColumns:
+        """
+        Pipelines one request per entry of request_values and collects the responses into columns as they arrive,
+        rather than holding on to a DecodedExchange per response.
+        """
+        encoded_requests = (
+            (exchange, self.encoding.encode(exchange=exchange, values=values, is_request=True))
+            for values in request_values
+        )
+        responses = self._pipelined(encoded_requests=encoded_requests, max_in_flight=max_in_flight)
+        return collect(responses, exchange=exchange)
+
+    def _pipelined(
+            self,
+            encoded_requests: Iterable[Tuple[Type[Exchange], bytes]],
+            max_in_flight: Optional[int] = None,
+    ) -> Iterator[DecodedExchange]:
+        if max_in_flight is None:
+            max_in_flight = self.max_in_flight
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight must be at least 1, got {max_in_flight}")
+
+        in_flight = deque()
+        in_flight_bytes = 0
+
         with self.channel.open() as ch:
-            ch.write(data=encoded_representation)
-            logger.info(f"Wrote: {encoded_representation}")
-            contents = ch.read_until(expected=self.encoding.exchange_terminator)
-            decoded_contents = self.encoding.decode(exchange=exchange, contents=contents)
-            logger.info(f"Received: {encoded_representation}")
+            for exchange, encoded_representation in encoded_requests:
+                while in_flight and (
+                        len(in_flight) >= max_in_flight or
+                        in_flight_bytes + len(encoded_representation) > self.rx_buffer_size
+                ):
+                    pending_exchange, pending_bytes = in_flight.popleft()
+                    in_flight_bytes -= pending_bytes
+                    yield self._read_response(ch=ch, exchange=pending_exchange)
+
+                ch.write(data=encoded_representation)
+                logger.info(f"Wrote: {encoded_representation}")
+                in_flight.append((exchange, len(encoded_representation)))
+                in_flight_bytes += len(encoded_representation)
+
+            while in_flight:
+                pending_exchange, _ = in_flight.popleft()
+                yield self._read_response(ch=ch, exchange=pending_exchange)
 
-            if decoded_contents.name == 'ErrorResponse':
-                logger.error(f"Received Error from device: {decoded_contents}")
+    @contextmanager
+    def stream(
+            self,
+            request_values: Mapping,
+            exchange: Type[Exchange],
+            rate_hz: float,
+            buffer_size: int = DEFAULT_STREAM_BUFFER_SIZE,
+    ) -> Iterator['SampleStream']:
+        """
+        Asks the device to send a streaming exchange continuously at rate_hz and yields an iterator over the decoded
+        samples. The stream is stopped, and the samples still in transit drained, when the context exits.
+        """
+        start_values = stream_start_values(exchange=exchange, request_values=request_values, rate_hz=rate_hz)
+        start_request = self.encoding.encode(exchange=stream_start_exchange(exchange), values=start_values)
+        stop_request = self.encoding.encode(exchange=stream_stop_exchange(exchange), values={})
+
+        with self.channel.open() as ch:
+            samples = SampleStream(ch=ch, exchange=exchange, encoding=self.encoding, buffer_size=buffer_size)
+            ch.write(data=start_request)
+            logger.info(f"Wrote: {start_request}")
+            try:
+                yield samples
+            finally:
+                ch.write(data=stop_request)
+                logger.info(f"Wrote: {stop_request}")
+                samples.close()
+
+    def _transact(self, ch, encoded_representation: bytes, exchange: Type[Exchange]) -> DecodedExchange:
+        ch.write(data=encoded_representation)
+        logger.info(f"Wrote: {encoded_representation}")
+        return self._read_response(ch=ch, exchange=exchange)
+
+    def _read_response(self, ch, exchange: Type[Exchange]) -> DecodedExchange:
+        contents = ch.read_until(expected=terminator_bytes(self.encoding))
+        decoded_contents = self.encoding.decode(exchange=exchange, contents=contents)
+        logger.info(f"Received: {contents}")
+
+        if decoded_contents.name == 'ErrorResponse':
+            logger.error(f"Received Error from device: {decoded_contents}")
+
+        return decoded_contents
 
-            return decoded_contents
+    def close(self) -> None:
+        self.channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
 
     # to be overriden by a wrapper.
     @contextmanager
@@ -46,3 +199,501 @@ class BaseClient(Client):
         yield self.channel.open()
 
 
+
+
+class SampleStream:
+    """
+    Iterator over the samples of a device-initiated stream. A background thread reads samples off the port into a
+    bounded buffer. If the consumer falls behind, the oldest samples are discarded and counted in `dropped`, so
+    memory stays bounded no matter how long the stream runs.
+    """
+    def __init__(
+            self,
+            ch,
+            exchange: Type[Exchange],
+            encoding: Type[Encoding],
+            buffer_size: int = DEFAULT_STREAM_BUFFER_SIZE,
+            poll_interval: float = 0.05,
+            stop_timeout: float = DEFAULT_STREAM_STOP_TIMEOUT,
+    ):
+        self.exchange = exchange
+        self.encoding = encoding
+        self.dropped = 0
+        self.acknowledged = False
+        self._ch = ch
+        self._samples = deque(maxlen=buffer_size)
+        self._available = threading.Condition()
+        self._finished = False
+        self._stop_deadline: Optional[float] = None
+        self._poll_interval = poll_interval
+        self._stop_timeout = stop_timeout
+        self._original_timeout = ch.timeout
+        ch.timeout = poll_interval
+        self._thread = threading.Thread(target=self._read_loop, name='hardsync-stream', daemon=True)
+        self._thread.start()
+
+    def _read_loop(self) -> None:
+        stop_name = stream_stop_exchange(self.exchange).identifier() + 'Response'
+        decoder = self.encoding.stream_decoder(exchange=self.exchange)
+        try:
+            while self._stop_deadline is None or time.monotonic() < self._stop_deadline:
+                # Take everything that has arrived in one read. When nothing has, block for up to a poll interval.
+                chunk = self._ch.read(self._ch.in_waiting or 1)
+                decoded = decoder.feed(chunk)
+                if not decoded:
+                    continue
+
+                with self._available:
+                    for decoded_contents in decoded:
+                        if decoded_contents.name == stop_name:
+                            self.acknowledged = True
+                            return
+                        if len(self._samples) == self._samples.maxlen:
+                            self.dropped += 1
+                        self._samples.append(decoded_contents)
+                    self._available.notify()
+            logger.warning(f"Device did not acknowledge stopping {self.exchange.identifier()} stream")
+        except Exception as e:
+            logger.error(f"Stream from device failed ({e})")
+        finally:
+            with self._available:
+                self._finished = True
+                self._available.notify_all()
+
+    def __iter__(self) -> 'SampleStream':
+        return self
+
+    def __next__(self) -> DecodedExchange:
+        with self._available:
+            self._available.wait_for(lambda: self._samples or self._finished)
+            if self._samples:
+                return self._samples.popleft()
+        raise StopIteration
+
+    def collect(self, limit: int) -> ResponseColumns:
+        """
+        Takes the next limit samples, or fewer if the stream ends, and collects them into columns.
+        """
+        return collect(self, exchange=self.exchange, limit=limit)
+
+    def close(self) -> None:
+        """
+        Waits until the device acknowledges the stop request, then restores the port. Call this only after the stop
+        request has been written.
+        """
+        self._stop_deadline = time.monotonic() + self._stop_timeout
+        self._thread.join()
+        if not self.acknowledged:
+            # Whatever is still in transit would be mistaken for the next response, so start afresh
+            self._ch.reset_input_buffer()
+        self._ch.timeout = self._original_timeout
+
+
+@dataclass
+class AsyncBaseClient(Client):
+    """
+    asyncio counterpart of BaseClient. Reads and writes are driven by the event loop's file-descriptor readiness,
+    so a single event loop can talk to many devices concurrently without a thread per device. The connection is
+    opened on the first request and held until close() is called.
+    """
+    channel: Channel
+    encoding: Type[Encoding]
+    reconnect_attempts: int = 1
+
+    def __post_init__(self):
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def request(self, request_values: Mapping, exchange: Type[Exchange]) -> DecodedExchange:
+        encoded_representation = self.encoding.encode(exchange=exchange, values=request_values, is_request=True)
+
+        # Responses carry no request identifier, so only one exchange may be on the wire at a time.
+        async with self._lock:
+            attempt = 0
+            while True:
+                try:
+                    contents = await self._transact(encoded_representation=encoded_representation)
+                    break
+                except (SerialException, asyncio.IncompleteReadError) as e:
+                    await self.close()
+                    if attempt >= self.reconnect_attempts:
+                        raise
+                    attempt += 1
+                    logger.warning(f"Lost connection to device ({e}). Reconnecting, attempt {attempt}...")
+
+        decoded_contents = self.encoding.decode(exchange=exchange, contents=contents)
+        logger.info(f"Received: {contents}")
+
+        if decoded_contents.name == 'ErrorResponse':
+            logger.error(f"Received Error from device: {decoded_contents}")
+
+        return decoded_contents
+
+    @asynccontextmanager
+    async def stream(self, request_values: Mapping, exchange: Type[Exchange], rate_hz: float):
+        """
+        asyncio counterpart of BaseClient.stream, yielding an async iterator over the decoded samples. Buffering is
+        bounded by the stream reader's limit; once it is reached the transport stops reading until samples are
+        consumed.
+        """
+        start_values = stream_start_values(exchange=exchange, request_values=request_values, rate_hz=rate_hz)
+        start_request = self.encoding.encode(exchange=stream_start_exchange(exchange), values=start_values)
+        stop_request = self.encoding.encode(exchange=stream_stop_exchange(exchange), values={})
+        stop_name = stream_stop_exchange(exchange).identifier() + 'Response'
+
+        async with self._lock:
+            reader, writer = await self._connect()
+            writer.write(start_request)
+            await writer.drain()
+            logger.info(f"Wrote: {start_request}")
+            decoder = self.encoding.stream_decoder(exchange=exchange)
+            pending = deque()
+            try:
+                yield self._samples(reader=reader, decoder=decoder, pending=pending, stop_name=stop_name)
+            finally:
+                writer.write(stop_request)
+                await writer.drain()
+                logger.info(f"Wrote: {stop_request}")
+                try:
+                    await asyncio.wait_for(
+                        self._drain(reader=reader, decoder=decoder, pending=pending, stop_name=stop_name),
+                        timeout=DEFAULT_STREAM_STOP_TIMEOUT,
+                    )
+                except asyncio.TimeoutError:
+                    # Whatever is still in transit would be mistaken for the next response, so start afresh
+                    logger.warning(f"Device did not acknowledge stopping {exchange.identifier()} stream")
+                    await self.close()
+
+    async def _drain(
+            self, reader: asyncio.StreamReader, decoder: StreamDecoder, pending: deque, stop_name: str,
+    ) -> None:
+        async for _ in self._samples(reader=reader, decoder=decoder, pending=pending, stop_name=stop_name):
+            pass
+
+    async def _samples(
+            self, reader: asyncio.StreamReader, decoder: StreamDecoder, pending: deque, stop_name: str,
+    ) -> AsyncIterator[DecodedExchange]:
+        # One read may decode several samples. Those not yet yielded wait in pending, which outlives this iterator so
+        # that _drain() sees them too.
+        while True:
+            while pending:
+                decoded_contents = pending.popleft()
+                if decoded_contents.name == stop_name:
+                    return
+                yield decoded_contents
+            chunk = await reader.read(DEFAULT_STREAM_READ_SIZE)
+            if not chunk:
+                raise asyncio.IncompleteReadError(partial=b'', expected=None)
+            pending.extend(decoder.feed(chunk))
+
+    async def _transact(self, encoded_representation: bytes) -> bytes:
+        reader, writer = await self._connect()
+        writer.write(encoded_representation)
+        await writer.drain()
+        logger.info(f"Wrote: {encoded_representation}")
+        return await reader.readuntil(terminator_bytes(self.encoding))
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if self._writer is None:
+            self._reader, self._writer = await self.channel.open_async()
+        return self._reader, self._writer
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = None
+            self._writer = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+    @asynccontextmanager
+    async def listen(self):
+        yield await self._connect()
+
+
+@dataclass
+class ThreadedBaseClient(Client):
+    """
+    Client for applications where several threads share one device. request() hands the encoded request to a writer
+    thread through a lock-free queue and immediately returns a Future. A dedicated reader thread owns the port, decodes
+    each incoming line with the contract encoding and resolves the Future of the oldest outstanding request, so
+    callers never serialise on an outer lock or interleave bytes on the wire.
+    """
+    channel: Channel
+    encoding: Type[Encoding]
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+    rx_buffer_size: int = DEFAULT_RX_BUFFER_SIZE
+    poll_interval: float = 0.05
+
+    def __post_init__(self):
+        self._requests = queue.SimpleQueue()
+        self._in_flight = deque()
+        self._in_flight_bytes = 0
+        self._window = threading.Condition()
+        self._port = None
+        self._connected = threading.Event()
+        self._stopped = threading.Event()
+        self._start_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def request(self, request_values: Mapping, exchange: Type[Exchange]) -> Future:
+        if self._stopped.is_set():
+            raise RuntimeError("Cannot send requests on a closed client")
+
+        future = Future()
+        encoded_representation = self.encoding.encode(exchange=exchange, values=request_values, is_request=True)
+        self._start()
+        self._requests.put((exchange, encoded_representation, future))
+        return future
+
+    def _start(self) -> None:
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._read_loop, name='hardsync-reader', daemon=True),
+                threading.Thread(target=self._write_loop, name='hardsync-writer', daemon=True),
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            exchange, encoded_representation, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._send(exchange, encoded_representation, future)
+
+    def _send(self, exchange: Type[Exchange], encoded_representation: bytes, future: Future) -> None:
+        while True:
+            if not self._wait_until_connected():
+                future.set_exception(ConnectionError("Client closed before request was sent"))
+                return
+
+            # Respect the device receive buffer in the same way as BaseClient.request_pipelined
+            with self._window:
+                self._window.wait_for(lambda: self._stopped.is_set() or not self._connected.is_set() or (
+                    not self._in_flight or (
+                        len(self._in_flight) < self.max_in_flight and
+                        self._in_flight_bytes + len(encoded_representation) <= self.rx_buffer_size
+                    )
+                ))
+                if self._stopped.is_set():
+                    future.set_exception(ConnectionError("Client closed before request was sent"))
+                    return
+                if not self._connected.is_set():
+                    # The link dropped while waiting for room, so wait for the reconnect
+                    continue
+                if future.done():
+                    return
+
+                # The reader only connects and disconnects while holding the window, so the request is registered
+                # against the port it is written to. Registering first means the reader never sees a response without
+                # its request.
+                self._in_flight.append((exchange, len(encoded_representation), future))
+                self._in_flight_bytes += len(encoded_representation)
+                port = self._port
+
+            # Write outside the window so a slow write does not hold up the reader resolving responses. If the link
+            # drops meanwhile, the bytes go to the old port and the reader has already failed the request.
+            try:
+                port.write(encoded_representation)
+                logger.info(f"Wrote: {encoded_representation}")
+            except Exception as e:
+                logger.warning(f"Failed to write to device ({e}).")
+                with self._window:
+                    same_connection = self._port is port
+                if same_connection:
+                    self._fail_in_flight(e)
+            return
+
+    def _wait_until_connected(self) -> bool:
+        while not self._connected.wait(timeout=self.poll_interval):
+            if self._stopped.is_set():
+                return False
+        return True
+
+    def _read_loop(self) -> None:
+        terminator = terminator_bytes(self.encoding)
+        while not self._stopped.is_set():
+            try:
+                with self.channel.open() as port:
+                    port.timeout = self.poll_interval
+                    with self._window:
+                        self._port = port
+                        self._connected.set()
+                        self._window.notify_all()
+                    contents = b''
+                    while not self._stopped.is_set():
+                        contents += port.read_until(expected=terminator)
+                        if contents.endswith(terminator):
+                            self._resolve(contents)
+                            contents = b''
+            except Exception as e:
+                logger.warning(f"Lost connection to device ({e}). Reconnecting...")
+                self._disconnect(e)
+                self._stopped.wait(timeout=self.poll_interval)
+
+    def _resolve(self, contents: bytes) -> None:
+        with self._window:
+            if not self._in_flight:
+                logger.warning(f"Received unsolicited message from device: {contents}")
+                return
+            exchange, encoded_length, future = self._in_flight.popleft()
+            self._in_flight_bytes -= encoded_length
+            self._window.notify()
+
+        logger.info(f"Received: {contents}")
+        try:
+            decoded_contents = self.encoding.decode(exchange=exchange, contents=contents)
+        except Exception as e:
+            future.set_exception(e)
+            return
+
+        if decoded_contents.name == 'ErrorResponse':
+            logger.error(f"Received Error from device: {decoded_contents}")
+        future.set_result(decoded_contents)
+
+    def _disconnect(self, exception: BaseException) -> None:
+        # Requests written on the lost connection can never be answered, and must not be answered by the next one
+        with self._window:
+            self._connected.clear()
+            self._port = None
+        self._fail_in_flight(exception)
+
+    def _fail_in_flight(self, exception: BaseException) -> None:
+        with self._window:
+            in_flight = list(self._in_flight)
+            self._in_flight.clear()
+            self._in_flight_bytes = 0
+            self._window.notify_all()
+
+        for _, _, future in in_flight:
+            if not future.done():
+                future.set_exception(exception)
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._requests.put(None)
+        with self._window:
+            self._window.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._fail_in_flight(ConnectionError("Client closed before a response was received"))
+
+        while True:
+            try:
+                item = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].cancel()
+
+        self.channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @contextmanager
+    def listen(self):
+        """
+        Waits until the reader thread is connected to the device and yields the client. The port stays owned by the
+        reader thread, so requests still go through request().
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("Cannot listen on a closed client")
+
+        self._start()
+        if not self._wait_until_connected():
+            raise ConnectionError("Client closed before it connected")
+        yield self
+
+
+@dataclass
+class ClientPool:
+    """
+    Persistent connections to a fleet of identical devices, addressed by serial number. Requests fan out to every
+    device concurrently on a thread pool, so a fleet-wide read takes as long as the slowest device rather than the
+    sum of all of them. serial_numbers can be the list returned by pyserial_discover.
+    """
+    serial_numbers: Sequence[str]
+    encoding: Type[Encoding]
+    channel: Type[Channel]
+    max_workers: Optional[int] = None
+
+    def __post_init__(self):
+        self.clients: Dict[str, BaseClient] = {
+            serial_number: BaseClient(
+                channel=SerialChannel(
+                    baud_rate=self.channel.baud_rate, channel_identifier=serial_number, persistent=True,
+                ),
+                encoding=self.encoding,
+            )
+            for serial_number in self.serial_numbers
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers or max(len(self.clients), 1),
+            thread_name_prefix='hardsync-pool',
+        )
+
+    def broadcast(
+            self, exchange: Type[Exchange], values: Mapping, return_exceptions: bool = False,
+    ) -> Dict[str, DecodedExchange | BaseException]:
+        return self.map(
+            exchange=exchange,
+            per_device_values={serial_number: values for serial_number in self.clients},
+            return_exceptions=return_exceptions,
+        )
+
+    def map(
+            self, exchange: Type[Exchange], per_device_values: Mapping[str, Mapping], return_exceptions: bool = False,
+    ) -> Dict[str, DecodedExchange | BaseException]:
+        """
+        Sends each device its own request values and returns the responses keyed by serial number. If
+        return_exceptions is set, a device that fails has its exception in the results instead of raising it.
+        """
+        unknown_devices = set(per_device_values) - set(self.clients)
+        if unknown_devices:
+            raise KeyError(f"Devices {unknown_devices} are not in this pool")
+
+        futures = {
+            serial_number: self._executor.submit(
+                self.clients[serial_number].request, request_values=values, exchange=exchange,
+            )
+            for serial_number, values in per_device_values.items()
+        }
+
+        results = {}
+        for serial_number, future in futures.items():
+            exception = future.exception()
+            if exception is None:
+                results[serial_number] = future.result()
+            elif return_exceptions:
+                results[serial_number] = exception
+            else:
+                raise exception
+        return results
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        for client in self.clients.values():
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,121 @@
+"""
+Columnar collection of many responses to one exchange. Rather than holding a DecodedExchange and a dict per message,
+each response field is appended to its own typed column, so memory stays compact and linear in the number of
+samples. Columns are numpy arrays when numpy is installed, and stdlib arrays (or lists for non-numeric fields)
+otherwise.
+"""
+from array import array
+from dataclasses import fields
+from typing import Type, Dict, Iterable, Optional, Any
+from hardsync.interfaces import Exchange
+from hardsync.types import DecodedExchange, ReceivedErrorResponse
+from hardsync.encodings import np, NUMPY_DTYPES
+
+DEFAULT_COLUMN_CAPACITY = 1024
+ARRAY_TYPECODES = {int: 'q', float: 'd'}
+
+
+def column_dtype(field_type: type) -> str:
+    # Strings and array fields have no fixed width, so they are stored as objects
+    return NUMPY_DTYPES.get(field_type, 'object')
+
+
+def response_dtype(exchange: Type[Exchange]) -> 'np.dtype':
+    if np is None:
+        raise ImportError('numpy is required for record arrays. Install it with pip install hardsync[numpy]')
+    return np.dtype([(field.name, column_dtype(field.type)) for field in fields(exchange.Response)])
+
+
+class ResponseColumns:
+    """
+    Growable columns holding the responses of one exchange. Numpy columns double in capacity when full, so appending
+    n responses costs O(n) amortized and at most twice the memory of the data itself.
+    """
+    def __init__(self, exchange: Type[Exchange], capacity: int = DEFAULT_COLUMN_CAPACITY):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        self.exchange = exchange
+        self.response_name = exchange.identifier() + 'Response'
+        self._size = 0
+        response_fields = fields(exchange.Response)
+        if np is not None:
+            self._columns = {
+                field.name: np.empty(capacity, dtype=column_dtype(field.type)) for field in response_fields
+            }
+        else:
+            self._columns = {
+                field.name: array(ARRAY_TYPECODES[field.type]) if field.type in ARRAY_TYPECODES else []
+                for field in response_fields
+            }
+
+    def append(self, decoded: DecodedExchange) -> None:
+        if decoded.name != self.response_name:
+            if decoded.name == 'ErrorResponse':
+                raise ReceivedErrorResponse(decoded.values.get('msg'))
+            raise ValueError(f"Expected {self.response_name}, received {decoded.name}")
+
+        values = decoded.values
+        if np is None:
+            for name, column in self._columns.items():
+                column.append(values[name])
+        else:
+            if self._size == self.capacity:
+                self._grow()
+            for name, column in self._columns.items():
+                column[self._size] = values[name]
+        self._size += 1
+
+    def extend(self, decoded_exchanges: Iterable[DecodedExchange], limit: Optional[int] = None) -> None:
+        """
+        Appends responses until the iterable is exhausted or, if given, limit responses have been appended.
+        """
+        if limit is not None and limit <= 0:
+            return
+        for count, decoded in enumerate(decoded_exchanges, start=1):
+            self.append(decoded)
+            if count == limit:
+                return
+
+    @property
+    def capacity(self) -> int:
+        if np is None:
+            return self._size
+        return len(next(iter(self._columns.values()), ()))
+
+    def _grow(self) -> None:
+        for name, column in self._columns.items():
+            grown = np.empty(max(2 * len(column), 1), dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def columns(self) -> Dict[str, Any]:
+        """
+        The collected values of each field. Numpy columns are views, and stay valid as more responses are appended.
+        """
+        if np is None:
+            return dict(self._columns)
+        return {name: column[:self._size] for name, column in self._columns.items()}
+
+    def records(self) -> 'np.ndarray':
+        """
+        The collected responses as a numpy structured array with one record per response.
+        """
+        dtype = response_dtype(self.exchange)
+        records = np.empty(self._size, dtype=dtype)
+        for name, column in self.columns().items():
+            records[name] = column
+        return records
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def collect(
+        decoded_exchanges: Iterable[DecodedExchange],
+        exchange: Type[Exchange],
+        limit: Optional[int] = None,
+        capacity: int = DEFAULT_COLUMN_CAPACITY,
+) -> ResponseColumns:
+    columns = ResponseColumns(exchange=exchange, capacity=capacity)
+    columns.extend(decoded_exchanges, limit=limit)
+    return columns
@@ -0,0 +1,126 @@
+"""
+Project configuration kept in hardsync.ini in the working directory. Besides the preferred device_serial written by
+`hardsync config`, it remembers where each device was last seen, so that discovery and channels can go straight to
+that port instead of scanning every port on the host. Discovery also records which contract each device's firmware
+was generated from, so clients can pick a compatible device without trying requests on the others.
+"""
+import configparser
+import os
+import threading
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+CONFIG_FILENAME = 'hardsync.ini'
+DEVICE_SECTION_PREFIX = 'device:'
+CAPABILITY_DELIMITER = ','
+
+
+class KnownDevice(NamedTuple):
+    serial_number: str
+    port: str
+    baud_rate: int
+    contract_hash: str = ''
+    hardsync_version: str = ''
+    # Exchanges the device answers, known when discovery was given the contract its firmware was generated from
+    capabilities: Tuple[str, ...] = ()
+
+
+class DeviceCache:
+    """
+    Last-seen port, baud rate and firmware of each device, keyed by serial number. The file is read once and only
+    rewritten when an entry changes.
+    """
+    def __init__(self, path: str | Path = CONFIG_FILENAME):
+        self.path = Path(path)
+        self._parser: Optional[configparser.ConfigParser] = None
+        self._lock = threading.Lock()
+
+    def _config(self) -> configparser.ConfigParser:
+        if self._parser is None:
+            parser = configparser.ConfigParser()
+            parser.read(self.path)
+            self._parser = parser
+        return self._parser
+
+    def _save(self) -> None:
+        # Write to a temporary file first, so a crash or a concurrent reader never sees a half-written file
+        temporary_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temporary_path, 'w') as file:
+            self._config().write(file)
+        os.replace(temporary_path, self.path)
+
+    @property
+    def preferred_serial(self) -> str:
+        with self._lock:
+            return self._config()['DEFAULT'].get('device_serial', '')
+
+    def set_preferred_serial(self, serial_number: str) -> None:
+        with self._lock:
+            self._config()['DEFAULT']['device_serial'] = serial_number
+            self._save()
+
+    def get(self, serial_number: str) -> Optional[KnownDevice]:
+        with self._lock:
+            return self._get(serial_number)
+
+    def _get(self, serial_number: str) -> Optional[KnownDevice]:
+        section_name = DEVICE_SECTION_PREFIX + serial_number
+        config = self._config()
+        if not serial_number or not config.has_section(section_name):
+            return None
+        section = config[section_name]
+        capabilities = section.get('capabilities', '')
+        try:
+            return KnownDevice(
+                serial_number=serial_number,
+                port=section['port'],
+                baud_rate=section.getint('baud_rate'),
+                contract_hash=section.get('contract_hash', ''),
+                hardsync_version=section.get('hardsync_version', ''),
+                capabilities=tuple(capabilities.split(CAPABILITY_DELIMITER)) if capabilities else (),
+            )
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    def devices(self) -> List[KnownDevice]:
+        with self._lock:
+            serial_numbers = [
+                name[len(DEVICE_SECTION_PREFIX):] for name in self._config().sections()
+                if name.startswith(DEVICE_SECTION_PREFIX)
+            ]
+            devices = [self._get(serial_number) for serial_number in serial_numbers]
+        return [device for device in devices if device is not None]
+
+    def compatible(self, contract_hash: str) -> List[KnownDevice]:
+        """
+        Devices whose firmware was last seen running the contract with this hash.
+        """
+        if not contract_hash:
+            return []
+        return [device for device in self.devices() if device.contract_hash == contract_hash]
+
+    def remember(self, device: KnownDevice) -> None:
+        with self._lock:
+            previous = self._get(device.serial_number)
+            if not device.contract_hash and previous is not None and previous.port == device.port:
+                # Channels do not know which contract a device runs, so keep what discovery recorded
+                device = device._replace(
+                    contract_hash=previous.contract_hash,
+                    hardsync_version=previous.hardsync_version,
+                    capabilities=previous.capabilities,
+                )
+            if device == previous:
+                return
+            self._config()[DEVICE_SECTION_PREFIX + device.serial_number] = {
+                'port': device.port,
+                'baud_rate': str(device.baud_rate),
+                'contract_hash': device.contract_hash,
+                'hardsync_version': device.hardsync_version,
+                'capabilities': CAPABILITY_DELIMITER.join(device.capabilities),
+            }
+            self._save()
+
+    def forget(self, serial_number: str) -> None:
+        with self._lock:
+            if self._config().remove_section(DEVICE_SECTION_PREFIX + serial_number):
+                self._save()
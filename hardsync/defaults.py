@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Type
 from hardsync import root_dir
 from hardsync.interfaces import (
@@ -31,7 +32,25 @@ DEFAULT_ENCODING = Encoding
 
 
 class Ping(Exchange):
-    pass
+    exchange_id = 0
+
+
+class Describe(Exchange):
+    """
+    Built into every firmware alongside Ping. Reports which contract the firmware was generated from, as
+    manifest.contract_hash, and the hardsync version that generated it.
+    """
+    # The largest id, so that contracts still number their own exchanges from 1
+    exchange_id = 255
+
+    @dataclass
+    class Request:
+        pass
+
+    @dataclass
+    class Response:
+        contract_hash: str
+        hardsync_version: str
 
 
 class Channel(SerialChannel):
@@ -1,19 +1,60 @@
 from serial.tools import list_ports
 import serial
 import logging
-from typing import Optional, Type, TypeVar
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, NamedTuple, Optional, Sequence, Type, TypeVar, get_args
 from datetime import timedelta
+import itertools
+import struct
+import threading
 import time
 
-from hardsync.channels import DeviceNotFoundError
+from hardsync.channels import DeviceNotFoundError, PORT_INDEX, PORT_WATCHER, _device_present
+from hardsync.config import DeviceCache, KnownDevice
 from hardsync.interfaces import Encoding, Channel
-from hardsync.defaults import Ping
+from hardsync.defaults import Ping, Describe
+from hardsync.clients import terminator_bytes
+from hardsync.types import BaudRateT, FieldNotFoundError
 from typing import List, Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DEFAULT_TIMEOUT = timedelta(seconds=2)
+# How long a probe waits for a reply before pinging again. Most Arduinos reset when their port is opened, and miss the
+# pings sent while their bootloader runs.
+PING_INTERVAL = timedelta(milliseconds=250)
+MAX_PROBE_THREADS = 32
+# Baud rates tried when a device's is unknown. 115200 and 9600 cover most sketches, and the remaining rates follow from
+# fastest to slowest, since slow rates take longest to answer.
+DISCOVERY_BAUD_RATES = (115_200, 9600) + tuple(sorted(set(get_args(BaudRateT)) - {115_200, 9600}, reverse=True))
+# Cycling through every rate takes a couple of seconds, on top of the board resetting when its port is opened
+MULTI_BAUD_TIMEOUT = timedelta(seconds=6)
+# How long a probe cycling through baud rates listens at each one, on top of the time a Ping and its reply take to
+# cross the wire. An upper bound on their length keeps slow rates from being skipped before the reply arrives.
+MIN_PING_INTERVAL = timedelta(milliseconds=50)
+PING_ROUND_TRIP_BYTES = 32
+# A start bit, eight data bits and a stop bit
+BITS_PER_BYTE = 10
+# Raised when decoding a reply from other firmware, bytes left over from a bootloader, or a reply to another request
+DECODE_ERRORS = (ValueError, IndexError, KeyError, FieldNotFoundError, struct.error)
+
+
+class KnownPort(NamedTuple):
+    device: str
+    serial_number: str
+
+
+class DeviceDescription(NamedTuple):
+    # Empty for firmware generated before Describe existed
+    contract_hash: str = ''
+    hardsync_version: str = ''
+
+
+class DiscoveredPort(NamedTuple):
+    port: Any
+    baud_rate: int
+    description: DeviceDescription = DeviceDescription()
 
 
 def pyserial_discover(
@@ -21,18 +62,57 @@ def pyserial_discover(
         channel: Channel,
         preferred_serial: Optional[str] = None,
         timeout: timedelta = DEFAULT_TIMEOUT,
+        device_cache: Optional[DeviceCache] = None,
+        contract_hash: str = '',
+        baud_rates: Optional[Sequence[int]] = None,
+        capabilities: Sequence[str] = (),
 ) -> List[str]:
+    """
+    Pings every serial port concurrently and returns the serial numbers of those running hardsync firmware, in port
+    order with the preferred serial first. The whole scan takes about one timeout however many ports there are, and
+    returns as soon as the preferred serial answers.
+
+    When the device's baud rate is not known, pass the rates to try as baud_rates, e.g. DISCOVERY_BAUD_RATES, and
+    channel.baud_rate is ignored. A port can only be opened at one rate at a time, so each probe switches its port
+    between them in turn, in the order given.
+
+    Every device that answers is asked to Describe the contract its firmware was generated from. With a
+    device_cache, the port the preferred serial was last seen on is pinged first, and the full scan only runs if it
+    does not answer. Devices found are recorded in the cache along with the baud rate they answered at and their
+    contract hash, and devices running the contract with contract_hash are recorded as answering the exchanges named
+    in capabilities.
+    """
+    baud_rates = tuple(baud_rates or (channel.baud_rate,))
+    if preferred_serial and device_cache is not None:
+        discovered = _attempt_known_port(
+            device_cache, preferred_serial, channel=channel, encoding=encoding, timeout=timeout,
+            baud_rates=baud_rates,
+        )
+        if discovered is not None:
+            _record_device(device_cache, discovered, contract_hash=contract_hash, capabilities=capabilities)
+            return [preferred_serial]
 
-    available_ports = list_ports.comports()
+    if PORT_WATCHER.is_running:
+        # The watcher already keeps the index current, so there is no need to scan ports again
+        available_ports = PORT_INDEX.ports()
+    else:
+        available_ports = list_ports.comports()
+        PORT_INDEX.refresh(ports=available_ports)
     target_ports = _filter_ports_by_serial(available_ports, preferred_serial)
 
-    discovered_serials = []
-    for port in target_ports:
-        discovered_serial = _attempt_connection(port=port, channel=channel, encoding=encoding, timeout=timeout.seconds)
-        if discovered_serial:
-            discovered_serials.append(discovered_serial)
-        if discovered_serial == preferred_serial:
-            return discovered_serials
+    discovered_ports = _probe_ports(
+        ports=target_ports, channel=channel, encoding=encoding, timeout=timeout, preferred_serial=preferred_serial,
+        baud_rates=baud_rates,
+    )
+    for discovered in discovered_ports:
+        device_hash = discovered.description.contract_hash
+        if contract_hash and device_hash and device_hash != contract_hash:
+            logger.warning(
+                f'{discovered.port.serial_number} runs a different contract ({device_hash}) than {contract_hash}'
+            )
+        if device_cache is not None:
+            _record_device(device_cache, discovered, contract_hash=contract_hash, capabilities=capabilities)
+    discovered_serials = [discovered.port.serial_number for discovered in discovered_ports]
 
     if not discovered_serials and available_ports:
         logger.error('Unable to find compatible device. Ensure you have uploaded hardsync firmware, and try again')
@@ -45,6 +125,21 @@ def pyserial_discover(
 Port = TypeVar('Port')
 
 
+def _record_device(
+        device_cache: DeviceCache, discovered: DiscoveredPort, contract_hash: str, capabilities: Sequence[str],
+) -> None:
+    description = discovered.description
+    compatible = bool(contract_hash) and description.contract_hash == contract_hash
+    device_cache.remember(KnownDevice(
+        serial_number=discovered.port.serial_number,
+        port=discovered.port.device,
+        baud_rate=discovered.baud_rate,
+        contract_hash=description.contract_hash,
+        hardsync_version=description.hardsync_version,
+        capabilities=tuple(capabilities) if compatible else (),
+    ))
+
+
 def _filter_ports_by_serial(available_ports: List[Port], preferred_serial: Optional[str]) -> List[Port]:
     if preferred_serial:
         preferred_ports = [port for port in available_ports if port.serial_number == preferred_serial]
@@ -54,26 +149,186 @@ def _filter_ports_by_serial(available_ports: List[Port], preferred_serial: Optio
     return available_ports
 
 
-def _attempt_connection(port: Port, channel: Channel, encoding: Type[Encoding], timeout: float) -> Optional[str]:
-    start_time = time.monotonic()
-    end_time = start_time + timeout
-    current_time = time.monotonic()
+def _attempt_known_port(
+        device_cache: DeviceCache,
+        serial_number: str,
+        channel: Channel,
+        encoding: Type[Encoding],
+        timeout: timedelta,
+        baud_rates: Sequence[int],
+) -> Optional[DiscoveredPort]:
+    known = device_cache.get(serial_number)
+    if known is None or known.baud_rate not in baud_rates or not _device_present(known.port, serial_number):
+        return None
+
+    logger.info(f'Trying {serial_number} on {known.port} at {known.baud_rate} baud, where it was last seen...')
+    port = KnownPort(device=known.port, serial_number=serial_number)
+    deadline = time.monotonic() + timeout.total_seconds()
+    return _attempt_connection(
+        port=port, channel=channel, encoding=encoding, deadline=deadline, baud_rates=(known.baud_rate,),
+    )
 
-    while current_time < end_time:
-        ser = serial.Serial(port=port.device, baudrate=channel.baud_rate)
-        logger.info(f'Trying candidate device {port}...')
-        contents = encoding.encode(exchange=Ping, values={}, is_request=True)
-        ser.write(contents)
-        response = ser.read_until(encoding.exchange_terminator.encode('ascii'))
-        decoded_response = encoding.decode(exchange=Ping, contents=response)
 
-        if decoded_response.name == 'PingResponse':
-            logger.info('Success! found device.')
-            return port.serial_number
-        else:
-            logger.info('Incompatible device.')
+def _probe_ports(
+        ports: List[Port],
+        channel: Channel,
+        encoding: Type[Encoding],
+        timeout: timedelta,
+        preferred_serial: Optional[str] = None,
+        baud_rates: Optional[Sequence[int]] = None,
+) -> List[DiscoveredPort]:
+    """
+    The ports whose devices answered a Ping, in the order they were given.
+    """
+    if not ports:
+        return []
 
-        current_time = time.monotonic()
+    deadline = time.monotonic() + timeout.total_seconds()
+    cancelled = threading.Event()
+    discovered = {}
+    executor = ThreadPoolExecutor(max_workers=min(len(ports), MAX_PROBE_THREADS), thread_name_prefix='hardsync-probe')
+    try:
+        futures = {
+            executor.submit(
+                _attempt_connection, port=port, channel=channel, encoding=encoding, deadline=deadline,
+                cancelled=cancelled, baud_rates=baud_rates,
+            ): index
+            for index, port in enumerate(ports)
+        }
+        for future in as_completed(futures):
+            try:
+                discovered_port = future.result()
+            except Exception:
+                # Whatever one device or driver does, the others are still worth probing
+                logger.exception(f'Probing {ports[futures[future]].device} failed')
+                continue
+            if discovered_port is None:
+                continue
+            discovered[futures[future]] = discovered_port
+            if preferred_serial and discovered_port.port.serial_number == preferred_serial:
+                break
+    finally:
+        # Probes still running notice this within one PING_INTERVAL and close their ports
+        cancelled.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return [discovered[index] for index in sorted(discovered)]
+
+
+def _attempt_connection(
+        port: Port,
+        channel: Channel,
+        encoding: Type[Encoding],
+        deadline: float,
+        cancelled: Optional[threading.Event] = None,
+        baud_rates: Optional[Sequence[int]] = None,
+) -> Optional[DiscoveredPort]:
+    """
+    Pings the device on port until it answers or the deadline (a time.monotonic() value) passes, reusing one open
+    handle so the board is only reset once. Given several baud_rates, the handle is switched between them in turn.
+    A device that answers is then asked to Describe itself on the same handle.
+    """
+    baud_rates = tuple(baud_rates or (channel.baud_rate,))
+    logger.info(f'Trying candidate device {port}...')
+    try:
+        ser = serial.Serial(port=port.device, baudrate=baud_rates[0], timeout=PING_INTERVAL.total_seconds())
+    except serial.SerialException as e:
+        logger.info(f'Unable to open {port.device}: {e}')
+        return None
+
+    request = encoding.encode(exchange=Ping, values={}, is_request=True)
+    terminator = terminator_bytes(encoding)
+    if len(baud_rates) > 1:
+        # Pings sent at the wrong rate reach the firmware as noise. Leading with a terminator ends whatever request it
+        # made of them, so that the Ping is read on its own.
+        request = terminator + request
+
+    with ser:
+        for baud_rate in itertools.cycle(baud_rates):
+            if cancelled is not None and cancelled.is_set():
+                break
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            try:
+                if ser.baudrate != baud_rate:
+                    ser.baudrate = baud_rate
+                    ser.reset_input_buffer()
+                until = min(deadline, now + _ping_interval(baud_rate, cycling=len(baud_rates) > 1))
+                if not _ping(ser, encoding=encoding, request=request, terminator=terminator, until=until):
+                    continue
+                logger.info(f'Success! found device at {baud_rate} baud.')
+                # Not bounded by the deadline, since the device is known to be there
+                until = time.monotonic() + _ping_interval(baud_rate, cycling=False)
+                description = _describe(ser, encoding=encoding, terminator=terminator, until=until)
+            except serial.SerialException as e:
+                logger.info(f'Lost connection to {port.device}: {e}')
+                return None
+
+            return DiscoveredPort(port=port, baud_rate=baud_rate, description=description)
 
     return None
 
+
+def _ping_interval(baud_rate: int, cycling: bool) -> float:
+    # Long enough for a Ping and its reply to cross the wire, which takes over a second at 300 baud
+    interval = MIN_PING_INTERVAL.total_seconds() + PING_ROUND_TRIP_BYTES * BITS_PER_BYTE / baud_rate
+    if cycling:
+        return interval
+    return max(PING_INTERVAL.total_seconds(), interval)
+
+
+def _ping(ser: serial.Serial, encoding: Type[Encoding], request: bytes, terminator: bytes, until: float) -> bool:
+    """
+    Sends a Ping and reads replies until one is a PingResponse or until (a time.monotonic() value) passes.
+    """
+    ser.write(request)
+    while True:
+        remaining = until - time.monotonic()
+        if remaining <= 0:
+            return False
+        ser.timeout = remaining
+        response = ser.read_until(terminator)
+        if not response.endswith(terminator):
+            # No complete reply yet, e.g. because the board is still resetting
+            return False
+        if _is_ping_response(encoding, response):
+            return True
+        # Other firmware, or hardsync firmware reporting an error for noise it received before the Ping
+        logger.debug('Incompatible reply.')
+
+
+def _describe(ser: serial.Serial, encoding: Type[Encoding], terminator: bytes, until: float) -> DeviceDescription:
+    """
+    Asks a device that answered Ping which contract its firmware was generated from. Firmware that does not know
+    Describe answers with an error, and is described as unknown.
+    """
+    ser.write(encoding.encode(exchange=Describe, values={}, is_request=True))
+    while True:
+        remaining = until - time.monotonic()
+        if remaining <= 0:
+            return DeviceDescription()
+        ser.timeout = remaining
+        response = ser.read_until(terminator)
+        if not response.endswith(terminator):
+            return DeviceDescription()
+        try:
+            decoded = encoding.decode(exchange=Describe, contents=response)
+        except DECODE_ERRORS:
+            # e.g. a late reply to one of the Pings
+            continue
+        if decoded.name == 'DescribeResponse':
+            return DeviceDescription(
+                contract_hash=decoded.values.get('contract_hash', ''),
+                hardsync_version=decoded.values.get('hardsync_version', ''),
+            )
+        if decoded.name == 'ErrorResponse':
+            return DeviceDescription()
+
+
+def _is_ping_response(encoding: Type[Encoding], response: bytes) -> bool:
+    try:
+        return encoding.decode(exchange=Ping, contents=response).name == 'PingResponse'
+    except DECODE_ERRORS:
+        # Other firmware, or bytes left over from a bootloader, need not decode at all
+        return False
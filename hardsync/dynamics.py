@@ -1,15 +1,19 @@
 from types import ModuleType
-from typing import Type, List, Any, Set, get_args
+from typing import Type, List, Any, Set, get_args, get_origin
 from hardsync.interfaces import Exchange, Encoding, TypeMapping, ContractError, Channel, Contract
-from hardsync.encodings import AsciiEncoding
-from hardsync.defaults import DEFAULT_TYPE_MAPPING, DEFAULT_ENCODING, DEFAULT_CHANNEL
-from hardsync.types import BaudRateT
-from dataclasses import dataclass, fields, is_dataclass
+from hardsync.encodings import AsciiEncoding, BinaryEncoding
+from hardsync.defaults import DEFAULT_TYPE_MAPPING, DEFAULT_ENCODING, DEFAULT_CHANNEL, Ping, Describe
+from hardsync.types import BaudRateT, Array, is_array_type
+from dataclasses import dataclass, fields, is_dataclass, make_dataclass
 from hardsync.utils import flatten
+from functools import lru_cache
 import inspect
 
 
 SPECIAL_CLASS_NAMES = ['Encoding', 'Channel', 'TypeMapping']
+STREAM_PERIOD_FIELD = 'period_us'
+MAX_EXCHANGE_ID = 255
+ARRAY_ELEMENT_TYPES = (int, float, bool)
 
 
 def apply_defaults(module: ModuleType):
@@ -19,6 +23,7 @@ def apply_defaults(module: ModuleType):
     apply_channel(module=module, channel=DEFAULT_CHANNEL)
 
     transform_to_dataclasses(module)
+    apply_exchange_ids(module)
     validate(contract=module)
 
 
@@ -56,10 +61,45 @@ def apply_type_mapping_inheritance(module: ModuleType, type_mapping: Type[TypeMa
             setattr(module, 'TypeMapping', new_type_mapping)
 
 
+def apply_exchange_ids(module: ModuleType):
+    """
+    Gives every exchange without an explicit exchange_id the next free id, in the order the exchanges are declared in
+    the contract. Ids 0 and 255 are reserved for Ping and Describe, which every firmware answers.
+    """
+    exchanges = [
+        ex for ex in vars(module).values()
+        if inspect.isclass(ex) and issubclass(ex, Exchange) and ex not in (Exchange, Ping, Describe)
+    ]
+    taken_ids = {Ping.exchange_id, Describe.exchange_id}
+    for ex in exchanges:
+        if ex.identifier() in (Ping.identifier(), Describe.identifier()):
+            raise ContractError(f"exchange {ex.identifier()} is built into hardsync and cannot be redefined")
+        if ex.exchange_id is not None:
+            if ex.exchange_id in taken_ids:
+                raise ContractError(f"exchange {ex.identifier()} has duplicate exchange_id {ex.exchange_id}")
+            taken_ids.add(ex.exchange_id)
+
+    next_id = 0
+    for ex in exchanges:
+        if ex.exchange_id is None:
+            while next_id in taken_ids:
+                next_id += 1
+            ex.exchange_id = next_id
+            taken_ids.add(next_id)
+
+    too_large = [ex.identifier() for ex in exchanges if ex.exchange_id > MAX_EXCHANGE_ID]
+    if too_large:
+        raise ContractError(f"exchange ids must be at most {MAX_EXCHANGE_ID}. Exchanges {too_large} exceed this.")
+
+
 def get_exchanges_permissive(module: ModuleType):
     possible_exchanges = [mem[1] for mem in inspect.getmembers(module, predicate=inspect.isclass)]
     no_special_classes = [ex for ex in possible_exchanges if ex.__name__ not in SPECIAL_CLASS_NAMES]
-    return no_special_classes
+    # Contracts may import base classes, e.g. BinaryEncoding to subclass it, which are not exchanges
+    no_imported_bases = [
+        ex for ex in no_special_classes if not issubclass(ex, (Encoding, Channel, TypeMapping, Array))
+    ]
+    return no_imported_bases
 
 
 def transform_to_dataclasses(module: ModuleType):
@@ -77,10 +117,40 @@ def get_exchanges(module: Contract):
     return exchanges
 
 
+@lru_cache(maxsize=None)
+def stream_start_exchange(exchange: Type[Exchange]) -> Type[Exchange]:
+    """
+    The control exchange that starts a streaming exchange on the device. Its request carries the sample period
+    followed by the streaming exchange's own request fields, e.g. MeasureVoltageStreamRequest(period_us=1000,channel=1)
+    """
+    request_fields = [(STREAM_PERIOD_FIELD, int)] + [(f.name, f.type) for f in fields(exchange.Request)]
+    return type(exchange.identifier() + 'Stream', (Exchange,), {
+        'Request': make_dataclass('Request', request_fields),
+        'Response': make_dataclass('Response', []),
+        'exchange_id': exchange.exchange_id,
+        'stream_control': 'start',
+    })
+
+
+@lru_cache(maxsize=None)
+def stream_stop_exchange(exchange: Type[Exchange]) -> Type[Exchange]:
+    """
+    The control exchange that stops a streaming exchange. The device acknowledges it with e.g.
+    MeasureVoltageStopResponse() after its last sample, so the host knows the stream has drained.
+    """
+    return type(exchange.identifier() + 'Stop', (Exchange,), {
+        'Request': make_dataclass('Request', []),
+        'Response': make_dataclass('Response', []),
+        'exchange_id': exchange.exchange_id,
+        'stream_control': 'stop',
+    })
+
+
 def input_types(exchange: Type[Exchange]) -> List[Any]:
     request_types = [f.type for f in fields(exchange.Request)]
     response_type = [f.type for f in fields(exchange.Response)]
-    return request_types + response_type
+    # Arrays are mapped element-wise, so it is their element type that needs a type mapping
+    return [t.element_type if is_array_type(t) else t for t in request_types + response_type]
 
 
 def validate(contract: ModuleType):
@@ -97,6 +167,8 @@ def validate(contract: ModuleType):
     validate_type_mapping(required_types=all_input_types, type_mapping=contract.TypeMapping)
 
     validate_encoding(encoding=contract.Encoding)
+    if issubclass(contract.Encoding, BinaryEncoding):
+        validate_binary_encoding(encoding=contract.Encoding, required_types=all_input_types)
 
 
 def validate_type_mapping(required_types: Set[Any], type_mapping: Type[TypeMapping]):
@@ -118,19 +190,46 @@ def validate_exchange(exchange: Type):
     else:
         if not is_dataclass(exchange.Request):
             messages.append(f"exchange.Request must be a dataclass")
+        elif getattr(exchange, 'streaming', False) and STREAM_PERIOD_FIELD in [f.name for f in fields(exchange.Request)]:
+            messages.append(f"streaming exchange {exchange} cannot have a request field named {STREAM_PERIOD_FIELD}")
     if not hasattr(exchange, 'Response'):
         messages.append(f"exchange {exchange} must have a response specified")
     else:
         if not is_dataclass(exchange.Response):
             messages.append(f"exchange.Response must be a dataclass")
 
+    if not messages:
+        messages += validate_array_fields(exchange)
+
     if messages:
         raise ContractError(messages)
 
 
+def validate_array_fields(exchange: Type[Exchange]) -> List[str]:
+    messages = []
+    for field in fields(exchange.Request) + fields(exchange.Response):
+        if field.type is list or get_origin(field.type) is list:
+            messages.append(
+                f"field {field.name} of {exchange.__name__} must declare its capacity, e.g. Array[float, 64]"
+            )
+        elif is_array_type(field.type) and field.type.element_type not in ARRAY_ELEMENT_TYPES:
+            messages.append(f"field {field.name} of {exchange.__name__} has unsupported element type")
+    if getattr(exchange, 'streaming', False) and any(is_array_type(f.type) for f in fields(exchange.Request)):
+        messages.append(f"streaming exchange {exchange.__name__} cannot have array request fields")
+    return messages
+
+
 def validate_encoding(encoding: Type[Encoding]):
-    if not issubclass(encoding, AsciiEncoding):
-        raise AssertionError("Only ASCII encoding is currently supported.")
+    if not issubclass(encoding, (AsciiEncoding, BinaryEncoding)):
+        raise AssertionError("Only ASCII and binary encodings are currently supported.")
+
+
+def validate_binary_encoding(encoding: Type[BinaryEncoding], required_types: Set[Any]):
+    missing_types = {t for t in required_types if t is not str and t not in encoding.field_formats}
+    if missing_types:
+        raise ContractError(f"Binary encoding field_formats is missing {missing_types}")
+    if not 0 < encoding.max_string_length <= 255:
+        raise ContractError("Binary encoding max_string_length must fit its one-byte length prefix (1 to 255)")
 
 
 def validate_channel(channel: Type[Channel]):
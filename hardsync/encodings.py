@@ -1,7 +1,15 @@
-from typing import Type, Mapping, Dict, Collection
-from hardsync.interfaces import Encoding, Exchange
-from hardsync.types import FieldNotFoundError, ResponseValues, DecodedExchange, Stringable
-from dataclasses import Field, fields
+from typing import Type, Mapping, Dict, Tuple, Any, Callable, Sequence
+from hardsync.interfaces import Encoding, Exchange, ContractError
+from hardsync.types import FieldNotFoundError, ResponseValues, DecodedExchange, Stringable, is_array_type
+from dataclasses import fields
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional. Without it, array fields decode to lists.
+    np = None
+
+NUMPY_DTYPES = {int: 'int64', float: 'float64', bool: 'bool'}
 
 
 class AsciiEncoding(Encoding):
@@ -10,65 +18,348 @@ class AsciiEncoding(Encoding):
     argument_ender = ')'
     argument_assigner = '='
     exchange_terminator = "\n"
+    array_delimiter = ' '
+    # Sizes the message buffer of generated ASCII firmware, so string values sent to the device must fit within it
+    max_string_length = 64
+    # When set, requests name their exchange by opcode, e.g. #3(channel=1), which the firmware dispatches with a
+    # switch. Generated firmware accepts both forms, so this can be turned on without regenerating it.
+    numeric_opcodes = False
+    opcode_prefix = '#'
+    opcode_kind_separator = '.'
 
-    @staticmethod
-    def encode(exchange: Type[Exchange], values: Mapping[str, Stringable | str], is_request=True) -> bytes:
-        encoded_args = AsciiEncoding._encode_args(exchange=exchange, values=values)
+    @classmethod
+    def encode(cls, exchange: Type[Exchange], values: Mapping[str, Stringable | str], is_request=True) -> bytes:
+        return ascii_codec(cls, exchange).encode(values, is_request)
+
+    @classmethod
+    def decode(cls, exchange: Type[Exchange], contents: bytes) -> DecodedExchange:
+        return ascii_codec(cls, exchange).decode(contents)
+
+
+class AsciiCodec:
+    """
+    Encoder and decoder for a single exchange, specialized once so that per-message work is a single pass over the
+    message: the name prefixes are prebuilt, and field types are resolved through a dict of converters instead of
+    scanning dataclasses.fields() for every argument.
+    """
+    def __init__(self, encoding: Type[AsciiEncoding], exchange: Type[Exchange]):
+        name = exchange.identifier()
+        self.delimiter = encoding.argument_delimiter
+        self.assigner = encoding.argument_assigner
+        self.beginner = encoding.argument_beginner
+        self.ender = encoding.argument_ender
+        if encoding.numeric_opcodes:
+            self.request_prefix = ascii_opcode(encoding, exchange) + encoding.argument_beginner
+        else:
+            self.request_prefix = name + 'Request' + encoding.argument_beginner
+        self.response_prefix = name + 'Response' + encoding.argument_beginner
+        self.suffix = encoding.argument_ender + encoding.exchange_terminator
+        self.request_keys = tuple(field.name for field in fields(exchange.Request))
+        self.response_keys = tuple(field.name for field in fields(exchange.Response))
+        self.request_template = self._template(prefix=self.request_prefix, keys=self.request_keys)
+        self.response_template = self._template(prefix=self.response_prefix, keys=self.response_keys)
+        self.request_converters = {f.name: ascii_converter(f.type, encoding) for f in fields(exchange.Request)}
+        self.response_converters = {f.name: ascii_converter(f.type, encoding) for f in fields(exchange.Response)}
+        self.request_formatters = {
+            f.name: ascii_array_formatter(f.type, encoding) for f in fields(exchange.Request) if is_array_type(f.type)
+        }
+        self.response_formatters = {
+            f.name: ascii_array_formatter(f.type, encoding) for f in fields(exchange.Response) if is_array_type(f.type)
+        }
+
+    def _template(self, prefix: str, keys: Tuple[str, ...]) -> str:
+        # A %-format string for the whole message, filled in one call when values arrive in declaration order
+        def escape(text: str) -> str:
+            return text.replace('%', '%%')
+        args = escape(self.delimiter).join([escape(key + self.assigner) + '%s' for key in keys])
+        return escape(prefix) + args + escape(self.suffix)
+
+    def encode(self, values: Mapping[str, Stringable | str], is_request=True) -> bytes:
         if is_request:
-            r = 'Request'
+            keys, template, prefix = self.request_keys, self.request_template, self.request_prefix
+            formatters = self.request_formatters
         else:
-            r = 'Response'
-        encoded_function = exchange.identifier() + r
-        encoded_string = encoded_function + '(' + encoded_args + ')' + AsciiEncoding.exchange_terminator
-        return encoded_string.encode('ascii')
+            keys, template, prefix = self.response_keys, self.response_template, self.response_prefix
+            formatters = self.response_formatters
+        if formatters:
+            values = {key: formatters[key](val) if key in formatters else val for key, val in values.items()}
+        if tuple(values) == keys:
+            return (template % tuple(values.values())).encode('ascii')
+        if len(values) == len(keys) and all(key in values for key in keys):
+            # Generated firmware reads each argument from its declared slot first, so keep declaration order
+            return (template % tuple(values[key] for key in keys)).encode('ascii')
 
-    @staticmethod
-    def decode(exchange: Type[Exchange], contents: bytes) -> DecodedExchange:
+        # Values for fields the exchange does not declare (or missing some it does) are encoded as given
+        assigner = self.assigner
+        encoded_args = self.delimiter.join([f'{key}{assigner}{val}' for key, val in values.items()])
+        return (prefix + encoded_args + self.suffix).encode('ascii')
+
+    def decode(self, contents: bytes) -> DecodedExchange:
         decoded_str = contents.decode('ascii')
-        decoded_args = AsciiEncoding._decode_args(contents=decoded_str, exchange=exchange)
-        decoded_name = AsciiEncoding._decode_name(contents=decoded_str)
-        return DecodedExchange(name=decoded_name, values=decoded_args)
+        begin = decoded_str.index(self.beginner)
+        end = decoded_str.index(self.ender, begin)
+        decoded_name = decoded_str[:begin]
+        if decoded_name == 'ErrorResponse':
+            # Error messages are free text and may themselves contain delimiters, so they are not split
+            inner_string = decoded_str[begin + 1:decoded_str.rindex(self.ender)]
+            key, assigner, msg = inner_string.partition(self.assigner)
+            return DecodedExchange(name=decoded_name, values={'msg': msg if assigner else key})
 
-    @staticmethod
-    def _encode_args(exchange: Type[Exchange], values: Mapping[str, Stringable | str]) -> str:
-        encoded_args = ''
-        for key, val in values.items():
-            encoded_args += f'{key}{AsciiEncoding.argument_assigner}{val}{AsciiEncoding.argument_delimiter}'
-        encoded_args = encoded_args.removesuffix(AsciiEncoding.argument_delimiter)
-        return encoded_args
+        converters = self.response_converters if decoded_name.endswith('Response') else self.request_converters
+        values = {}
+        if end > begin + 1:
+            for arg in decoded_str[begin + 1:end].split(self.delimiter):
+                key, value = arg.split(self.assigner)
+                try:
+                    converter = converters[key]
+                except KeyError:
+                    raise FieldNotFoundError(f'Could not find field {key} in {decoded_name}') from None
+                values[key] = converter(value)
+        return DecodedExchange(name=decoded_name, values=values)
 
-    @staticmethod
-    def _arg_string(contents: str) -> str:
-        start = contents.index(AsciiEncoding.argument_beginner)
-        stop = contents.index(AsciiEncoding.argument_ender)
-        return contents[start+1:stop]
 
-    @staticmethod
-    def _decode_args(exchange: Type[Exchange], contents: str, request=True) -> Dict[str, Stringable | str]:
-        inner_string = AsciiEncoding._arg_string(contents=contents)
-        args = inner_string.split(AsciiEncoding.argument_delimiter) if inner_string else []
-        values = {}
-        if request:
-            decode_fields = fields(exchange.Request)
+def ascii_converter(field_type: type, encoding: Type[AsciiEncoding] = AsciiEncoding) -> Callable[[str], Any]:
+    if is_array_type(field_type):
+        return ascii_array_converter(field_type, encoding)
+    if field_type is bool:
+        # bool('0') is True, so parse the spellings Arduino's Serial.print and python's str() produce
+        return lambda value: value not in ('0', 'False', 'false')
+    return field_type
+
+
+def ascii_array_converter(array_type: type, encoding: Type[AsciiEncoding]) -> Callable[[str], Any]:
+    delimiter = encoding.array_delimiter
+    if np is None:
+        convert = ascii_converter(array_type.element_type)
+        return lambda value: [convert(element) for element in value.split(delimiter) if element]
+
+    # Parses the whole array in one vectorized call
+    dtype = np.dtype(NUMPY_DTYPES[array_type.element_type])
+    return lambda value: np.fromstring(value, dtype=dtype, sep=delimiter)
+
+
+def ascii_array_formatter(array_type: type, encoding: Type[AsciiEncoding]) -> Callable[[Sequence], str]:
+    delimiter = encoding.array_delimiter
+    if array_type.element_type is bool:
+        def format_element(element) -> str:
+            return '1' if element else '0'
+    else:
+        format_element = str
+
+    def format_array(value: Sequence) -> str:
+        check_array_length(array_type=array_type, value=value)
+        return delimiter.join(map(format_element, value))
+    return format_array
+
+
+_ASCII_CODECS: Dict[Tuple[type, type], AsciiCodec] = {}
+
+
+def ascii_codec(encoding: Type[AsciiEncoding], exchange: Type[Exchange]) -> AsciiCodec:
+    # A plain dict rather than lru_cache, since this lookup sits on the per-message path
+    try:
+        return _ASCII_CODECS[encoding, exchange]
+    except KeyError:
+        codec = _ASCII_CODECS[encoding, exchange] = AsciiCodec(encoding=encoding, exchange=exchange)
+        return codec
+
+
+class MessageKind:
+    REQUEST = 0x00
+    RESPONSE = 0x01
+    STREAM_REQUEST = 0x02
+    STOP_REQUEST = 0x04
+    STOP_RESPONSE = 0x05
+    ERROR_RESPONSE = 0x7F
+
+
+def message_kind(exchange: Type[Exchange], is_request: bool) -> int:
+    # Stream control exchanges (see dynamics.stream_start_exchange) travel under the id of the exchange they control,
+    # distinguished by their kind
+    stream_control = getattr(exchange, 'stream_control', None)
+    if stream_control == 'start':
+        return MessageKind.STREAM_REQUEST
+    if stream_control == 'stop':
+        return MessageKind.STOP_REQUEST if is_request else MessageKind.STOP_RESPONSE
+    return MessageKind.REQUEST if is_request else MessageKind.RESPONSE
+
+
+def ascii_opcode(encoding: Type[AsciiEncoding], exchange: Type[Exchange]) -> str:
+    if exchange.exchange_id is None:
+        raise ContractError(f'Exchange {exchange.identifier()} has no exchange_id. Was apply_defaults run?')
+    opcode = f'{encoding.opcode_prefix}{exchange.exchange_id}'
+    kind = message_kind(exchange, is_request=True)
+    if kind != MessageKind.REQUEST:
+        opcode += f'{encoding.opcode_kind_separator}{kind}'
+    return opcode
+
+
+class BinaryEncoding(Encoding):
+    """
+    Compact binary encoding. Each message is [exchange_id: u8][kind: u8] followed by the fields of the request or
+    response in declaration order, packed little-endian with the widths in field_formats. Strings are a u8 length
+    followed by UTF-8 bytes, and arrays a u16 element count followed by the packed elements. Messages are COBS-framed, so the zero byte only ever appears as the terminator.
+
+    Field widths must match on both ends. The defaults use 32-bit floats because double is 32 bits on AVR; override
+    field_formats in your contract's Encoding subclass for targets with 64-bit doubles.
+    """
+    argument_delimiter = b''
+    argument_beginner = b''
+    argument_ender = b''
+    argument_assigner = b''
+    exchange_terminator = b'\x00'
+    field_formats: Dict[type, str] = {int: 'i', float: 'f', bool: '?'}
+    max_string_length = 255
+    array_length_format = 'H'
+
+    @classmethod
+    def encode(cls, exchange: Type[Exchange], values: Mapping[str, Any], is_request=True) -> bytes:
+        exchange_id, kind = cls._header(exchange=exchange, is_request=is_request)
+        message = bytearray((exchange_id, kind))
+        message_fields = fields(exchange.Request) if is_request else fields(exchange.Response)
+        for field in message_fields:
+            try:
+                value = values[field.name]
+            except KeyError:
+                raise FieldNotFoundError(f'Missing value for field {field.name} of {exchange.identifier()}') from None
+            message += cls._pack(field_type=field.type, value=value)
+        return cobs_encode(bytes(message)) + cls.exchange_terminator
+
+    @classmethod
+    def decode(cls, exchange: Type[Exchange], contents: bytes) -> DecodedExchange:
+        message = cobs_decode(contents.removesuffix(cls.exchange_terminator))
+        exchange_id, kind = message[0], message[1]
+        if kind == MessageKind.ERROR_RESPONSE:
+            msg, _ = cls._unpack(field_type=str, message=message, offset=2)
+            return DecodedExchange(name='ErrorResponse', values={'msg': msg})
+
+        if exchange_id != exchange.exchange_id:
+            raise ValueError(
+                f'Received message for exchange id {exchange_id} while decoding {exchange.identifier()} '
+                f'(id {exchange.exchange_id})'
+            )
+
+        if kind == MessageKind.REQUEST:
+            name, message_fields = exchange.identifier() + 'Request', fields(exchange.Request)
+        elif kind == MessageKind.RESPONSE:
+            name, message_fields = exchange.identifier() + 'Response', fields(exchange.Response)
+        elif kind == MessageKind.STOP_RESPONSE:
+            # Streams decode their stop acknowledgement against the streaming exchange, not the stop exchange
+            stop_identifier = exchange.identifier()
+            if getattr(exchange, 'stream_control', None) != 'stop':
+                stop_identifier += 'Stop'
+            name, message_fields = stop_identifier + 'Response', ()
         else:
-            decode_fields = fields(exchange.Response)
+            raise ValueError(f'Unexpected message kind {kind} while decoding {exchange.identifier()}')
 
-        for arg in args:
-            key, value = arg.split(AsciiEncoding.argument_assigner)
-            target_type = AsciiEncoding._lookup_field_type(name=key, available_fields=decode_fields)
-            values[key] = target_type(value)
+        values = {}
+        offset = 2
+        for field in message_fields:
+            values[field.name], offset = cls._unpack(field_type=field.type, message=message, offset=offset)
+        return DecodedExchange(name=name, values=values)
 
-        return values
+    @classmethod
+    def field_format(cls, field_type: type) -> str:
+        if field_type is str:
+            return 's'
+        try:
+            return cls.field_formats[field_type]
+        except KeyError:
+            raise ContractError(f'{cls.__name__} has no binary format for type {field_type}') from None
 
     @staticmethod
-    def _lookup_field_type(name: str, available_fields: Collection[Field]):
-        for field in available_fields:
-            if field.name == name:
-                return field.type
-        raise FieldNotFoundError('Could not find field {name} in exchange')
+    def _header(exchange: Type[Exchange], is_request: bool) -> Tuple[int, int]:
+        if exchange.exchange_id is None:
+            raise ContractError(f'Exchange {exchange.identifier()} has no exchange_id. Was apply_defaults run?')
+        return exchange.exchange_id, message_kind(exchange, is_request=is_request)
+
+    @classmethod
+    def _pack(cls, field_type: type, value: Any) -> bytes:
+        if is_array_type(field_type):
+            return cls._pack_array(array_type=field_type, value=value)
+        field_format = cls.field_format(field_type)
+        if field_format == 's':
+            encoded = str(value).encode('utf-8')[:cls.max_string_length]
+            return bytes((len(encoded),)) + encoded
+        return struct.pack('<' + field_format, value)
+
+    @classmethod
+    def _unpack(cls, field_type: type, message: bytes, offset: int) -> Tuple[Any, int]:
+        if is_array_type(field_type):
+            return cls._unpack_array(array_type=field_type, message=message, offset=offset)
+        field_format = cls.field_format(field_type)
+        if field_format == 's':
+            length = message[offset]
+            start = offset + 1
+            return message[start:start + length].decode('utf-8'), start + length
+        (value,) = struct.unpack_from('<' + field_format, message, offset)
+        return value, offset + struct.calcsize('<' + field_format)
+
+    @classmethod
+    def _pack_array(cls, array_type: type, value: Sequence) -> bytes:
+        check_array_length(array_type=array_type, value=value)
+        element_format = cls.field_format(array_type.element_type)
+        header = struct.pack('<' + cls.array_length_format, len(value))
+        if np is not None:
+            return header + np.asarray(value, dtype=STRUCT_DTYPES[element_format]).tobytes()
+        return header + struct.pack(f'<{len(value)}{element_format}', *value)
+
+    @classmethod
+    def _unpack_array(cls, array_type: type, message: bytes, offset: int) -> Tuple[Any, int]:
+        element_format = cls.field_format(array_type.element_type)
+        (length,) = struct.unpack_from('<' + cls.array_length_format, message, offset)
+        start = offset + struct.calcsize('<' + cls.array_length_format)
+        end = start + length * struct.calcsize('<' + element_format)
+        if end > len(message):
+            raise ValueError(f'Array of {length} elements runs past the end of the message')
+        if np is not None:
+            # Copied so the array is writable and does not keep the whole message alive
+            return np.frombuffer(message, dtype=STRUCT_DTYPES[element_format], count=length, offset=start).copy(), end
+        return list(struct.unpack_from(f'<{length}{element_format}', message, start)), end
+
+
+# numpy equivalents of the struct formats, which are not the same letters for every width
+STRUCT_DTYPES = {
+    '?': '<b1', 'b': '<i1', 'B': '<u1', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4', 'l': '<i4', 'L': '<u4',
+    'q': '<i8', 'Q': '<u8', 'f': '<f4', 'd': '<f8',
+}
+
+
+def check_array_length(array_type: type, value: Sequence) -> None:
+    if len(value) > array_type.max_length:
+        raise ValueError(f'{len(value)} elements do not fit in {array_type.__name__}')
+
+
+def cobs_encode(data: bytes) -> bytes:
+    """
+    Consistent Overhead Byte Stuffing: removes every zero byte from data at a cost of at most one byte per 254.
+    """
+    encoded = bytearray()
+    for block in _cobs_blocks(data):
+        encoded.append(len(block) + 1)
+        encoded += block
+    return bytes(encoded)
+
+
+def _cobs_blocks(data: bytes):
+    # Split on zeros, then split runs longer than 254 bytes, which are encoded without an implied trailing zero
+    for chunk in data.split(b'\x00'):
+        while len(chunk) >= 254:
+            yield chunk[:254]
+            chunk = chunk[254:]
+        yield chunk
 
-    @staticmethod
-    def _decode_name(contents: str) -> str:
-        end = contents.index(AsciiEncoding.argument_beginner)
-        return contents[:end]
 
+def cobs_decode(data: bytes) -> bytes:
+    decoded = bytearray()
+    position = 0
+    while position < len(data):
+        code = data[position]
+        if code == 0:
+            raise ValueError('Zero byte found inside COBS-encoded data')
+        block = data[position + 1:position + code]
+        decoded += block
+        position += code
+        if code < 0xFF and position < len(data):
+            decoded.append(0)
+    return bytes(decoded)
@@ -16,4 +16,13 @@ class Channel:
         write_bytes = "Serial.print"
         read_until = "Serial.read"
 
-# TODO: Add example for how to add a device-initiated exchange
+
+# Streaming exchanges are sent continuously by the device at a rate chosen by the host, until the host stops them.
+class SampleVoltage:
+    streaming = True
+
+    class Request:
+        channel: int
+
+    class Response:
+        voltage: float
@@ -1 +1,12 @@
-from hardsync.generators.arduino.arduino import generate
\ No newline at end of file
+from typing import Type, List
+from hardsync.interfaces import Contract, TypeMapping
+from hardsync.encodings import BinaryEncoding
+from hardsync.types import PopulatedFile
+from hardsync.defaults import DEFAULT_ENCODING
+from hardsync.generators.arduino import arduino, binary
+
+
+def generate(contract: Contract, type_mapping: Type[TypeMapping]) -> List[PopulatedFile]:
+    if issubclass(getattr(contract, 'Encoding', DEFAULT_ENCODING), BinaryEncoding):
+        return binary.generate(contract=contract, type_mapping=type_mapping)
+    return arduino.generate(contract=contract, type_mapping=type_mapping)
@@ -1,36 +1,92 @@
 from pathlib import Path
 import os
 import inspect
-from typing import Type, List
+import hardsync
+from typing import Type, List, Tuple
 from hardsync.interfaces import Exchange, TypeMapping, Channel, Contract
-from hardsync.types import PopulatedFile
-from hardsync.generators.common import convert_case, CaseType, populate_template
+from hardsync.types import PopulatedFile, is_array_type
+from hardsync.generators.common import convert_case, CaseType, load_template
 from hardsync.generators.common import Language, ARDUINO_INDENT, CPP_INDENT
+from hardsync.defaults import Ping, Describe, DEFAULT_ENCODING
+from hardsync.encodings import AsciiEncoding
 from hardsync.utils import flatten
-from hardsync.dynamics import get_exchanges
+from hardsync.dynamics import get_exchanges, stream_start_exchange, stream_stop_exchange, STREAM_PERIOD_FIELD
+from hardsync.manifest import contract_hash
 from dataclasses import fields
 from types import ModuleType
 
 dir_name = Path(os.path.dirname(os.path.abspath(__file__)))
 TEMPLATE_DIR = dir_name / 'templates'
 
+FNV_OFFSET_BASIS = 0x811C9DC5
+FNV_PRIME = 0x01000193
+# Longest text the client sends for a value: a 64-bit integer, a float's repr (e.g. -1.7976931348623157e+308), False
+ASCII_VALUE_LENGTHS = {int: 20, float: 24, bool: 5}
+# Longest text the device prints for a value: a 32-bit integer, or a float with two decimals up to 4294967040
+DEVICE_VALUE_LENGTHS = {int: 11, float: 14, bool: 1}
+# Room for a malformed request to be echoed back in a useful ErrorResponse
+MIN_MESSAGE_LENGTH = 64
+
+
+def parameter_declarations(message_fields, type_mapping: Type[TypeMapping]) -> List[str]:
+    # Arrays are passed as a pointer to their elements followed by the number of elements
+    parameters = []
+    for field in message_fields:
+        if is_array_type(field.type):
+            parameters.append(f"const {type_mapping[field.type.element_type]}* {field.name}")
+            parameters.append(f"size_t {field.name}_length")
+        else:
+            parameters.append(f"{type_mapping[field.type]} {field.name}")
+    return parameters
+
+
+def argument_names(message_fields) -> List[str]:
+    names = []
+    for field in message_fields:
+        names.append(field.name)
+        if is_array_type(field.type):
+            names.append(f"{field.name}_length")
+    return names
+
+
+def returns_struct(exchange: Type[Exchange]) -> bool:
+    response_fields = fields(exchange.Response)
+    return len(response_fields) > 1 or any(is_array_type(field.type) for field in response_fields)
 
-def virtual_declaration(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> List[str]:
-    function_name = convert_case(exchange.identifier(), CaseType.CAMEL_CASE)
-    cpp_code = "virtual "
 
+def response_type(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> str:
     response_fields = fields(exchange.Response)
-    if len(response_fields) > 1:
-        raise AssertionError(f"Unspported number of response fields: {len(fields(exchange.Response))} only support 1 field")
-
+    if returns_struct(exchange):
+        return f"{exchange.identifier()}Response"
     if len(response_fields) == 1:
-        response_field = fields(exchange.Response)[0]
-        cpp_code += type_mapping[response_field.type] + " "
-    else:
-        cpp_code += "void "
+        return type_mapping[response_fields[0].type]
+    return type_mapping[None]
+
+
+def response_struct(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> List[str]:
+    """
+    Responses with several fields, or with arrays, are returned from the user's function as a struct, since C++
+    functions can only return one value and cannot return arrays. For arrays, the user fills in the elements and sets
+    <name>_length to the number of elements used.
+    """
+    lines = [f"struct {exchange.identifier()}Response {{"]
+    for field in fields(exchange.Response):
+        if is_array_type(field.type):
+            lines.append(f"{CPP_INDENT}{type_mapping[field.type.element_type]} {field.name}[{field.type.max_length}];")
+            lines.append(f"{CPP_INDENT}size_t {field.name}_length;")
+        else:
+            lines.append(f"{CPP_INDENT}{type_mapping[field.type]} {field.name};")
+    lines.append("};")
+    lines.append("")
+    return lines
+
+
+def virtual_declaration(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> List[str]:
+    function_name = convert_case(exchange.identifier(), CaseType.CAMEL_CASE)
+    cpp_code = f"virtual {response_type(exchange, type_mapping)} "
 
     cpp_code += f"{function_name}("
-    cpp_code += ', '.join([f"{type_mapping[field.type]} {field.name}" for field in fields(exchange.Request)])
+    cpp_code += ', '.join(parameter_declarations(fields(exchange.Request), type_mapping))
 
     cpp_code += ") const;"
     return [cpp_code]
@@ -41,7 +97,7 @@ def wrapper_declaration(exchange: Type[Exchange], type_mapping: Type[TypeMapping
     cpp_code = "void "
 
     cpp_code += f"{function_name}Wrapper("
-    cpp_code += ', '.join([f"{type_mapping[field.type]} {field.name}" for field in fields(exchange.Request)])
+    cpp_code += ', '.join(parameter_declarations(fields(exchange.Request), type_mapping))
 
     cpp_code += ") const;"
     return [cpp_code]
@@ -50,17 +106,9 @@ def wrapper_declaration(exchange: Type[Exchange], type_mapping: Type[TypeMapping
 def core_implementation(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> List[str]:
     function_name = convert_case(exchange.identifier(), CaseType.CAMEL_CASE)
     lines = []
-    response_fields = fields(exchange.Response)
-    if len(response_fields) > 1:
-        raise AssertionError("TO BE IMPLEMENTED: Response that supports more than one value")
-
-    if len(response_fields) == 0:
-        function_type = None
-    elif len(response_fields) == 1:
-        function_type = fields(exchange.Response)[0].type
 
-    line1 = f"{type_mapping[function_type]} {function_name}("
-    line1 += ', '.join([f"{type_mapping[field.type]} {field.name}" for field in fields(exchange.Request)])
+    line1 = f"{response_type(exchange, type_mapping)} {function_name}("
+    line1 += ', '.join(parameter_declarations(fields(exchange.Request), type_mapping))
     line1 += ") const {"
     lines.append(line1)
     lines.append(CPP_INDENT + '// YOUR CODE GOES HERE')
@@ -69,63 +117,215 @@ def core_implementation(exchange: Type[Exchange], type_mapping: Type[TypeMapping
     return lines
 
 
+def name_hash(name: str) -> int:
+    """
+    32-bit FNV-1a hash of a message name. Must match hashName() in parser.cpp, which the firmware uses to look up the
+    opcode of a name-based request with a switch instead of comparing against every request name.
+    """
+    value = FNV_OFFSET_BASIS
+    for byte in name.encode('ascii'):
+        value = ((value ^ byte) * FNV_PRIME) & 0xFFFFFFFF
+    return value
+
+
+def request_opcodes(exchange: Type[Exchange]) -> List[Tuple[str, int, str]]:
+    opcodes = [(f'{exchange.identifier()}Request', exchange.exchange_id, 'KIND_REQUEST')]
+    if exchange.streaming:
+        opcodes.append((f'{stream_start_exchange(exchange).identifier()}Request', exchange.exchange_id,
+                        'KIND_STREAM_REQUEST'))
+        opcodes.append((f'{stream_stop_exchange(exchange).identifier()}Request', exchange.exchange_id,
+                        'KIND_STOP_REQUEST'))
+    return opcodes
+
+
+def opcode_lookups(exchanges: List[Type[Exchange]]) -> List[str]:
+    names_by_hash = {}
+    built_in = [Ping, Describe]
+    opcodes = flatten([request_opcodes(ex) for ex in built_in + [ex for ex in exchanges if ex not in built_in]])
+    for name, exchange_id, kind in opcodes:
+        names_by_hash.setdefault(name_hash(name), []).append((name, exchange_id, kind))
+
+    lines = []
+    for hash_value, names in names_by_hash.items():
+        lines.append(f'case {hash_value:#010x}UL:')
+        # Any name can collide with a request name, so the hash only narrows the lookup down to one comparison
+        for name, exchange_id, kind in names:
+            lines.append(f'{CPP_INDENT}if (strcmp(name, "{name}") == 0) return {{{exchange_id}, {kind}}};')
+        lines.append(f'{CPP_INDENT}break;')
+    return lines
+
+
 def respond_invocation(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> List[str]:
     class_name = exchange.identifier()
     function_name = convert_case(class_name, to_case=CaseType.CAMEL_CASE)
-    lines = []
+    indent = CPP_INDENT * 2
+    lines = [
+        f'case {exchange.exchange_id}:',
+        f'{CPP_INDENT}if (opcode.kind == KIND_REQUEST) {{',
+    ]
+
+    # Field order is fixed by the contract, so each argument is read from its slot rather than searched for by name
+    for index, field in enumerate(fields(exchange.Request)):
+        if is_array_type(field.type):
+            element_type = type_mapping[field.type.element_type]
+            lines.append(f'{indent}{element_type} {field.name}[{field.type.max_length}];')
+            lines.append(
+                f'{indent}size_t {field.name}_length = extract{element_type.capitalize()}Array'
+                f'(&fn, {index}, "{field.name}", {field.name}, {field.type.max_length});'
+            )
+            continue
 
-    lines.append(f'}} else if (fn.name == "{class_name}Request") {{')
+        lines.append(
+            f'{indent}{type_mapping[field.type]} {field.name} = extract'
+            f'{type_mapping[field.type].capitalize()}(&fn, {index}, "{field.name}");'
+        )
 
+    lines.append(f'{indent}this->{function_name}Wrapper({", ".join(argument_names(fields(exchange.Request)))});')
+
+    if exchange.streaming:
+        lines += stream_respond_invocation(exchange=exchange, type_mapping=type_mapping)
+
+    lines += [
+        f'{CPP_INDENT}}} else {{',
+        f'{indent}this->unidentifiedCommand(fn.name);',
+        f'{CPP_INDENT}}}',
+        f'{CPP_INDENT}break;',
+    ]
+    return lines
+
+
+def stream_member(exchange: Type[Exchange], name: str) -> str:
+    return convert_case(exchange.identifier(), CaseType.CAMEL_CASE) + convert_case(name, CaseType.PASCAL_CASE)
+
+
+def stream_declaration(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> List[str]:
+    lines = [
+        f'bool {stream_member(exchange, "streaming")} = false;',
+        f'unsigned long {stream_member(exchange, "period_us")} = 0;',
+        f'unsigned long {stream_member(exchange, "last_sample_us")} = 0;',
+    ]
     for field in fields(exchange.Request):
+        lines.append(f'{type_mapping[field.type]} {stream_member(exchange, field.name)};')
+    return lines
+
 
+def stream_respond_invocation(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> List[str]:
+    stop_name = stream_stop_exchange(exchange).identifier()
+    period = stream_member(exchange, 'period_us')
+    indent = CPP_INDENT * 2
+    lines = [f'{CPP_INDENT}}} else if (opcode.kind == KIND_STREAM_REQUEST) {{']
+
+    # The period comes first, followed by the exchange's own request fields
+    lines.append(f'{indent}this->{period} = extractLong(&fn, 0, "{STREAM_PERIOD_FIELD}");')
+    for index, field in enumerate(fields(exchange.Request), start=1):
         lines.append(
-            f'{ARDUINO_INDENT}{type_mapping[field.type]} {field.name} = extract'
-            f'{type_mapping[field.type].capitalize()}(&fn, "{field.name}");'
+            f'{indent}this->{stream_member(exchange, field.name)} = extract'
+            f'{type_mapping[field.type].capitalize()}(&fn, {index}, "{field.name}");'
         )
+    # Backdate the last sample so the first one is sent on the next loop()
+    lines.append(f'{indent}this->{stream_member(exchange, "last_sample_us")} = micros() - this->{period};')
+    lines.append(f'{indent}this->{stream_member(exchange, "streaming")} = true;')
+
+    lines.append(f'{CPP_INDENT}}} else if (opcode.kind == KIND_STOP_REQUEST) {{')
+    lines.append(f'{indent}this->{stream_member(exchange, "streaming")} = false;')
+    lines.append(f'{indent}Serial.print("{stop_name}Response()" EXCHANGE_TERMINATOR);')
+    return lines
 
-    lines.append(f'{ARDUINO_INDENT}this->{function_name}Wrapper'
-                 f'({", ".join([field.name for field in fields(exchange.Request)])});')
 
+def stream_implementation(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> List[str]:
+    function_name = convert_case(exchange.identifier(), CaseType.CAMEL_CASE)
+    last_sample = stream_member(exchange, 'last_sample_us')
+    period = stream_member(exchange, 'period_us')
+    arguments = ", ".join([f"this->{stream_member(exchange, field.name)}" for field in fields(exchange.Request)])
+    lines = [
+        f'if (this->{stream_member(exchange, "streaming")} && micros() - this->{last_sample} >= this->{period}) {{',
+        f'{CPP_INDENT}this->{last_sample} += this->{period};',
+        f'{CPP_INDENT}this->{function_name}Wrapper({arguments});',
+        '}',
+    ]
     return lines
 
 
-def wrapper_implementation(exchange: Type[Exchange], type_mapping: Type[TypeMapping]) -> List[str]:
-    if len(fields(exchange.Response)) > 1:
-        raise AssertionError("TO BE IMPLEMENTED: Response cannot have more than one field.")
+def response_value_length(field_type: type, encoding: Type[AsciiEncoding]) -> int:
+    if is_array_type(field_type):
+        element_length = response_value_length(field_type.element_type, encoding) + len(encoding.array_delimiter)
+        return field_type.max_length * element_length
+    return DEVICE_VALUE_LENGTHS.get(field_type, encoding.max_string_length)
+
 
+def response_length(exchange: Type[Exchange], encoding: Type[AsciiEncoding]) -> int:
+    """
+    The longest response for exchange the device can send, including the terminator.
+    """
+    length = len(f'{exchange.identifier()}Response') + len(encoding.argument_beginner)
+    for field in fields(exchange.Response):
+        length += len(field.name) + len(encoding.argument_assigner) + response_value_length(field.type, encoding)
+        length += len(encoding.argument_delimiter)
+    return length + len(encoding.argument_ender) + len(encoding.exchange_terminator)
+
+
+def wrapper_implementation(
+        exchange: Type[Exchange], type_mapping: Type[TypeMapping], encoding: Type[AsciiEncoding] = DEFAULT_ENCODING
+) -> List[str]:
     class_name = exchange.identifier()
     function_name = convert_case(class_name, CaseType.CAMEL_CASE)
-    request_fields = ", ".join(
-        [f"{type_mapping[field.type]} {field.name}" for field in fields(exchange.Request)]
-    )
-    response_fields = ", ".join(
-        [f"{type_mapping[field.type]} {field.name}" for field in fields(exchange.Response)]
-    )
-
-    request_field_names = ", ".join([f"{field.name}" for field in fields(exchange.Request)])
+    request_fields = ", ".join(parameter_declarations(fields(exchange.Request), type_mapping))
+    request_field_names = ", ".join(argument_names(fields(exchange.Request)))
     lines = []
 
     lines.append(f'void Client::{function_name}Wrapper({request_fields}) const {{')
-    line = f'{CPP_INDENT}{response_fields}'
-    if response_fields:
-        line += ' = '
+    if returns_struct(exchange):
+        line = f'{CPP_INDENT}{response_type(exchange, type_mapping)} response = '
+        prefix = 'response.'
+    else:
+        line = f'{CPP_INDENT}{", ".join(parameter_declarations(fields(exchange.Response), type_mapping))}'
+        if fields(exchange.Response):
+            line += ' = '
+        prefix = ''
     line += f'this->{function_name}({request_field_names});'
     lines.append(line)
 
-    lines.append(f'{CPP_INDENT}Serial.print("{class_name}Response");')
-    lines.append(f'{CPP_INDENT}Serial.print(ARGUMENT_BEGINNER);')
-
-    for field in fields(exchange.Response):
-        lines.append(f'{CPP_INDENT}Serial.print("{field.name}");')
-        lines.append(f'{CPP_INDENT}Serial.print(ARGUMENT_ASSIGNER);')
-        lines.append(f'{CPP_INDENT}Serial.print({field.name});')
-        lines.append(f'{CPP_INDENT}Serial.print(ARGUMENT_ENDER);')
-
-    lines.append(f'{CPP_INDENT}Serial.print(EXCHANGE_TERMINATOR);')
+    response_fields = fields(exchange.Response)
+    if not response_fields:
+        lines.append(
+            f'{CPP_INDENT}Serial.print("{class_name}Response" ARGUMENT_BEGINNER ARGUMENT_ENDER EXCHANGE_TERMINATOR);'
+        )
+        lines.append('}')
+        return lines
+
+    # The response is formatted into one buffer and sent with a single write. Literal text is joined by the compiler.
+    lines.append(f'{CPP_INDENT}char buffer[{response_length(exchange, encoding)}];')
+    lines.append(f'{CPP_INDENT}ResponseWriter writer = {{buffer, sizeof(buffer), 0}};')
+    for i, field in enumerate(response_fields):
+        text = f'"{class_name}Response" ARGUMENT_BEGINNER' if i == 0 else 'ARGUMENT_DELIMITER'
+        lines.append(f'{CPP_INDENT}writeText(&writer, {text} "{field.name}" ARGUMENT_ASSIGNER);')
+        if is_array_type(field.type):
+            lines += [
+                f'{CPP_INDENT}for (size_t i = 0; i < {prefix}{field.name}_length; i++) {{',
+                f'{CPP_INDENT * 2}if (i > 0) {{',
+                f'{CPP_INDENT * 3}writeText(&writer, ARRAY_DELIMITER);',
+                f'{CPP_INDENT * 2}}}',
+                f'{CPP_INDENT * 2}writeValue(&writer, {prefix}{field.name}[i]);',
+                f'{CPP_INDENT}}}',
+            ]
+        else:
+            lines.append(f'{CPP_INDENT}writeValue(&writer, {prefix}{field.name});')
+
+    lines.append(f'{CPP_INDENT}writeEnd(&writer, ARGUMENT_ENDER EXCHANGE_TERMINATOR);')
+    lines.append(f'{CPP_INDENT}Serial.write((const uint8_t*) buffer, writer.length);')
     lines.append('}')
     return lines
 
 
+def describe_constants(contract: Contract) -> List[str]:
+    # What the firmware answers to Describe, so discovery can tell which contract a device runs
+    return [
+        f'#define DESCRIBE_EXCHANGE_ID {Describe.exchange_id}',
+        f'#define CONTRACT_HASH "{contract_hash(contract)}"',
+        f'#define HARDSYNC_VERSION "{hardsync.__version__}"',
+    ]
+
+
 def serial_begin(channel: Type[Channel]) -> List[str]:
     lines = [
         f"Serial.begin({channel.baud_rate});"
@@ -136,18 +336,25 @@ def serial_begin(channel: Type[Channel]) -> List[str]:
 def populate_client_template_cpp(contract: Contract, type_mapping: Type[TypeMapping]) -> str:
     file_path = TEMPLATE_DIR / 'client.cpp'
     exchanges = get_exchanges(contract)
-    wrapper_implementations = flatten([wrapper_implementation(ex, type_mapping=type_mapping) for ex in exchanges])
+    encoding = getattr(contract, 'Encoding', DEFAULT_ENCODING)
+    wrapper_implementations = flatten(
+        [wrapper_implementation(ex, type_mapping=type_mapping, encoding=encoding) for ex in exchanges]
+    )
+    streaming_exchanges = [ex for ex in exchanges if ex.streaming]
     respond_invocations = flatten([respond_invocation(ex, type_mapping=type_mapping) for ex in exchanges])
+    stream_implementations = flatten(
+        [stream_implementation(ex, type_mapping=type_mapping) for ex in streaming_exchanges]
+    )
     serial_begins = serial_begin(contract.Channel)
     replacements = {
         'wrapper_implementations': wrapper_implementations,
         'respond_invocations': respond_invocations,
+        'opcode_lookups': opcode_lookups(exchanges),
+        'stream_implementations': stream_implementations,
         'serial_begin': serial_begins,
+        'describe_constants': describe_constants(contract),
     }
-    with open(file_path, 'r') as file:
-        template = file.read()
-        populated_template = populate_template(template=template, replacements=replacements, language=Language.CPP)
-        return populated_template
+    return load_template(file_path, language=Language.CPP).render(replacements)
 
 
 def populate_client_template_h(contract: Contract, type_mapping: Type[TypeMapping]) -> str:
@@ -155,28 +362,71 @@ def populate_client_template_h(contract: Contract, type_mapping: Type[TypeMappin
     exchanges = get_exchanges(contract)
     virtual_declarations = flatten([virtual_declaration(exchange=ex, type_mapping=type_mapping) for ex in exchanges])
     wrapper_declarations = flatten([wrapper_declaration(exchange=ex, type_mapping=type_mapping) for ex in exchanges])
+    stream_declarations = flatten(
+        [stream_declaration(exchange=ex, type_mapping=type_mapping) for ex in exchanges if ex.streaming]
+    )
+    response_structs = flatten(
+        [response_struct(exchange=ex, type_mapping=type_mapping) for ex in exchanges if returns_struct(ex)]
+    )
     replacements = {
+        'response_structs': response_structs,
         'virtual_declarations': virtual_declarations,
         'wrapper_declarations': wrapper_declarations,
+        'stream_declarations': stream_declarations,
     }
-    with open(file_path, 'r') as file:
-        template = file.read()
-        populated_template = populate_template(template=template, replacements=replacements, language=Language.CPP)
-        return populated_template
+    return load_template(file_path, language=Language.CPP).render(replacements)
+
+
+def ascii_value_length(field_type: type, encoding: Type[AsciiEncoding]) -> int:
+    if is_array_type(field_type):
+        element_length = ascii_value_length(field_type.element_type, encoding) + len(encoding.array_delimiter)
+        return field_type.max_length * element_length
+    return ASCII_VALUE_LENGTHS.get(field_type, encoding.max_string_length)
+
+
+def request_length(exchange: Type[Exchange], encoding: Type[AsciiEncoding]) -> int:
+    """
+    The longest request for exchange the client can send, excluding the terminator.
+    """
+    length = len(f'{exchange.identifier()}Request') + len(encoding.argument_beginner) + len(encoding.argument_ender)
+    for field in fields(exchange.Request):
+        length += len(field.name) + len(encoding.argument_assigner) + ascii_value_length(field.type, encoding)
+        length += len(encoding.argument_delimiter)
+    return length
+
+
+def request_exchanges(exchanges: List[Type[Exchange]]) -> List[Type[Exchange]]:
+    # Every exchange whose request the device receives, including stream control
+    requests = []
+    for ex in exchanges:
+        requests.append(ex)
+        if ex.streaming:
+            requests += [stream_start_exchange(ex), stream_stop_exchange(ex)]
+    return requests
+
+
+def parser_limits(contract: Contract) -> List[str]:
+    encoding = getattr(contract, 'Encoding', DEFAULT_ENCODING)
+    requests = request_exchanges(get_exchanges(contract))
+    max_length = max([MIN_MESSAGE_LENGTH] + [request_length(ex, encoding) for ex in requests])
+    max_args = max([1] + [len(fields(ex.Request)) for ex in requests])
+    return [
+        f'#define MAX_ARGS {max_args}',
+        f'#define MAX_MESSAGE_LENGTH {max_length}',
+    ]
 
 
 def populate_parser_template_h(contract: Contract, type_mapping: Type[TypeMapping]) -> str:
     file_path = TEMPLATE_DIR / 'parser.h'
-    with open(file_path) as file:
-        contents = file.read()
-        return contents
+    replacements = {
+        'parser_limits': parser_limits(contract),
+    }
+    return load_template(file_path, language=Language.CPP).render(replacements)
 
 
 def populate_parser_template_cpp(contract: Contract, type_mapping: Type[TypeMapping]) -> str:
     file_path = TEMPLATE_DIR / 'parser.cpp'
-    with open(file_path) as file:
-        contents = file.read()
-        return contents
+    return load_template(file_path, language=Language.CPP).render({})
 
 
 def populate_firmware_ino(contract: Contract, type_mapping: Type[TypeMapping]) -> str:
@@ -186,10 +436,7 @@ def populate_firmware_ino(contract: Contract, type_mapping: Type[TypeMapping]) -
     replacements = {
         'core_implementations': core_implementations,
     }
-    with open(file_path) as file:
-        template = file.read()
-        populated_template = populate_template(template=template, replacements=replacements, language=Language.CPP)
-        return populated_template
+    return load_template(file_path, language=Language.CPP).render(replacements)
 
 
 def generate(contract: Contract, type_mapping: Type[TypeMapping]) -> List[PopulatedFile]:
@@ -0,0 +1,263 @@
+"""
+Firmware for contracts that use BinaryEncoding. Messages are a two-byte header (exchange id, message kind) followed by
+the packed fields, COBS-framed and terminated with a zero byte, so requests are dispatched with a switch on the id
+instead of comparing strings.
+"""
+from pathlib import Path
+import os
+import struct
+from typing import Type, List
+from hardsync.interfaces import Exchange, TypeMapping, Contract, ContractError
+from hardsync.encodings import BinaryEncoding
+from hardsync.types import PopulatedFile, is_array_type
+from hardsync.generators.common import convert_case, CaseType, load_template
+from hardsync.generators.common import Language, CPP_INDENT
+from hardsync.generators.arduino.arduino import (
+    virtual_declaration, wrapper_declaration, stream_declaration, stream_implementation, stream_member,
+    serial_begin, populate_firmware_ino, parameter_declarations, argument_names, returns_struct, response_type,
+    response_struct, describe_constants,
+)
+from hardsync.utils import flatten
+from hardsync.dynamics import get_exchanges, stream_start_exchange, STREAM_PERIOD_FIELD
+from dataclasses import fields
+
+dir_name = Path(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_DIR = dir_name / 'templates' / 'binary'
+
+# Note that double is only 4 bytes wide on AVR boards, so contracts targeting them should keep floats as 'f'
+BINARY_C_TYPES = {
+    '?': 'bool',
+    'b': 'int8_t',
+    'B': 'uint8_t',
+    'h': 'int16_t',
+    'H': 'uint16_t',
+    'i': 'int32_t',
+    'I': 'uint32_t',
+    'l': 'int32_t',
+    'L': 'uint32_t',
+    'q': 'int64_t',
+    'Q': 'uint64_t',
+    'f': 'float',
+    'd': 'double',
+}
+# Room for an ErrorResponse carrying a useful message, even when every exchange in the contract is tiny
+MIN_MESSAGE_SIZE = 64
+HEADER_SIZE = 2
+
+
+def wire_type(field_type: type, encoding: Type[BinaryEncoding]) -> str:
+    field_format = encoding.field_format(field_type)
+    try:
+        return BINARY_C_TYPES[field_format]
+    except KeyError:
+        raise ContractError(f'Binary format {field_format} has no Arduino equivalent') from None
+
+
+def message_size(message_fields, encoding: Type[BinaryEncoding]) -> int:
+    size = HEADER_SIZE
+    for field in message_fields:
+        if is_array_type(field.type):
+            element_size = struct.calcsize('<' + encoding.field_format(field.type.element_type))
+            size += struct.calcsize('<' + encoding.array_length_format) + field.type.max_length * element_size
+            continue
+
+        field_format = encoding.field_format(field.type)
+        if field_format == 's':
+            size += 1 + encoding.max_string_length
+        else:
+            size += struct.calcsize('<' + field_format)
+    return size
+
+
+def max_message_size(exchanges: List[Type[Exchange]], encoding: Type[BinaryEncoding]) -> int:
+    sizes = [MIN_MESSAGE_SIZE]
+    for ex in exchanges:
+        sizes.append(message_size(fields(ex.Request), encoding))
+        sizes.append(message_size(fields(ex.Response), encoding))
+        if ex.streaming:
+            sizes.append(message_size(fields(stream_start_exchange(ex).Request), encoding))
+    return max(sizes)
+
+
+def field_reader(field_type: type, encoding: Type[BinaryEncoding]) -> str:
+    if encoding.field_format(field_type) == 's':
+        return 'readString(&reader)'
+    return f'readField<{wire_type(field_type, encoding)}>(&reader)'
+
+
+def respond_invocation(
+        exchange: Type[Exchange], type_mapping: Type[TypeMapping], encoding: Type[BinaryEncoding]
+) -> List[str]:
+    class_name = exchange.identifier()
+    function_name = convert_case(class_name, to_case=CaseType.CAMEL_CASE)
+    indent = CPP_INDENT * 2
+    lines = [
+        f'case {exchange.exchange_id}:',
+        f'{CPP_INDENT}if (kind == KIND_REQUEST) {{',
+    ]
+    request_fields = fields(exchange.Request)
+    for field in request_fields:
+        if is_array_type(field.type):
+            lines += [
+                f'{indent}{type_mapping[field.type.element_type]} {field.name}[{field.type.max_length}];',
+                f'{indent}size_t {field.name}_length = readArray<{wire_type(field.type.element_type, encoding)}>'
+                f'(&reader, {field.name}, {field.type.max_length});',
+            ]
+        else:
+            lines.append(f'{indent}{type_mapping[field.type]} {field.name} = {field_reader(field.type, encoding)};')
+    lines += [
+        f'{indent}if (!reader.ok) {{',
+        f'{indent}{CPP_INDENT}this->badCommandFormat("Truncated {class_name}Request");',
+        f'{indent}{CPP_INDENT}break;',
+        f'{indent}}}',
+        f'{indent}this->{function_name}Wrapper({", ".join(argument_names(request_fields))});',
+    ]
+
+    if exchange.streaming:
+        lines += stream_respond_invocation(exchange=exchange, type_mapping=type_mapping, encoding=encoding)
+
+    lines += [
+        f'{CPP_INDENT}}} else {{',
+        f'{indent}this->badCommandFormat("Unexpected message kind for {class_name}");',
+        f'{CPP_INDENT}}}',
+        f'{CPP_INDENT}break;',
+    ]
+    return lines
+
+
+def stream_respond_invocation(
+        exchange: Type[Exchange], type_mapping: Type[TypeMapping], encoding: Type[BinaryEncoding]
+) -> List[str]:
+    indent = CPP_INDENT * 2
+    class_name = exchange.identifier()
+    period = stream_member(exchange, STREAM_PERIOD_FIELD)
+    request_fields = fields(stream_start_exchange(exchange).Request)
+    lines = [f'{CPP_INDENT}}} else if (kind == KIND_STREAM_REQUEST) {{']
+    lines += [
+        f'{indent}this->{stream_member(exchange, field.name)} = {field_reader(field.type, encoding)};'
+        for field in request_fields
+    ]
+    lines += [
+        f'{indent}if (!reader.ok) {{',
+        f'{indent}{CPP_INDENT}this->badCommandFormat("Truncated {class_name}StreamRequest");',
+        f'{indent}{CPP_INDENT}break;',
+        f'{indent}}}',
+        # Backdate the last sample so the first one is sent on the next loop()
+        f'{indent}this->{stream_member(exchange, "last_sample_us")} = micros() - this->{period};',
+        f'{indent}this->{stream_member(exchange, "streaming")} = true;',
+        f'{CPP_INDENT}}} else if (kind == KIND_STOP_REQUEST) {{',
+        f'{indent}this->{stream_member(exchange, "streaming")} = false;',
+        f'{indent}uint8_t message[{HEADER_SIZE}] = {{{exchange.exchange_id}, KIND_STOP_RESPONSE}};',
+        f'{indent}sendFrame(message, sizeof(message));',
+    ]
+    return lines
+
+
+def wrapper_implementation(
+        exchange: Type[Exchange], type_mapping: Type[TypeMapping], encoding: Type[BinaryEncoding]
+) -> List[str]:
+    class_name = exchange.identifier()
+    function_name = convert_case(class_name, CaseType.CAMEL_CASE)
+    request_fields = ", ".join(parameter_declarations(fields(exchange.Request), type_mapping))
+    request_field_names = ", ".join(argument_names(fields(exchange.Request)))
+    lines = []
+
+    lines.append(f'void Client::{function_name}Wrapper({request_fields}) const {{')
+    if returns_struct(exchange):
+        line = f'{CPP_INDENT}{response_type(exchange, type_mapping)} response = '
+        prefix = 'response.'
+    else:
+        line = f'{CPP_INDENT}{", ".join(parameter_declarations(fields(exchange.Response), type_mapping))}'
+        if fields(exchange.Response):
+            line += ' = '
+        prefix = ''
+    line += f'this->{function_name}({request_field_names});'
+    lines.append(line)
+
+    lines.append(f'{CPP_INDENT}uint8_t message[{message_size(fields(exchange.Response), encoding)}];')
+    lines.append(f'{CPP_INDENT}MessageWriter writer = {{message, sizeof(message), 0}};')
+    lines.append(f'{CPP_INDENT}writeField<uint8_t>(&writer, {exchange.exchange_id});')
+    lines.append(f'{CPP_INDENT}writeField<uint8_t>(&writer, KIND_RESPONSE);')
+    for field in fields(exchange.Response):
+        value = f'{prefix}{field.name}'
+        if is_array_type(field.type):
+            wire = wire_type(field.type.element_type, encoding)
+            lines.append(f'{CPP_INDENT}writeArray<{wire}>(&writer, {value}, {value}_length);')
+        elif encoding.field_format(field.type) == 's':
+            lines.append(f'{CPP_INDENT}writeString(&writer, {value});')
+        else:
+            lines.append(f'{CPP_INDENT}writeField<{wire_type(field.type, encoding)}>(&writer, {value});')
+    lines.append(f'{CPP_INDENT}sendFrame(message, writer.offset);')
+    lines.append('}')
+    return lines
+
+
+def message_size_definition(contract: Contract) -> List[str]:
+    size = max_message_size(get_exchanges(contract), encoding=contract.Encoding)
+    return [f'#define MAX_MESSAGE_SIZE {size}']
+
+
+def populate_client_template_cpp(contract: Contract, type_mapping: Type[TypeMapping]) -> str:
+    file_path = TEMPLATE_DIR / 'client.cpp'
+    encoding = contract.Encoding
+    exchanges = get_exchanges(contract)
+    wrapper_implementations = flatten(
+        [wrapper_implementation(ex, type_mapping=type_mapping, encoding=encoding) for ex in exchanges]
+    )
+    respond_invocations = flatten(
+        [respond_invocation(ex, type_mapping=type_mapping, encoding=encoding) for ex in exchanges]
+    )
+    stream_implementations = flatten(
+        [stream_implementation(ex, type_mapping=type_mapping) for ex in exchanges if ex.streaming]
+    )
+    replacements = {
+        'wrapper_implementations': wrapper_implementations,
+        'respond_invocations': respond_invocations,
+        'stream_implementations': stream_implementations,
+        'serial_begin': serial_begin(contract.Channel),
+        'describe_constants': describe_constants(contract),
+    }
+    return load_template(file_path, language=Language.CPP).render(replacements)
+
+
+def populate_client_template_h(contract: Contract, type_mapping: Type[TypeMapping]) -> str:
+    file_path = TEMPLATE_DIR / 'client.h'
+    exchanges = get_exchanges(contract)
+    replacements = {
+        'message_size': message_size_definition(contract),
+        'response_structs': flatten(
+            [response_struct(ex, type_mapping=type_mapping) for ex in exchanges if returns_struct(ex)]
+        ),
+        'virtual_declarations': flatten([virtual_declaration(ex, type_mapping=type_mapping) for ex in exchanges]),
+        'wrapper_declarations': flatten([wrapper_declaration(ex, type_mapping=type_mapping) for ex in exchanges]),
+        'stream_declarations': flatten(
+            [stream_declaration(ex, type_mapping=type_mapping) for ex in exchanges if ex.streaming]
+        ),
+    }
+    return load_template(file_path, language=Language.CPP).render(replacements)
+
+
+def populate_parser_template_h(contract: Contract, type_mapping: Type[TypeMapping]) -> str:
+    file_path = TEMPLATE_DIR / 'parser.h'
+    replacements = {
+        'max_string_length': [f'#define MAX_STRING_LENGTH {contract.Encoding.max_string_length}'],
+    }
+    return load_template(file_path, language=Language.CPP).render(replacements)
+
+
+def populate_parser_template_cpp(contract: Contract, type_mapping: Type[TypeMapping]) -> str:
+    file_path = TEMPLATE_DIR / 'parser.cpp'
+    return load_template(file_path, language=Language.CPP).render({})
+
+
+def generate(contract: Contract, type_mapping: Type[TypeMapping]) -> List[PopulatedFile]:
+    files = [
+        PopulatedFile(filename='client.h', content=populate_client_template_h(contract, type_mapping)),
+        PopulatedFile(filename='client.cpp', content=populate_client_template_cpp(contract, type_mapping)),
+        PopulatedFile(filename='parser.h', content=populate_parser_template_h(contract, type_mapping)),
+        PopulatedFile(filename='parser.cpp', content=populate_parser_template_cpp(contract, type_mapping)),
+        PopulatedFile(
+            filename='firmware.ino', content=populate_firmware_ino(contract, type_mapping), is_main=True
+        ),
+    ]
+    return files
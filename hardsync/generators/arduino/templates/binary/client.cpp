@@ -0,0 +1,100 @@
+#include "client.h"
+#include "parser.h"
+
+// {{describe_constants}}
+
+Client::Client() = default;
+
+Client::~Client() = default;
+
+
+void Client::begin() {
+    // {{serial_begin}}
+}
+
+void Client::pingWrapper() const {
+    uint8_t message[2] = {0, KIND_RESPONSE};
+    sendFrame(message, sizeof(message));
+}
+
+void Client::describeWrapper() const {
+    uint8_t message[MAX_MESSAGE_SIZE];
+    MessageWriter writer = {message, sizeof(message), 0};
+    writeField<uint8_t>(&writer, DESCRIBE_EXCHANGE_ID);
+    writeField<uint8_t>(&writer, KIND_RESPONSE);
+    // Written in full whatever the contract's max_string_length, so the host can compare the whole hash
+    writeString(&writer, CONTRACT_HASH, UINT8_MAX);
+    writeString(&writer, HARDSYNC_VERSION, UINT8_MAX);
+    sendFrame(message, writer.offset);
+}
+
+// {{wrapper_implementations}}
+
+void Client::sendError(const String& message) const {
+    uint8_t buffer[MAX_MESSAGE_SIZE];
+    MessageWriter writer = {buffer, sizeof(buffer), 0};
+    writeField<uint8_t>(&writer, 0);
+    writeField<uint8_t>(&writer, KIND_ERROR_RESPONSE);
+    writeString(&writer, message);
+    sendFrame(buffer, writer.offset);
+}
+
+void Client::unidentifiedCommand(String command_name) {
+    this->sendError("Unidentified command: " + command_name);
+}
+
+void Client::badCommandFormat(String message) {
+    this->sendError("Unable to parse command. " + message);
+}
+
+void Client::respond() {
+    // Only consume bytes that have already arrived, so a partial frame never stalls stream()
+    while (Serial.available()) {
+        uint8_t received = Serial.read();
+        if (received != EXCHANGE_TERMINATOR) {
+            if (this->frameLength < MAX_FRAME_SIZE) {
+                this->frame[this->frameLength++] = received;
+            } else {
+                this->frameOverflow = true;
+            }
+            continue;
+        }
+
+        if (this->frameOverflow) {
+            this->badCommandFormat("Message is longer than MAX_FRAME_SIZE");
+        } else if (this->frameLength > 0) {
+            uint8_t message[MAX_FRAME_SIZE];
+            size_t length = cobsDecode(this->frame, this->frameLength, message);
+            this->dispatch(message, length);
+        }
+        this->frameLength = 0;
+        this->frameOverflow = false;
+    }
+    this->stream();
+}
+
+void Client::dispatch(const uint8_t* message, size_t length) {
+    if (length < 2) {
+        this->badCommandFormat("Message is shorter than its header");
+        return;
+    }
+
+    MessageReader reader = {message, length, 2, true};
+    uint8_t kind = message[1];
+    switch (message[0]) {
+    case 0:
+        this->pingWrapper();
+        break;
+    case DESCRIBE_EXCHANGE_ID:
+        this->describeWrapper();
+        break;
+    // {{respond_invocations}}
+    default:
+        this->unidentifiedCommand(String(message[0]));
+        break;
+    }
+}
+
+void Client::stream() {
+    // {{stream_implementations}}
+}
@@ -0,0 +1,42 @@
+#ifndef BASE_COMMUNICATION_CLIENT_H
+#define BASE_COMMUNICATION_CLIENT_H
+
+#include "Arduino.h"
+#include "parser.h"
+#include <WString.h>
+
+// {{message_size}}
+#define MAX_FRAME_SIZE (MAX_MESSAGE_SIZE + MAX_MESSAGE_SIZE / 254 + 1)
+
+// {{response_structs}}
+class Client {
+public:
+    // Constructor
+    Client();
+
+    // Virtual destructor to ensure proper cleanup for derived classes
+    virtual ~Client();
+
+    void pingWrapper() const;
+    void describeWrapper() const;
+
+    // {{virtual_declarations}}
+    // {{wrapper_declarations}}
+    // {{stream_declarations}}
+
+    void begin();
+    void unidentifiedCommand(String command_name);
+    void badCommandFormat(String message);
+    void sendError(const String& message) const;
+    void respond();
+    void stream();
+
+private:
+    uint8_t frame[MAX_FRAME_SIZE];
+    size_t frameLength = 0;
+    bool frameOverflow = false;
+
+    void dispatch(const uint8_t* message, size_t length);
+};
+
+#endif
@@ -0,0 +1,68 @@
+#include "parser.h"
+
+String readString(MessageReader* reader) {
+    uint8_t length = readField<uint8_t>(reader);
+    if (!reader->ok || reader->offset + length > reader->length) {
+        reader->ok = false;
+        return String();
+    }
+
+    String value;
+    value.reserve(length);
+    for (uint8_t i = 0; i < length; i++) {
+        value += (char) reader->data[reader->offset + i];
+    }
+    reader->offset += length;
+    return value;
+}
+
+void writeString(MessageWriter* writer, const String& value, size_t max_length) {
+    if (writer->offset >= writer->capacity) {
+        return;
+    }
+    size_t length = value.length();
+    if (length > max_length) {
+        length = max_length;
+    }
+    if (writer->offset + 1 + length > writer->capacity) {
+        length = writer->capacity - writer->offset - 1;
+    }
+    writeField<uint8_t>(writer, (uint8_t) length);
+    memcpy(writer->data + writer->offset, value.c_str(), length);
+    writer->offset += length;
+}
+
+size_t cobsDecode(const uint8_t* input, size_t length, uint8_t* output) {
+    size_t read = 0;
+    size_t written = 0;
+    while (read < length) {
+        uint8_t code = input[read++];
+        for (uint8_t i = 1; i < code && read < length; i++) {
+            output[written++] = input[read++];
+        }
+        if (code < 0xFF && read < length) {
+            output[written++] = 0;
+        }
+    }
+    return written;
+}
+
+// COBS-encodes the message block by block straight into the serial buffer, so no second buffer is needed
+void sendFrame(const uint8_t* message, size_t length) {
+    size_t start = 0;
+    while (true) {
+        size_t end = start;
+        while (end < length && message[end] != 0 && end - start < 254) {
+            end++;
+        }
+        bool full = end - start == 254;
+        Serial.write((uint8_t) (end - start + 1));
+        Serial.write(message + start, end - start);
+        if (end >= length) {
+            break;
+        }
+        // A full block carries no implied zero, so the byte at end still has to be encoded
+        start = full ? end : end + 1;
+    }
+    Serial.write((uint8_t) EXCHANGE_TERMINATOR);
+}
@@ -0,0 +1,78 @@
+#ifndef ENCODING_H
+#define ENCODING_H
+
+#include "Arduino.h"
+#include <WString.h>
+
+#define EXCHANGE_TERMINATOR 0x00
+// {{max_string_length}}
+
+#define KIND_REQUEST 0x00
+#define KIND_RESPONSE 0x01
+#define KIND_STREAM_REQUEST 0x02
+#define KIND_STOP_REQUEST 0x04
+#define KIND_STOP_RESPONSE 0x05
+#define KIND_ERROR_RESPONSE 0x7F
+
+struct MessageReader {
+    const uint8_t* data;
+    size_t length;
+    size_t offset;
+    bool ok;
+};
+
+struct MessageWriter {
+    uint8_t* data;
+    size_t capacity;
+    size_t offset;
+};
+
+// Fields are little-endian on the wire, which matches AVR and ARM, so they can be copied directly
+template <typename T>
+T readField(MessageReader* reader) {
+    T value = T();
+    if (reader->offset + sizeof(T) > reader->length) {
+        reader->ok = false;
+        return value;
+    }
+    memcpy(&value, reader->data + reader->offset, sizeof(T));
+    reader->offset += sizeof(T);
+    return value;
+}
+
+template <typename T>
+void writeField(MessageWriter* writer, T value) {
+    if (writer->offset + sizeof(T) > writer->capacity) {
+        return;
+    }
+    memcpy(writer->data + writer->offset, &value, sizeof(T));
+    writer->offset += sizeof(T);
+}
+
+// Arrays are a uint16_t element count followed by the elements. Elements beyond max_length are skipped.
+template <typename Wire, typename T>
+size_t readArray(MessageReader* reader, T* out, size_t max_length) {
+    uint16_t length = readField<uint16_t>(reader);
+    for (uint16_t i = 0; i < length && reader->ok; i++) {
+        T value = (T) readField<Wire>(reader);
+        if (i < max_length) {
+            out[i] = value;
+        }
+    }
+    return length < max_length ? length : max_length;
+}
+
+template <typename Wire, typename T>
+void writeArray(MessageWriter* writer, const T* values, size_t length) {
+    writeField<uint16_t>(writer, (uint16_t) length);
+    for (size_t i = 0; i < length; i++) {
+        writeField<Wire>(writer, (Wire) values[i]);
+    }
+}
+
+String readString(MessageReader* reader);
+void writeString(MessageWriter* writer, const String& value, size_t max_length = MAX_STRING_LENGTH);
+size_t cobsDecode(const uint8_t* input, size_t length, uint8_t* output);
+void sendFrame(const uint8_t* message, size_t length);
+
+#endif
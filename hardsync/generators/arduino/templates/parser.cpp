@@ -1,97 +1,286 @@
-#include <WString.h>
+#include <math.h>
+#include <stdlib.h>
+#include <string.h>
 #include "parser.h"
 
-String extractName(const String& input) {
-    String result;
-    int start = 0;
-    int end = input.indexOf(ARGUMENT_BEGINNER);
-    if (end == -1) {
-        return result;
+// Splits input in place by writing NUL bytes over the beginner, assigners, delimiters and ender, so that the name,
+// keys and values are all pointers into input and nothing is allocated. Returns false, leaving input untouched, if
+// it is not of the form Name(key=value,...).
+bool parseFunction(char* input, ParsedFunction* parsed_function) {
+    parsed_function->name = "";
+    parsed_function->argCount = 0;
+
+    char* begin = strchr(input, ARGUMENT_BEGINNER[0]);
+    if (begin == NULL) {
+        return false;
+    }
+    char* end = strrchr(begin, ARGUMENT_ENDER[0]);
+    if (end == NULL) {
+        return false;
+    }
+    *begin = '\0';
+    *end = '\0';
+    parsed_function->name = input;
+
+    char* cursor = begin + 1;
+    while (*cursor != '\0' && parsed_function->argCount < MAX_ARGS) {
+        char* delimiter = strchr(cursor, ARGUMENT_DELIMITER[0]);
+        if (delimiter != NULL) {
+            *delimiter = '\0';
+        }
+        char* assigner = strchr(cursor, ARGUMENT_ASSIGNER[0]);
+        if (assigner == NULL) {
+            break;
+        }
+        *assigner = '\0';
+        parsed_function->arguments[parsed_function->argCount].key = cursor;
+        parsed_function->arguments[parsed_function->argCount].value = assigner + 1;
+        parsed_function->argCount++;
+
+        if (delimiter == NULL) {
+            break;
+        }
+        cursor = delimiter + 1;
     }
-    result = input.substring(start, start + end);
-    return result;
+    return true;
 }
 
-String extractArgs(const String& input) {
-    int start = input.indexOf(ARGUMENT_BEGINNER);
-    int end = input.indexOf(ARGUMENT_ENDER);
+uint32_t hashName(const char* name) {
+    // 32-bit FNV-1a, matching name_hash() in the generator
+    uint32_t hash = 2166136261UL;
+    for (const char* c = name; *c != '\0'; c++) {
+        hash ^= (uint8_t) *c;
+        hash *= 16777619UL;
+    }
+    return hash;
+}
 
-    String result;
-    if (start == -1 || end == -1) {
-        return result;
+Opcode parseOpcode(const char* name) {
+    // name is OPCODE_PREFIX, the exchange id, and optionally OPCODE_KIND_SEPARATOR and the message kind, e.g. #3.2
+    Opcode unknown = {UNKNOWN_EXCHANGE, KIND_REQUEST};
+    int values[2] = {-1, KIND_REQUEST};
+    int index = 0;
+    for (const char* c = name + 1; *c != '\0'; c++) {
+        if (*c == OPCODE_KIND_SEPARATOR && index == 0 && values[0] != -1) {
+            index = 1;
+            values[1] = -1;
+            continue;
+        }
+        if (*c < '0' || *c > '9') {
+            return unknown;
+        }
+        values[index] = (values[index] == -1 ? 0 : values[index] * 10) + (*c - '0');
+        if (values[index] > MAX_OPCODE) {
+            return unknown;
+        }
     }
-    int count = end - start - 1;
-    result = input.substring(start + 1, start + 1 + count);
-    return result;
+    if (values[0] == -1 || values[1] == -1) {
+        return unknown;
+    }
+    return {values[0], values[1]};
 }
 
-ParsedFunction parseFunction(const String& input) {
-    ParsedFunction result;
-    result.argCount = 0;
+// The host encodes arguments in the order the contract declares them, so the argument at index is almost always the
+// one we want and costs a single key comparison. Arguments sent in some other order are still found by name.
+const char* extractValue(ParsedFunction* parsed_function, int index, const char* arg_name) {
+    if (index < parsed_function->argCount && strcmp(parsed_function->arguments[index].key, arg_name) == 0) {
+        return parsed_function->arguments[index].value;
+    }
+    for (int i = 0; i < parsed_function->argCount; i++) {
+        if (strcmp(parsed_function->arguments[i].key, arg_name) == 0) {
+            return parsed_function->arguments[i].value;
+        }
+    }
+    return NULL;
+}
 
-    result.name = extractName(input);
+int extractInt(ParsedFunction* parsed_function, int index, const char* arg_name) {
+    const char* value = extractValue(parsed_function, index, arg_name);
+    return value == NULL ? -1 : (int) strtol(value, NULL, 10);
+}
 
-    String args = extractArgs(input);
+long extractLong(ParsedFunction* parsed_function, int index, const char* arg_name) {
+    const char* value = extractValue(parsed_function, index, arg_name);
+    return value == NULL ? -1 : strtol(value, NULL, 10);
+}
 
-    int argStart = 0;
-    int argEnd;
-    int eqPos;
-    int length;
-    while ((eqPos = args.indexOf(ARGUMENT_ASSIGNER, argStart)) != -1) {
-        argEnd = args.indexOf(ARGUMENT_DELIMITER, argStart);
-        if (argEnd == -1) {
-            argEnd = args.length();
-        }
-        length = argEnd - argStart;
+double extractDouble(ParsedFunction* parsed_function, int index, const char* arg_name) {
+    const char* value = extractValue(parsed_function, index, arg_name);
+    return value == NULL ? -1.0 : strtod(value, NULL);
+}
 
-        String arg = args.substring(argStart, argStart + length);
-        if (eqPos == -1) {
-            return result;
-        }
-        eqPos = arg.indexOf(ARGUMENT_ASSIGNER);
-        result.arguments[result.argCount].key = arg.substring(0, 0 + eqPos);
-        result.arguments[result.argCount].value = arg.substring(eqPos + 1);
-        result.argCount++;
+float extractFloat(ParsedFunction* parsed_function, int index, const char* arg_name) {
+    const char* value = extractValue(parsed_function, index, arg_name);
+    return value == NULL ? -1.0 : (float) strtod(value, NULL);
+}
+
+bool extractBool(ParsedFunction* parsed_function, int index, const char* arg_name) {
+    // The client sends True or False, but 1 and 0 are accepted too
+    const char* value = extractValue(parsed_function, index, arg_name);
+    return value != NULL && (value[0] == 'T' || value[0] == 't' || strtol(value, NULL, 10) != 0);
+}
+
+const char* extractString(ParsedFunction* parsed_function, int index, const char* arg_name) {
+    const char* value = extractValue(parsed_function, index, arg_name);
+    return value == NULL ? "" : value;
+}
 
-        argStart = argEnd + 1;
-  }
+static int convertInt(const char* s, char** end) {
+    return (int) strtol(s, end, 10);
+}
 
-  return result;
+static long convertLong(const char* s, char** end) {
+    return strtol(s, end, 10);
 }
 
-int extractInt(ParsedFunction* parsed_function, String arg_name) {
-    for (int i = 0; i < MAX_ARGS; i++) {
-        if (parsed_function->arguments[i].key == arg_name) {
-            return parsed_function->arguments[i].value.toInt();
+static double convertDouble(const char* s, char** end) {
+    return strtod(s, end);
+}
+
+static float convertFloat(const char* s, char** end) {
+    return (float) strtod(s, end);
+}
+
+static bool convertBool(const char* s, char** end) {
+    return strtol(s, end, 10) != 0;
+}
+
+// Converts each ARRAY_DELIMITER-separated element of the argument into out, up to max_length elements.
+template <typename T>
+size_t extractArray(
+        ParsedFunction* parsed_function, int index, const char* arg_name, T* out, size_t max_length,
+        T (*convert)(const char*, char**)) {
+    const char* cursor = extractValue(parsed_function, index, arg_name);
+    if (cursor == NULL) {
+        return 0;
+    }
+    size_t count = 0;
+    while (count < max_length) {
+        while (*cursor == ARRAY_DELIMITER[0]) {
+            cursor++;
         }
+        char* end;
+        T element = convert(cursor, &end);
+        if (end == cursor) {
+            break;
+        }
+        out[count++] = element;
+        cursor = end;
     }
-    return -1;
+    return count;
 }
 
-double extractDouble(ParsedFunction* parsed_function, String arg_name) {
-    for (int i = 0; i < MAX_ARGS; i++) {
-        if (parsed_function->arguments[i].key == arg_name) {
-            return parsed_function->arguments[i].value.toDouble();
-        }
+size_t extractIntArray(ParsedFunction* parsed_function, int index, const char* arg_name, int* out, size_t max_length) {
+    return extractArray<int>(parsed_function, index, arg_name, out, max_length, convertInt);
+}
+
+size_t extractLongArray(
+        ParsedFunction* parsed_function, int index, const char* arg_name, long* out, size_t max_length) {
+    return extractArray<long>(parsed_function, index, arg_name, out, max_length, convertLong);
+}
+
+size_t extractDoubleArray(
+        ParsedFunction* parsed_function, int index, const char* arg_name, double* out, size_t max_length) {
+    return extractArray<double>(parsed_function, index, arg_name, out, max_length, convertDouble);
+}
+
+size_t extractFloatArray(
+        ParsedFunction* parsed_function, int index, const char* arg_name, float* out, size_t max_length) {
+    return extractArray<float>(parsed_function, index, arg_name, out, max_length, convertFloat);
+}
+
+size_t extractBoolArray(
+        ParsedFunction* parsed_function, int index, const char* arg_name, bool* out, size_t max_length) {
+    return extractArray<bool>(parsed_function, index, arg_name, out, max_length, convertBool);
+}
+
+void writeText(ResponseWriter* writer, const char* text) {
+    while (*text != '\0' && writer->length < writer->capacity) {
+        writer->buffer[writer->length++] = *text++;
     }
-    return -1.0;
 }
 
-float extractFloat(ParsedFunction* parsed_function, String arg_name) {
-    for (int i = 0; i < MAX_ARGS; i++) {
-        if (parsed_function->arguments[i].key == arg_name) {
-            return parsed_function->arguments[i].value.toFloat();
-        }
+void writeEnd(ResponseWriter* writer, const char* text) {
+    // Overwrite the tail of a response that did not fit, so the host still sees where the message ends
+    size_t length = strlen(text);
+    if (writer->length + length > writer->capacity) {
+        writer->length = writer->capacity - length;
     }
-    return -1.0;
+    writeText(writer, text);
 }
 
-String extractString(ParsedFunction* parsed_function, String arg_name) {
-    for (int i = 0; i < MAX_ARGS; i++) {
-        if (parsed_function->arguments[i].key == arg_name) {
-            return parsed_function->arguments[i].value;
-        }
+void writeValue(ResponseWriter* writer, const char* value) {
+    writeText(writer, value);
+}
+
+void writeValue(ResponseWriter* writer, const String& value) {
+    writeText(writer, value.c_str());
+}
+
+void writeValue(ResponseWriter* writer, unsigned long value) {
+    char digits[10];
+    size_t count = 0;
+    do {
+        digits[count++] = '0' + value % 10;
+        value /= 10;
+    } while (value > 0);
+    while (count > 0 && writer->length < writer->capacity) {
+        writer->buffer[writer->length++] = digits[--count];
+    }
+}
+
+void writeValue(ResponseWriter* writer, long value) {
+    if (value < 0) {
+        writeText(writer, "-");
+        writeValue(writer, (unsigned long) -(value + 1) + 1);
+    } else {
+        writeValue(writer, (unsigned long) value);
+    }
+}
+
+void writeValue(ResponseWriter* writer, int value) {
+    writeValue(writer, (long) value);
+}
+
+void writeValue(ResponseWriter* writer, unsigned int value) {
+    writeValue(writer, (unsigned long) value);
+}
+
+void writeValue(ResponseWriter* writer, bool value) {
+    writeText(writer, value ? "1" : "0");
+}
+
+void writeValue(ResponseWriter* writer, double value) {
+    // Two decimal places, rounded the same way as Serial.print(double)
+    if (isnan(value)) {
+        writeText(writer, "nan");
+        return;
+    }
+    if (isinf(value)) {
+        writeText(writer, "inf");
+        return;
     }
-    return "";
+    if (value > 4294967040.0 || value < -4294967040.0) {
+        writeText(writer, "ovf");
+        return;
+    }
+    if (value < 0.0) {
+        writeText(writer, "-");
+        value = -value;
+    }
+    value += 0.005;
+    unsigned long integer_part = (unsigned long) value;
+    double remainder = value - (double) integer_part;
+    writeValue(writer, integer_part);
+    writeText(writer, ".");
+    for (int i = 0; i < 2; i++) {
+        remainder *= 10.0;
+        unsigned int digit = (unsigned int) remainder;
+        writeValue(writer, digit);
+        remainder -= digit;
+    }
+}
 
+void writeValue(ResponseWriter* writer, float value) {
+    writeValue(writer, (double) value);
 }
@@ -1,30 +1,84 @@
-#define MAX_ARGS 10
 #ifndef ENCODING_H
 #define ENCODING_H
 
+#include <stddef.h>
+#include <stdint.h>
+#include <WString.h>
+
+// {{parser_limits}}
+
 #define ARGUMENT_BEGINNER "("
 #define ARGUMENT_ENDER ")"
 #define ARGUMENT_DELIMITER ","
-#define ARGUMENT_ASSIGNER ","
+#define ARGUMENT_ASSIGNER "="
 #define EXCHANGE_TERMINATOR "\n"
+#define ARRAY_DELIMITER " "
+#define OPCODE_PREFIX '#'
+#define OPCODE_KIND_SEPARATOR '.'
+#define MAX_OPCODE 255
+// Room for the fixed text of an ErrorResponse followed by a whole request
+#define MAX_ERROR_LENGTH (MAX_MESSAGE_LENGTH + 128)
 
+#define UNKNOWN_EXCHANGE -1
+#define KIND_REQUEST 0
+#define KIND_STREAM_REQUEST 2
+#define KIND_STOP_REQUEST 4
+
+// Keys and values point into the message buffer that was parsed, so they are only valid until it is reused
 struct Argument {
-    String key;
-    String value;
+    const char* key;
+    const char* value;
 };
 
 struct ParsedFunction {
-    String name;
+    const char* name;
     Argument arguments[MAX_ARGS];
     int argCount;
 };
 
-ParsedFunction parseFunction(const String& input);
-String extractName(const String& input);
-String extractArgs(const String& input);
-int extractInt(ParsedFunction* parsed_function, String arg_name);
-double extractDouble(ParsedFunction* parsed_function, String arg_name);
-float extractFloat(ParsedFunction* parsed_function, String arg_name);
-String extractString(ParsedFunction* parsed_function, String arg_name);
+struct Opcode {
+    int exchange_id;
+    int kind;
+};
+
+// Formats a response into a caller-provided buffer, so that it can be sent with a single Serial.write. Writes past
+// the end of the buffer are dropped, except for the end of the message, which always fits.
+struct ResponseWriter {
+    char* buffer;
+    size_t capacity;
+    size_t length;
+};
+
+bool parseFunction(char* input, ParsedFunction* parsed_function);
+uint32_t hashName(const char* name);
+Opcode parseOpcode(const char* name);
+int extractInt(ParsedFunction* parsed_function, int index, const char* arg_name);
+long extractLong(ParsedFunction* parsed_function, int index, const char* arg_name);
+double extractDouble(ParsedFunction* parsed_function, int index, const char* arg_name);
+float extractFloat(ParsedFunction* parsed_function, int index, const char* arg_name);
+bool extractBool(ParsedFunction* parsed_function, int index, const char* arg_name);
+const char* extractString(ParsedFunction* parsed_function, int index, const char* arg_name);
+const char* extractValue(ParsedFunction* parsed_function, int index, const char* arg_name);
+size_t extractIntArray(ParsedFunction* parsed_function, int index, const char* arg_name, int* out, size_t max_length);
+size_t extractLongArray(
+        ParsedFunction* parsed_function, int index, const char* arg_name, long* out, size_t max_length);
+size_t extractDoubleArray(
+        ParsedFunction* parsed_function, int index, const char* arg_name, double* out, size_t max_length);
+size_t extractFloatArray(
+        ParsedFunction* parsed_function, int index, const char* arg_name, float* out, size_t max_length);
+size_t extractBoolArray(
+        ParsedFunction* parsed_function, int index, const char* arg_name, bool* out, size_t max_length);
+
+void writeText(ResponseWriter* writer, const char* text);
+void writeEnd(ResponseWriter* writer, const char* text);
+void writeValue(ResponseWriter* writer, const char* value);
+void writeValue(ResponseWriter* writer, const String& value);
+void writeValue(ResponseWriter* writer, long value);
+void writeValue(ResponseWriter* writer, unsigned long value);
+void writeValue(ResponseWriter* writer, int value);
+void writeValue(ResponseWriter* writer, unsigned int value);
+void writeValue(ResponseWriter* writer, bool value);
+void writeValue(ResponseWriter* writer, double value);
+void writeValue(ResponseWriter* writer, float value);
 
 #endif
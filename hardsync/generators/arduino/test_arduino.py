@@ -9,9 +9,21 @@ from hardsync.generators.arduino.arduino import (
     respond_invocation,
     virtual_declaration,
     wrapper_declaration,
+    stream_declaration,
+    stream_respond_invocation,
+    stream_implementation,
+    response_struct,
+    name_hash,
+    opcode_lookups,
+    parser_limits,
+    request_length,
+    response_length,
 )
+from hardsync.generators.arduino import arduino
 from hardsync.generators.common import CPP_INDENT
 from hardsync.interfaces import Exchange
+from hardsync.encodings import AsciiEncoding
+from hardsync.types import Array
 from hardsync.defaults import DEFAULT_TYPE_MAPPING, DEFAULT_CHANNEL
 from dataclasses import dataclass
 from pathlib import Path
@@ -21,6 +33,8 @@ TEST_DATA_DIR = Path(os.path.dirname(os.path.abspath(__file__))) / 'test_data'
 
 
 class MeasureVoltage(Exchange):
+    exchange_id = 1
+
     @dataclass
     class Request:
         channel: int
@@ -31,7 +45,22 @@ class MeasureVoltage(Exchange):
         voltage: float
 
 
+class StreamVoltage(Exchange):
+    exchange_id = 2
+    streaming = True
+
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        voltage: float
+
+
 class DoAction(Exchange):
+    exchange_id = 3
+
     @dataclass
     class Request:
         pass
@@ -46,38 +75,138 @@ def test_wrapper_implementation():
     desired = [
         'void Client::measureVoltageWrapper(int channel, double integration_time) const {',
         CPP_INDENT + 'double voltage = this->measureVoltage(channel, integration_time);',
-        CPP_INDENT + 'Serial.print("MeasureVoltageResponse");',
-        CPP_INDENT + 'Serial.print(ARGUMENT_BEGINNER);',
-        CPP_INDENT + 'Serial.print("voltage");',
-        CPP_INDENT + 'Serial.print(ARGUMENT_ASSIGNER);',
-        CPP_INDENT + 'Serial.print(voltage);',
-        CPP_INDENT + 'Serial.print(ARGUMENT_ENDER);',
-        CPP_INDENT + 'Serial.print(EXCHANGE_TERMINATOR);',
+        CPP_INDENT + 'char buffer[48];',
+        CPP_INDENT + 'ResponseWriter writer = {buffer, sizeof(buffer), 0};',
+        CPP_INDENT + 'writeText(&writer, "MeasureVoltageResponse" ARGUMENT_BEGINNER "voltage" ARGUMENT_ASSIGNER);',
+        CPP_INDENT + 'writeValue(&writer, voltage);',
+        CPP_INDENT + 'writeEnd(&writer, ARGUMENT_ENDER EXCHANGE_TERMINATOR);',
+        CPP_INDENT + 'Serial.write((const uint8_t*) buffer, writer.length);',
         '}',
     ]
     assert actual == desired
 
 
+def test_response_length():
+    # MeasureVoltageResponse( voltage= <float> , ) \n
+    assert response_length(MeasureVoltage, AsciiEncoding) == 22 + 1 + 8 + 14 + 1 + 1 + 1
+
+
 def test_wrapper_implementation_empty():
     actual = wrapper_implementation(exchange=DoAction, type_mapping=DEFAULT_TYPE_MAPPING)
     desired = [
         'void Client::doActionWrapper() const {',
-        CPP_INDENT + 'this->doAction();'
+        CPP_INDENT + 'this->doAction();',
+        CPP_INDENT + 'Serial.print("DoActionResponse" ARGUMENT_BEGINNER ARGUMENT_ENDER EXCHANGE_TERMINATOR);',
+        '}',
     ]
-    assert actual[0] == desired[0]
-    assert actual[1] == desired[1]
+    assert actual == desired
+
 
 def test_respond_invocation():
     actual = respond_invocation(exchange=MeasureVoltage, type_mapping=DEFAULT_TYPE_MAPPING)
     desired = [
-        '} else if (fn.name == "MeasureVoltageRequest") {',
-        CPP_INDENT + 'int channel = extractInt(&fn, "channel");',
-        CPP_INDENT + 'double integration_time = extractDouble(&fn, "integration_time");',
-        CPP_INDENT + 'this->measureVoltageWrapper(channel, integration_time);'
+        'case 1:',
+        CPP_INDENT + 'if (opcode.kind == KIND_REQUEST) {',
+        CPP_INDENT * 2 + 'int channel = extractInt(&fn, 0, "channel");',
+        CPP_INDENT * 2 + 'double integration_time = extractDouble(&fn, 1, "integration_time");',
+        CPP_INDENT * 2 + 'this->measureVoltageWrapper(channel, integration_time);',
+        CPP_INDENT + '} else {',
+        CPP_INDENT * 2 + 'this->unidentifiedCommand(fn.name);',
+        CPP_INDENT + '}',
+        CPP_INDENT + 'break;',
+    ]
+    assert actual == desired
+
+
+def test_name_hash():
+    # Reference values for 32-bit FNV-1a
+    assert name_hash('') == 0x811C9DC5
+    assert name_hash('a') == 0xE40C292C
+
+
+def test_opcode_lookups():
+    actual = opcode_lookups([MeasureVoltage, StreamVoltage])
+    assert actual[:6] == [
+        f'case {name_hash("PingRequest"):#010x}UL:',
+        CPP_INDENT + 'if (strcmp(name, "PingRequest") == 0) return {0, KIND_REQUEST};',
+        CPP_INDENT + 'break;',
+        f'case {name_hash("DescribeRequest"):#010x}UL:',
+        CPP_INDENT + 'if (strcmp(name, "DescribeRequest") == 0) return {255, KIND_REQUEST};',
+        CPP_INDENT + 'break;',
+    ]
+    assert CPP_INDENT + 'if (strcmp(name, "MeasureVoltageRequest") == 0) return {1, KIND_REQUEST};' in actual
+    assert CPP_INDENT + 'if (strcmp(name, "StreamVoltageStreamRequest") == 0) return {2, KIND_STREAM_REQUEST};' in actual
+    assert CPP_INDENT + 'if (strcmp(name, "StreamVoltageStopRequest") == 0) return {2, KIND_STOP_REQUEST};' in actual
+    assert len(actual) == 3 * 6
+
+
+def test_opcode_lookups_hash_collision(monkeypatch):
+    monkeypatch.setattr(arduino, 'name_hash', lambda name: 7)
+    actual = opcode_lookups([MeasureVoltage])
+    assert actual == [
+        'case 0x00000007UL:',
+        CPP_INDENT + 'if (strcmp(name, "PingRequest") == 0) return {0, KIND_REQUEST};',
+        CPP_INDENT + 'if (strcmp(name, "DescribeRequest") == 0) return {255, KIND_REQUEST};',
+        CPP_INDENT + 'if (strcmp(name, "MeasureVoltageRequest") == 0) return {1, KIND_REQUEST};',
+        CPP_INDENT + 'break;',
+    ]
+
+
+def test_stream_declaration():
+    actual = stream_declaration(exchange=StreamVoltage, type_mapping=DEFAULT_TYPE_MAPPING)
+    desired = [
+        'bool streamVoltageStreaming = false;',
+        'unsigned long streamVoltagePeriodUs = 0;',
+        'unsigned long streamVoltageLastSampleUs = 0;',
+        'int streamVoltageChannel;',
     ]
     assert actual == desired
 
 
+def test_stream_respond_invocation():
+    actual = stream_respond_invocation(exchange=StreamVoltage, type_mapping=DEFAULT_TYPE_MAPPING)
+    desired = [
+        CPP_INDENT + '} else if (opcode.kind == KIND_STREAM_REQUEST) {',
+        CPP_INDENT * 2 + 'this->streamVoltagePeriodUs = extractLong(&fn, 0, "period_us");',
+        CPP_INDENT * 2 + 'this->streamVoltageChannel = extractInt(&fn, 1, "channel");',
+        CPP_INDENT * 2 + 'this->streamVoltageLastSampleUs = micros() - this->streamVoltagePeriodUs;',
+        CPP_INDENT * 2 + 'this->streamVoltageStreaming = true;',
+        CPP_INDENT + '} else if (opcode.kind == KIND_STOP_REQUEST) {',
+        CPP_INDENT * 2 + 'this->streamVoltageStreaming = false;',
+        CPP_INDENT * 2 + 'Serial.print("StreamVoltageStopResponse()" EXCHANGE_TERMINATOR);',
+    ]
+    assert actual == desired
+
+
+def test_respond_invocation_streaming():
+    actual = respond_invocation(exchange=StreamVoltage, type_mapping=DEFAULT_TYPE_MAPPING)
+    assert actual[0] == 'case 2:'
+    assert CPP_INDENT + '} else if (opcode.kind == KIND_STOP_REQUEST) {' in actual
+    assert actual[-1] == CPP_INDENT + 'break;'
+
+
+def test_stream_implementation():
+    actual = stream_implementation(exchange=StreamVoltage, type_mapping=DEFAULT_TYPE_MAPPING)
+    desired = [
+        'if (this->streamVoltageStreaming && micros() - this->streamVoltageLastSampleUs >= this->streamVoltagePeriodUs) {',
+        CPP_INDENT + 'this->streamVoltageLastSampleUs += this->streamVoltagePeriodUs;',
+        CPP_INDENT + 'this->streamVoltageWrapper(this->streamVoltageChannel);',
+        '}',
+    ]
+    assert actual == desired
+
+
+def test_stream_only_generated_for_streaming_exchanges():
+    module = ModuleType('hi')
+    module.StreamVoltage = StreamVoltage
+    module.MeasureVoltage = MeasureVoltage
+    module.Channel = DEFAULT_CHANNEL
+
+    actual = populate_client_template_cpp(contract=module, type_mapping=DEFAULT_TYPE_MAPPING)
+    assert 'StreamVoltageStreamRequest' in actual
+    assert 'MeasureVoltageStreamRequest' not in actual
+
+
 def test_virtual_declaration():
     actual = virtual_declaration(exchange=MeasureVoltage, type_mapping=DEFAULT_TYPE_MAPPING)
     desired = ["virtual double measureVoltage(int channel, double integration_time) const;"]
@@ -161,3 +290,84 @@ def test_override_baud_rate():
     actual = populate_client_template_cpp(contract=module, type_mapping=DEFAULT_TYPE_MAPPING)
     assert '115200' in actual
 
+
+
+class CaptureWaveform(Exchange):
+    exchange_id = 4
+
+    @dataclass
+    class Request:
+        gains: Array[float, 4]
+
+    @dataclass
+    class Response:
+        samples: Array[float, 8]
+
+
+def test_response_struct_array():
+    assert response_struct(CaptureWaveform, type_mapping=DEFAULT_TYPE_MAPPING) == [
+        'struct CaptureWaveformResponse {',
+        f'{CPP_INDENT}double samples[8];',
+        f'{CPP_INDENT}size_t samples_length;',
+        '};',
+        '',
+    ]
+
+
+def test_virtual_declaration_array():
+    actual_declaration = virtual_declaration(CaptureWaveform, type_mapping=DEFAULT_TYPE_MAPPING)
+    assert actual_declaration == [
+        'virtual CaptureWaveformResponse captureWaveform(const double* gains, size_t gains_length) const;'
+    ]
+
+
+def test_respond_invocation_array():
+    actual_invocation = respond_invocation(CaptureWaveform, type_mapping=DEFAULT_TYPE_MAPPING)
+    assert f'{CPP_INDENT * 2}double gains[4];' in actual_invocation
+    assert f'{CPP_INDENT * 2}size_t gains_length = extractDoubleArray(&fn, 0, "gains", gains, 4);' in actual_invocation
+    assert f'{CPP_INDENT * 2}this->captureWaveformWrapper(gains, gains_length);' in actual_invocation
+
+
+def test_wrapper_implementation_array():
+    actual_implementation = wrapper_implementation(CaptureWaveform, type_mapping=DEFAULT_TYPE_MAPPING)
+    assert actual_implementation[1] == f'{CPP_INDENT}CaptureWaveformResponse response = this->captureWaveform(gains, gains_length);'
+    assert f'{CPP_INDENT}for (size_t i = 0; i < response.samples_length; i++) {{' in actual_implementation
+    assert f'{CPP_INDENT * 2}writeValue(&writer, response.samples[i]);' in actual_implementation
+    # CaptureWaveformResponse( samples= 8 * (<float> + delimiter) ) \n
+    assert f'{CPP_INDENT}char buffer[{23 + 1 + 8 + 8 * 15 + 1 + 1 + 1}];' in actual_implementation
+
+
+class MeasureIV(Exchange):
+    exchange_id = 5
+
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        voltage: float
+        current: float
+
+
+def test_virtual_declaration_multiple_fields():
+    actual_declaration = virtual_declaration(MeasureIV, type_mapping=DEFAULT_TYPE_MAPPING)
+    assert actual_declaration == ['virtual MeasureIVResponse measureIv(int channel) const;']
+
+
+def test_wrapper_implementation_multiple_fields():
+    actual = wrapper_implementation(exchange=MeasureIV, type_mapping=DEFAULT_TYPE_MAPPING)
+    desired = [
+        'void Client::measureIvWrapper(int channel) const {',
+        CPP_INDENT + 'MeasureIVResponse response = this->measureIv(channel);',
+        CPP_INDENT + 'char buffer[66];',
+        CPP_INDENT + 'ResponseWriter writer = {buffer, sizeof(buffer), 0};',
+        CPP_INDENT + 'writeText(&writer, "MeasureIVResponse" ARGUMENT_BEGINNER "voltage" ARGUMENT_ASSIGNER);',
+        CPP_INDENT + 'writeValue(&writer, response.voltage);',
+        CPP_INDENT + 'writeText(&writer, ARGUMENT_DELIMITER "current" ARGUMENT_ASSIGNER);',
+        CPP_INDENT + 'writeValue(&writer, response.current);',
+        CPP_INDENT + 'writeEnd(&writer, ARGUMENT_ENDER EXCHANGE_TERMINATOR);',
+        CPP_INDENT + 'Serial.write((const uint8_t*) buffer, writer.length);',
+        '}',
+    ]
+    assert actual == desired
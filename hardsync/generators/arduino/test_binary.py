@@ -0,0 +1,187 @@
+from types import ModuleType
+from hardsync.generators.arduino import generate
+from hardsync.generators.arduino.binary import (
+    wrapper_implementation,
+    respond_invocation,
+    max_message_size,
+    wire_type,
+    message_size,
+)
+from hardsync.generators.common import CPP_INDENT
+from hardsync.interfaces import Exchange, ContractError
+from hardsync.encodings import BinaryEncoding
+from hardsync.types import Array
+from hardsync.defaults import DEFAULT_TYPE_MAPPING, DEFAULT_CHANNEL
+from dataclasses import dataclass, fields
+import pytest
+
+
+class MeasureVoltage(Exchange):
+    exchange_id = 1
+
+    @dataclass
+    class Request:
+        channel: int
+        integration_time: float
+
+    @dataclass
+    class Response:
+        voltage: float
+
+
+class StreamVoltage(Exchange):
+    exchange_id = 2
+    streaming = True
+
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        voltage: float
+
+
+class Label(Exchange):
+    exchange_id = 3
+
+    @dataclass
+    class Request:
+        pass
+
+    @dataclass
+    class Response:
+        name: str
+
+
+def test_wire_type():
+    assert wire_type(int, BinaryEncoding) == 'int32_t'
+    assert wire_type(float, BinaryEncoding) == 'float'
+
+
+def test_wire_type_unsupported():
+    class Encoding(BinaryEncoding):
+        field_formats = {int: 'n'}
+
+    with pytest.raises(ContractError):
+        wire_type(int, Encoding)
+
+
+def test_max_message_size():
+    assert max_message_size([MeasureVoltage], BinaryEncoding) == 64
+    assert max_message_size([MeasureVoltage, Label], BinaryEncoding) == 2 + 1 + 255
+
+
+def test_wrapper_implementation():
+    actual = wrapper_implementation(exchange=MeasureVoltage, type_mapping=DEFAULT_TYPE_MAPPING, encoding=BinaryEncoding)
+    desired = [
+        'void Client::measureVoltageWrapper(int channel, double integration_time) const {',
+        CPP_INDENT + 'double voltage = this->measureVoltage(channel, integration_time);',
+        CPP_INDENT + 'uint8_t message[6];',
+        CPP_INDENT + 'MessageWriter writer = {message, sizeof(message), 0};',
+        CPP_INDENT + 'writeField<uint8_t>(&writer, 1);',
+        CPP_INDENT + 'writeField<uint8_t>(&writer, KIND_RESPONSE);',
+        CPP_INDENT + 'writeField<float>(&writer, voltage);',
+        CPP_INDENT + 'sendFrame(message, writer.offset);',
+        '}',
+    ]
+    assert actual == desired
+
+
+def test_wrapper_implementation_string():
+    actual = wrapper_implementation(exchange=Label, type_mapping=DEFAULT_TYPE_MAPPING, encoding=BinaryEncoding)
+    assert CPP_INDENT + 'uint8_t message[258];' in actual
+    assert CPP_INDENT + 'writeString(&writer, name);' in actual
+
+
+def test_respond_invocation():
+    actual = respond_invocation(exchange=MeasureVoltage, type_mapping=DEFAULT_TYPE_MAPPING, encoding=BinaryEncoding)
+    desired = [
+        'case 1:',
+        CPP_INDENT + 'if (kind == KIND_REQUEST) {',
+        CPP_INDENT * 2 + 'int channel = readField<int32_t>(&reader);',
+        CPP_INDENT * 2 + 'double integration_time = readField<float>(&reader);',
+        CPP_INDENT * 2 + 'if (!reader.ok) {',
+        CPP_INDENT * 3 + 'this->badCommandFormat("Truncated MeasureVoltageRequest");',
+        CPP_INDENT * 3 + 'break;',
+        CPP_INDENT * 2 + '}',
+        CPP_INDENT * 2 + 'this->measureVoltageWrapper(channel, integration_time);',
+        CPP_INDENT + '} else {',
+        CPP_INDENT * 2 + 'this->badCommandFormat("Unexpected message kind for MeasureVoltage");',
+        CPP_INDENT + '}',
+        CPP_INDENT + 'break;',
+    ]
+    assert actual == desired
+
+
+def test_respond_invocation_streaming():
+    actual = respond_invocation(exchange=StreamVoltage, type_mapping=DEFAULT_TYPE_MAPPING, encoding=BinaryEncoding)
+    assert CPP_INDENT + '} else if (kind == KIND_STREAM_REQUEST) {' in actual
+    assert CPP_INDENT * 2 + 'this->streamVoltagePeriodUs = readField<int32_t>(&reader);' in actual
+    assert CPP_INDENT * 2 + 'uint8_t message[2] = {2, KIND_STOP_RESPONSE};' in actual
+
+
+def test_generate_dispatches_on_encoding():
+    contract = ModuleType('contract')
+    contract.MeasureVoltage = MeasureVoltage
+    contract.Channel = DEFAULT_CHANNEL
+    contract.Encoding = BinaryEncoding
+    files = {file.filename: file.content for file in generate(contract=contract, type_mapping=DEFAULT_TYPE_MAPPING)}
+    assert '#define MAX_MESSAGE_SIZE 64' in files['client.h']
+    assert 'case 1:' in files['client.cpp']
+    assert '#define MAX_STRING_LENGTH 255' in files['parser.h']
+    assert 'class MyClient : public Client {' in files['firmware.ino']
+
+
+class CaptureWaveform(Exchange):
+    exchange_id = 4
+
+    @dataclass
+    class Request:
+        gains: Array[float, 4]
+
+    @dataclass
+    class Response:
+        samples: Array[float, 8]
+
+
+def test_message_size_array():
+    # header + u16 count + 8 floats
+    assert message_size(fields(CaptureWaveform.Response), BinaryEncoding) == 2 + 2 + 8 * 4
+
+
+def test_respond_invocation_array():
+    actual_invocation = respond_invocation(CaptureWaveform, type_mapping=DEFAULT_TYPE_MAPPING, encoding=BinaryEncoding)
+    assert f'{CPP_INDENT * 2}double gains[4];' in actual_invocation
+    assert f'{CPP_INDENT * 2}size_t gains_length = readArray<float>(&reader, gains, 4);' in actual_invocation
+    assert f'{CPP_INDENT * 2}this->captureWaveformWrapper(gains, gains_length);' in actual_invocation
+
+
+def test_wrapper_implementation_array():
+    actual_implementation = wrapper_implementation(
+        CaptureWaveform, type_mapping=DEFAULT_TYPE_MAPPING, encoding=BinaryEncoding
+    )
+    assert f'{CPP_INDENT}CaptureWaveformResponse response = this->captureWaveform(gains, gains_length);' in actual_implementation
+    assert f'{CPP_INDENT}writeArray<float>(&writer, response.samples, response.samples_length);' in actual_implementation
+
+
+class MeasureIV(Exchange):
+    exchange_id = 5
+
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        voltage: float
+        current: float
+
+
+def test_wrapper_implementation_multiple_fields():
+    actual_implementation = wrapper_implementation(MeasureIV, type_mapping=DEFAULT_TYPE_MAPPING, encoding=BinaryEncoding)
+    assert actual_implementation[1] == f'{CPP_INDENT}MeasureIVResponse response = this->measureIv(channel);'
+    assert actual_implementation[-4:-2] == [
+        f'{CPP_INDENT}writeField<float>(&writer, response.voltage);',
+        f'{CPP_INDENT}writeField<float>(&writer, response.current);',
+    ]
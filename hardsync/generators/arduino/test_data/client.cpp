@@ -4,8 +4,11 @@
 #define ARGUMENT_BEGINNER "("
 #define ARGUMENT_ENDER ")"
 #define ARGUMENT_DELIMITER ","
-#define ARGUMENT_ASSIGNER ","
+#define ARGUMENT_ASSIGNER "="
 #define EXCHANGE_TERMINATOR "\n"
+#define DESCRIBE_EXCHANGE_ID 255
+#define CONTRACT_HASH "74af2be1a4426d11"
+#define HARDSYNC_VERSION "0.3.0"
 
 Client::Client() = default;
 
@@ -17,54 +20,125 @@ void Client::begin() {
 }
 
 void Client::pingWrapper() const {
-    Serial.print("PingResponse()");
-    Serial.print(EXCHANGE_TERMINATOR);
+    Serial.print("PingResponse()" EXCHANGE_TERMINATOR);
+}
+
+void Client::describeWrapper() const {
+    Serial.print(
+        "DescribeResponse" ARGUMENT_BEGINNER
+        "contract_hash" ARGUMENT_ASSIGNER CONTRACT_HASH ARGUMENT_DELIMITER
+        "hardsync_version" ARGUMENT_ASSIGNER HARDSYNC_VERSION
+        ARGUMENT_ENDER EXCHANGE_TERMINATOR
+    );
 }
 
 void Client::measureVoltageWrapper(int channel, double integration_time) const {
     double voltage = this->measureVoltage(channel, integration_time);
-    Serial.print("MeasureVoltageResponse");
-    Serial.print(ARGUMENT_BEGINNER);
-    Serial.print("voltage");
-    Serial.print(ARGUMENT_ASSIGNER);
-    Serial.print(voltage);
-    Serial.print(ARGUMENT_ENDER);
-    Serial.print(EXCHANGE_TERMINATOR);
+    char buffer[48];
+    ResponseWriter writer = {buffer, sizeof(buffer), 0};
+    writeText(&writer, "MeasureVoltageResponse" ARGUMENT_BEGINNER "voltage" ARGUMENT_ASSIGNER);
+    writeValue(&writer, voltage);
+    writeEnd(&writer, ARGUMENT_ENDER EXCHANGE_TERMINATOR);
+    Serial.write((const uint8_t*) buffer, writer.length);
 }
 
-void Client::unidentifiedCommand(String command_name) {
-    Serial.print("ErrorResponse(msg=Unidentified command: ");
-    Serial.print(command_name);
-    Serial.print(ARGUMENT_ENDER);
-    Serial.print(EXCHANGE_TERMINATOR);
+void Client::unidentifiedCommand(const char* command_name) {
+    char buffer[MAX_ERROR_LENGTH];
+    ResponseWriter writer = {buffer, sizeof(buffer), 0};
+    writeText(&writer, "ErrorResponse" ARGUMENT_BEGINNER "msg" ARGUMENT_ASSIGNER "Unidentified command: ");
+    writeText(&writer, command_name);
+    writeEnd(&writer, ARGUMENT_ENDER EXCHANGE_TERMINATOR);
+    Serial.write((const uint8_t*) buffer, writer.length);
 }
 
-void Client::badCommandFormat(String message) {
-    Serial.print("ErrorResponse");
-    Serial.print(ARGUMENT_BEGINNER);
-    Serial.print("msg");
-    Serial.print(ARGUMENT_ASSIGNER);
-    Serial.print("Unable to parse command. Message should be of format XXXRequest(key=val). Raw message received: ");
-    Serial.print(message);
-    Serial.print(ARGUMENT_ENDER);
-    Serial.print(EXCHANGE_TERMINATOR);
+void Client::badCommandFormat(const char* message) {
+    char buffer[MAX_ERROR_LENGTH];
+    ResponseWriter writer = {buffer, sizeof(buffer), 0};
+    writeText(&writer, "ErrorResponse" ARGUMENT_BEGINNER "msg" ARGUMENT_ASSIGNER "Unable to parse command. Message "
+                       "should be of format XXXRequest(key=val). Raw message received: ");
+    writeText(&writer, message);
+    writeEnd(&writer, ARGUMENT_ENDER EXCHANGE_TERMINATOR);
+    Serial.write((const uint8_t*) buffer, writer.length);
 }
 
 void Client::respond() {
-    if (Serial.available()) {
-        String message = Serial.readStringUntil('\n');
-        ParsedFunction fn = parseFunction(message);
-
-        if (fn.name == "PingRequest") {
-            this->pingWrapper();
-        } else if (fn.name == "MeasureVoltageRequest") {
-            int channel = extractInt(&fn, "channel");
-            double integration_time = extractDouble(&fn, "integration_time");
+    // Only consume bytes that have already arrived, so a partial request never stalls loop(). At most one request is
+    // handled per call, which bounds the time respond() takes however fast requests arrive.
+    while (Serial.available()) {
+        char received = Serial.read();
+        if (received != EXCHANGE_TERMINATOR[0]) {
+            if (this->messageLength < MAX_MESSAGE_LENGTH) {
+                this->message[this->messageLength++] = received;
+            } else {
+                this->messageOverflow = true;
+            }
+            continue;
+        }
+
+        this->message[this->messageLength] = '\0';
+        if (this->messageOverflow) {
+            // The start of the request was kept, which is enough to report which one was too long
+            this->badCommandFormat(this->message);
+        } else {
+            this->dispatch(this->message);
+        }
+        this->messageLength = 0;
+        this->messageOverflow = false;
+        break;
+    }
+    this->stream();
+}
+
+void Client::dispatch(char* message) {
+    ParsedFunction fn;
+    bool parsed = parseFunction(message, &fn);
+    Opcode opcode = this->lookupOpcode(fn.name);
+
+    switch (opcode.exchange_id) {
+    case 0:
+        this->pingWrapper();
+        break;
+    case DESCRIBE_EXCHANGE_ID:
+        this->describeWrapper();
+        break;
+    case 1:
+        if (opcode.kind == KIND_REQUEST) {
+            int channel = extractInt(&fn, 0, "channel");
+            double integration_time = extractDouble(&fn, 1, "integration_time");
             this->measureVoltageWrapper(channel, integration_time);
-        } else if (fn.name == "") {
+        } else {
+            this->unidentifiedCommand(fn.name);
+        }
+        break;
+    default:
+        if (!parsed) {
             this->badCommandFormat(message);
         } else {
             this->unidentifiedCommand(fn.name);
         }
+        break;
+    }
+}
+
+Opcode Client::lookupOpcode(const char* name) const {
+    // Requests name their exchange either by opcode, e.g. #3(channel=1), or by name, e.g. MeasureVoltageRequest(...)
+    if (name[0] == OPCODE_PREFIX) {
+        return parseOpcode(name);
+    }
+
+    switch (hashName(name)) {
+    case 0x01dce4aeUL:
+        if (strcmp(name, "PingRequest") == 0) return {0, KIND_REQUEST};
+        break;
+    case 0xdd36e159UL:
+        if (strcmp(name, "DescribeRequest") == 0) return {255, KIND_REQUEST};
+        break;
+    case 0xfd9e7a80UL:
+        if (strcmp(name, "MeasureVoltageRequest") == 0) return {1, KIND_REQUEST};
+        break;
     }
+    return {UNKNOWN_EXCHANGE, KIND_REQUEST};
+}
+
+void Client::stream() {
 }
@@ -14,14 +14,25 @@ public:
     virtual ~Client();
 
     void pingWrapper() const;
+    void describeWrapper() const;
 
     virtual double measureVoltage(int channel, double integration_time) const;
     void measureVoltageWrapper(int channel, double integration_time) const;
 
     void begin();
-    void unidentifiedCommand(String command_name);
-    void badCommandFormat(String message);
+    void unidentifiedCommand(const char* command_name);
+    void badCommandFormat(const char* message);
     void respond();
+    Opcode lookupOpcode(const char* name) const;
+    void stream();
+
+private:
+    // Requests are gathered and parsed in place in this fixed buffer, so no heap is used per request
+    char message[MAX_MESSAGE_LENGTH + 1];
+    size_t messageLength = 0;
+    bool messageOverflow = false;
+
+    void dispatch(char* message);
 };
 
 #endif
@@ -2,7 +2,8 @@ import re
 import os
 import enum
 import logging
-from typing import Mapping, Sequence, TypeVar
+from functools import lru_cache
+from typing import List, Mapping, NamedTuple, Sequence, TypeVar
 from pathlib import Path
 from hardsync.types import PopulatedFile
 import hardsync
@@ -73,18 +74,84 @@ def comment_string(language: Language) -> str:
         raise ValueError(f'Unspported language {language}. No comment string found.')
 
 
-def populate_template(template: str, replacements: Mapping[str, Sequence[str]], language: Language) -> str:
-    populated_template = template
-    comment_sequence = comment_string(language=language)
-    for key, val in replacements.items():
-        var_to_match = comment_sequence + ' {{' + key + '}}'
-        whitespace = starting_whitespace(input_string=template, match_string=var_to_match)
-        join_string = '\n' + whitespace
-        composite_string = join_string.join(val)
+class Placeholder(NamedTuple):
+    key: str
+    # Leading whitespace of the placeholder's line, applied to every line after the first of its replacement
+    indent: str
+    # Whether the placeholder is alone on its line, which is then dropped entirely when the replacement is empty
+    whole_line: bool
+    # The placeholder as written, left in place when no replacement is given for it
+    text: str
+
+
+class CompiledTemplate:
+    """
+    A template parsed once into literal text and placeholders, e.g. `// {{wrapper_implementations}}`, so that
+    rendering is a single join whose cost is linear in the size of the output, however many placeholders there are.
+    """
+    def __init__(self, template: str, language: Language):
+        pattern = re.compile(re.escape(comment_string(language=language)) + r' \{\{(\w+)\}\}')
+        self.segments: List[str | Placeholder] = []
+        position = 0
+        for match in pattern.finditer(template):
+            line_start = template.rfind('\n', 0, match.start()) + 1
+            indent = template[line_start:match.start()]
+            whole_line = not indent.strip() and template.startswith('\n', match.end())
+            if whole_line:
+                literal_end, text = line_start, template[line_start:match.end() + 1]
+            else:
+                indent = indent[:len(indent) - len(indent.lstrip())]
+                literal_end, text = match.start(), match.group(0)
+            self.segments.append(template[position:literal_end])
+            self.segments.append(Placeholder(key=match.group(1), indent=indent, whole_line=whole_line, text=text))
+            position = literal_end + len(text)
+        self.segments.append(template[position:])
+
+    def render(self, replacements: Mapping[str, Sequence[str]]) -> str:
+        parts = []
+        for segment in self.segments:
+            if isinstance(segment, str):
+                parts.append(segment)
+                continue
+
+            lines = replacements.get(segment.key)
+            if lines is None:
+                parts.append(segment.text)
+                continue
+            if not lines:
+                continue
+
+            if segment.whole_line:
+                parts.append(segment.indent)
+            parts.append(lines[0])
+            for line in lines[1:]:
+                # Blank lines are left empty rather than indented so generated code has no trailing whitespace
+                parts.append('\n' + segment.indent + line if line else '\n')
+            if segment.whole_line:
+                parts.append('\n')
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def compile_template(template: str, language: Language) -> CompiledTemplate:
+    return CompiledTemplate(template=template, language=language)
+
+
+@lru_cache(maxsize=None)
+def _load_template(file_path: Path, language: Language, mtime_ns: int) -> CompiledTemplate:
+    with open(file_path, 'r') as file:
+        return CompiledTemplate(template=file.read(), language=language)
+
+
+def load_template(file_path: Path, language: Language) -> CompiledTemplate:
+    """
+    The compiled template at file_path, which is only read from disk again if it has been modified since.
+    """
+    return _load_template(Path(file_path), language, os.stat(file_path).st_mtime_ns)
 
-        populated_template = populated_template.replace(var_to_match, composite_string)
 
-    return populated_template
+def populate_template(template: str, replacements: Mapping[str, Sequence[str]], language: Language) -> str:
+    return compile_template(template=template, language=language).render(replacements)
 
 
 def starting_whitespace(input_string: str, match_string: str) -> str:
@@ -104,9 +171,16 @@ def write(dirname: Path, file: PopulatedFile, force=False, preface=''):
         logger.info(f"Found existing main file {file.filename} at {full_path}. Skipping write. Override this by adding the --force flag")
         return
 
+    contents = preface + file.content
+    if os.path.exists(full_path):
+        with open(full_path, 'r') as existing_file:
+            if existing_file.read() == contents:
+                # Leave the mtime alone so build tools do not recompile a file that has not changed
+                logger.info(f"{full_path} is unchanged. Skipping write.")
+                return
+
     with open(full_path, 'w') as file_to_write:
-        file_to_write.write(preface)
-        file_to_write.write(file.content)
+        file_to_write.write(contents)
         logger.info(f"Wrote {full_path}")
 
 
@@ -1 +1,10 @@
-from hardsync.generators.python.python import exchange_definition, request_function, generate
+from hardsync.generators.python.python import (
+    exchange_definition,
+    request_function,
+    pipelined_request_function,
+    async_request_function,
+    stream_function,
+    encoding_definition,
+    encoding_declaration,
+    generate,
+)
@@ -3,10 +3,13 @@ import itertools
 from dataclasses import is_dataclass, fields
 from typing import Type, Sequence, List, Any, TypeVar
 import os
-from hardsync.generators.common import convert_case, CaseType, populate_template, Language, PYTHON_INDENT
-from hardsync.interfaces import Channel, Contract
+from hardsync.generators.common import convert_case, CaseType, load_template, Language, PYTHON_INDENT
+from hardsync.interfaces import Channel, Contract, Encoding
+from hardsync.encodings import BinaryEncoding
+from hardsync.defaults import DEFAULT_ENCODING
 from hardsync.utils import flatten
 from hardsync.dynamics import get_exchanges
+from hardsync.manifest import contract_hash
 from hardsync.types import PopulatedFile
 from pathlib import Path
 from types import ModuleType
@@ -14,14 +17,53 @@ from types import ModuleType
 
 def channel_declaration(channel: Type[Channel]) -> List[str]:
     lines = [
-        f"channel: Channel = SerialChannel(baud_rate={channel.baud_rate}, channel_identifier='')"
+        "channel: Channel = field(default_factory=lambda: SerialChannel(",
+        f"{PYTHON_INDENT}baud_rate={channel.baud_rate}, channel_identifier='', persistent=True, "
+        f"device_cache=DeviceCache(),",
+        f"{PYTHON_INDENT}contract_hash=CONTRACT_HASH,",
+        "))",
     ]
     return lines
 
 
+def encoding_definition(encoding: Type[Encoding]) -> List[str]:
+    if getattr(encoding, 'numeric_opcodes', False):
+        return [
+            "class ContractEncoding(AsciiEncoding):",
+            f"{PYTHON_INDENT}numeric_opcodes = True",
+            "",
+            "",
+        ]
+    if not issubclass(encoding, BinaryEncoding):
+        return []
+
+    field_formats = ", ".join([f"{t.__name__}: '{f}'" for t, f in encoding.field_formats.items()])
+    lines = [
+        "class ContractEncoding(BinaryEncoding):",
+        f"{PYTHON_INDENT}field_formats = {{{field_formats}}}",
+        f"{PYTHON_INDENT}max_string_length = {encoding.max_string_length}",
+        "",
+        "",
+    ]
+    return lines
+
+
+def encoding_declaration(encoding: Type[Encoding]) -> List[str]:
+    if issubclass(encoding, BinaryEncoding) or getattr(encoding, 'numeric_opcodes', False):
+        return ["encoding: Type[Encoding] = ContractEncoding"]
+    return ["encoding: Type[Encoding] = AsciiEncoding"]
+
+
 def exchange_definition(cls: Type) -> List[str]:
     lines = []
     lines.append(f"class {cls.__name__}(Exchange):")
+    attributes = []
+    if getattr(cls, 'exchange_id', None) is not None:
+        attributes.append(f"{PYTHON_INDENT}exchange_id = {cls.exchange_id}")
+    if getattr(cls, 'streaming', False):
+        attributes.append(f"{PYTHON_INDENT}streaming = True")
+    if attributes:
+        lines += attributes + ['']
 
     # Check each attribute of the class
     for name, member in inspect.getmembers(cls):
@@ -72,30 +114,96 @@ def request_function(cls: Type) -> List[str]:
     return lines
 
 
+def pipelined_request_function(cls: Type) -> List[str]:
+    converted_name = convert_case(cls.__name__, to_case=CaseType.SNAKE_CASE)
+    lines = [
+        f'def request_{converted_name}_pipelined(self, request_values: Sequence[Mapping]) -> List[DecodedExchange]:',
+        PYTHON_INDENT + 'return self.request_pipelined(',
+        PYTHON_INDENT * 2 + f'requests=[({cls.__name__}, values) for values in request_values],',
+        PYTHON_INDENT + ')',
+    ]
+    return lines
+
+
+def async_request_function(cls: Type) -> List[str]:
+    request_subclass = getattr(cls, 'Request', None)
+    if not request_subclass or not is_dataclass(request_subclass):
+        raise ValueError(f"'{cls.__name__}' does not have a valid 'Request' sub-dataclass.")
+
+    func_signature = ", ".join([f"{field.name}: {field.type.__name__}" for field in fields(request_subclass)])
+    request_values = ", ".join([f"\"{field.name}\": {field.name}" for field in fields(request_subclass)])
+
+    converted_name = convert_case(cls.__name__, to_case=CaseType.SNAKE_CASE)
+    lines = [
+        f'async def request_{converted_name}_async(self, {func_signature}) -> DecodedExchange:',
+        PYTHON_INDENT + 'return await self.request(',
+        PYTHON_INDENT * 2 + f'request_values={{{request_values}}},',
+        PYTHON_INDENT * 2 + f'exchange={cls.__name__},',
+        PYTHON_INDENT + ')',
+    ]
+    return lines
+
+
+def stream_function(cls: Type, is_async: bool = False) -> List[str]:
+    request_subclass = getattr(cls, 'Request', None)
+    if not request_subclass or not is_dataclass(request_subclass):
+        raise ValueError(f"'{cls.__name__}' does not have a valid 'Request' sub-dataclass.")
+
+    field_strings = ['rate_hz: float'] + [f"{field.name}: {field.type.__name__}" for field in fields(request_subclass)]
+    func_signature = ", ".join(field_strings)
+    request_values = ", ".join([f"\"{field.name}\": {field.name}" for field in fields(request_subclass)])
+
+    converted_name = convert_case(cls.__name__, to_case=CaseType.SNAKE_CASE)
+    if is_async:
+        definition = f'def stream_{converted_name}_async(self, {func_signature}) -> ' \
+                     f'AsyncContextManager[AsyncIterator[DecodedExchange]]:'
+    else:
+        definition = f'def stream_{converted_name}(self, {func_signature}) -> ContextManager[SampleStream]:'
+    lines = [
+        definition,
+        PYTHON_INDENT + 'return self.stream(',
+        PYTHON_INDENT * 2 + f'request_values={{{request_values}}},',
+        PYTHON_INDENT * 2 + f'exchange={cls.__name__},',
+        PYTHON_INDENT * 2 + 'rate_hz=rate_hz,',
+        PYTHON_INDENT + ')',
+    ]
+    return lines
+
+
 def generate(contract: Contract) -> List[PopulatedFile]:
     dir_name = Path(os.path.dirname(os.path.abspath(__file__)))
     template_filename = dir_name / 'templates' / 'client.py'
     exchanges = get_exchanges(module=contract)
+    encoding = getattr(contract, 'Encoding', DEFAULT_ENCODING)
 
     exchange_lines = flatten([exchange_definition(ex) for ex in exchanges])
 
-    request_lines = flatten([request_function(ex) for ex in exchanges])
+    streaming_exchanges = [ex for ex in exchanges if ex.streaming]
+
+    request_functions = flatten([(request_function(ex), pipelined_request_function(ex)) for ex in exchanges])
+    request_functions += [stream_function(ex) for ex in streaming_exchanges]
+    request_lines = flatten([[''] + function for function in request_functions])[1:]
+
+    async_request_functions = [async_request_function(ex) for ex in exchanges]
+    async_request_functions += [stream_function(ex, is_async=True) for ex in streaming_exchanges]
+    async_request_lines = flatten([[''] + function for function in async_request_functions])[1:]
 
     replacements = {
         'exchange_definitions': exchange_lines,
         'request_definitions': request_lines,
-        'channel_declaration': channel_declaration(channel=contract.Channel)
+        'async_request_definitions': async_request_lines,
+        'channel_declaration': channel_declaration(channel=contract.Channel),
+        'encoding_definition': encoding_definition(encoding=encoding),
+        'encoding_declaration': encoding_declaration(encoding=encoding),
+        'contract_hash': [f"CONTRACT_HASH = '{contract_hash(contract)}'"],
     }
 
-    with open(template_filename, 'r') as template_file:
-        template = template_file.read()
-        contents = populate_template(template=template, replacements=replacements, language=Language.PYTHON)
-        file = PopulatedFile(filename='client.py', content=contents)
+    contents = load_template(template_filename, language=Language.PYTHON).render(replacements)
+    file = PopulatedFile(filename='client.py', content=contents)
 
     application_filename = dir_name / 'templates' / 'application.py'
-    with open(application_filename, 'r') as application_file:
-        application = application_file.read()
-        app_file = PopulatedFile(filename='application.py', content=application, is_main=True)
+    application = load_template(application_filename, language=Language.PYTHON).render({})
+    app_file = PopulatedFile(filename='application.py', content=application, is_main=True)
 
     return [file, app_file]
 
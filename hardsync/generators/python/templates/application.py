@@ -1,5 +1,5 @@
 from generated.client import Client
-client = Client()
 
-response = client.request_ping()
-print(response)
\ No newline at end of file
+with Client() as client:
+    response = client.request_ping()
+    print(response)
\ No newline at end of file
@@ -1,19 +1,25 @@
-from dataclasses import dataclass
-from typing import TypeVar, Type
+from dataclasses import dataclass, field
+from typing import TypeVar, Type, Sequence, Mapping, List, ContextManager, AsyncContextManager, AsyncIterator
 from hardsync.interfaces import Channel, Exchange, Encoding
-from hardsync.types import DecodedExchange
-from hardsync.clients import BaseClient
+from hardsync.types import DecodedExchange, Array
+from hardsync.clients import BaseClient, AsyncBaseClient, SampleStream
 from hardsync.channels import SerialChannel
-from hardsync.encodings import AsciiEncoding
+from hardsync.config import DeviceCache
+from hardsync.encodings import AsciiEncoding, BinaryEncoding
 
 T = TypeVar('T')
 
+# The contract this client was generated from, as reported by devices running firmware generated alongside it
+# {{contract_hash}}
+
 # channel = SerialChannel(baud_rate=9600, channel_identifier='')
 # For now, we support only a single channel
 # {{channel}}
 
 
 class Ping(Exchange):
+    exchange_id = 0
+
     @dataclass
     class Request:
         pass
@@ -23,14 +29,44 @@ class Ping(Exchange):
         pass
 
 
+class Describe(Exchange):
+    exchange_id = 255
+
+    @dataclass
+    class Request:
+        pass
+
+    @dataclass
+    class Response:
+        contract_hash: str
+        hardsync_version: str
+
+
+# {{encoding_definition}}
 # {{exchange_definitions}}
 @dataclass
 class Client(BaseClient):
     # {{channel_declaration}}
-    encoding: Type[Encoding] = AsciiEncoding
+    # {{encoding_declaration}}
 
     def request_ping(self) -> DecodedExchange:
         return self.request({}, exchange=Ping)
 
+    def request_describe(self) -> DecodedExchange:
+        return self.request({}, exchange=Describe)
+
     # {{request_definitions}}
 
+
+@dataclass
+class AsyncClient(AsyncBaseClient):
+    # {{channel_declaration}}
+    # {{encoding_declaration}}
+
+    async def request_ping_async(self) -> DecodedExchange:
+        return await self.request({}, exchange=Ping)
+
+    async def request_describe_async(self) -> DecodedExchange:
+        return await self.request({}, exchange=Describe)
+
+    # {{async_request_definitions}}
@@ -1,19 +1,25 @@
-from dataclasses import dataclass
-from typing import TypeVar, Type
+from dataclasses import dataclass, field
+from typing import TypeVar, Type, Sequence, Mapping, List, ContextManager, AsyncContextManager, AsyncIterator
 from hardsync.interfaces import Channel, Exchange, Encoding
-from hardsync.types import DecodedExchange
-from hardsync.clients import BaseClient
+from hardsync.types import DecodedExchange, Array
+from hardsync.clients import BaseClient, AsyncBaseClient, SampleStream
 from hardsync.channels import SerialChannel
-from hardsync.encodings import AsciiEncoding
+from hardsync.config import DeviceCache
+from hardsync.encodings import AsciiEncoding, BinaryEncoding
 
 T = TypeVar('T')
 
+# The contract this client was generated from, as reported by devices running firmware generated alongside it
+CONTRACT_HASH = '836d357570d8a8db'
+
 # channel = SerialChannel(baud_rate=9600, channel_identifier='')
 # For now, we support only a single channel
 # {{channel}}
 
 
 class Ping(Exchange):
+    exchange_id = 0
+
     @dataclass
     class Request:
         pass
@@ -23,6 +29,19 @@ class Ping(Exchange):
         pass
 
 
+class Describe(Exchange):
+    exchange_id = 255
+
+    @dataclass
+    class Request:
+        pass
+
+    @dataclass
+    class Response:
+        contract_hash: str
+        hardsync_version: str
+
+
 class MeasureVoltage(Exchange):
     @dataclass
     class Request:
@@ -36,15 +55,46 @@ class MeasureVoltage(Exchange):
 
 @dataclass
 class Client(BaseClient):
-    channel: Channel = SerialChannel(baud_rate=9600, channel_identifier='')
+    channel: Channel = field(default_factory=lambda: SerialChannel(
+        baud_rate=9600, channel_identifier='', persistent=True, device_cache=DeviceCache(),
+        contract_hash=CONTRACT_HASH,
+    ))
     encoding: Type[Encoding] = AsciiEncoding
 
     def request_ping(self) -> DecodedExchange:
         return self.request({}, exchange=Ping)
 
+    def request_describe(self) -> DecodedExchange:
+        return self.request({}, exchange=Describe)
+
     def request_measure_voltage(self, integration_time: float, channel: int) -> DecodedExchange:
         return self.request(
             request_values={"integration_time": integration_time, "channel": channel},
             exchange=MeasureVoltage,
         )
 
+    def request_measure_voltage_pipelined(self, request_values: Sequence[Mapping]) -> List[DecodedExchange]:
+        return self.request_pipelined(
+            requests=[(MeasureVoltage, values) for values in request_values],
+        )
+
+
+@dataclass
+class AsyncClient(AsyncBaseClient):
+    channel: Channel = field(default_factory=lambda: SerialChannel(
+        baud_rate=9600, channel_identifier='', persistent=True, device_cache=DeviceCache(),
+        contract_hash=CONTRACT_HASH,
+    ))
+    encoding: Type[Encoding] = AsciiEncoding
+
+    async def request_ping_async(self) -> DecodedExchange:
+        return await self.request({}, exchange=Ping)
+
+    async def request_describe_async(self) -> DecodedExchange:
+        return await self.request({}, exchange=Describe)
+
+    async def request_measure_voltage_async(self, integration_time: float, channel: int) -> DecodedExchange:
+        return await self.request(
+            request_values={"integration_time": integration_time, "channel": channel},
+            exchange=MeasureVoltage,
+        )
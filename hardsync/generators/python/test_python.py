@@ -1,7 +1,9 @@
 import os.path
 
 from hardsync.interfaces import Exchange
-from hardsync.generators.python import exchange_definition, request_function, generate
+from hardsync.generators.python import exchange_definition, request_function, pipelined_request_function, async_request_function, stream_function, generate
+from hardsync.generators.python import encoding_definition, encoding_declaration
+from hardsync.encodings import AsciiEncoding, BinaryEncoding
 from hardsync.generators.common import PYTHON_INDENT
 from hardsync.defaults import DEFAULT_CHANNEL
 from dataclasses import dataclass
@@ -95,6 +97,117 @@ def test_generate_request_for_current_reading():
     assert result == expected, f"Expected:\n{expected}\nGot:\n{result}"
 
 
+def test_generate_pipelined_request_for_measure_voltage():
+    expected = [
+        'def request_measure_voltage_pipelined(self, request_values: Sequence[Mapping]) -> List[DecodedExchange]:',
+        PYTHON_INDENT + 'return self.request_pipelined(',
+        PYTHON_INDENT * 2 + 'requests=[(MeasureVoltage, values) for values in request_values],',
+        PYTHON_INDENT + ')',
+    ]
+    result = pipelined_request_function(MeasureVoltage)
+    assert result == expected, f"Expected:\n{expected}\nGot:\n{result}"
+
+
+def test_generate_async_request_for_measure_voltage():
+    expected = [
+        'async def request_measure_voltage_async(self, integration_time: float, channel: int) -> DecodedExchange:',
+        PYTHON_INDENT + 'return await self.request(',
+        PYTHON_INDENT * 2 + 'request_values={"integration_time": integration_time, "channel": channel},',
+        PYTHON_INDENT * 2 + 'exchange=MeasureVoltage,',
+        PYTHON_INDENT + ')',
+    ]
+    result = async_request_function(MeasureVoltage)
+    assert result == expected, f"Expected:\n{expected}\nGot:\n{result}"
+
+
+class StreamVoltage(Exchange):
+    streaming = True
+
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        voltage: float
+
+
+def test_generate_exchange_str_streaming():
+    result = exchange_definition(StreamVoltage)
+    assert result[:3] == ['class StreamVoltage(Exchange):', PYTHON_INDENT + 'streaming = True', '']
+
+
+def test_generate_exchange_str_exchange_id():
+    class Identified(Exchange):
+        exchange_id = 4
+
+        @dataclass
+        class Request:
+            pass
+
+        @dataclass
+        class Response:
+            pass
+
+    result = exchange_definition(Identified)
+    assert result[:3] == ['class Identified(Exchange):', PYTHON_INDENT + 'exchange_id = 4', '']
+
+
+def test_generate_encoding_ascii():
+    assert encoding_definition(AsciiEncoding) == []
+    assert encoding_declaration(AsciiEncoding) == ['encoding: Type[Encoding] = AsciiEncoding']
+
+
+def test_generate_encoding_binary():
+    class Encoding(BinaryEncoding):
+        field_formats = {int: 'h', float: 'd'}
+
+    expected = [
+        'class ContractEncoding(BinaryEncoding):',
+        PYTHON_INDENT + "field_formats = {int: 'h', float: 'd'}",
+        PYTHON_INDENT + 'max_string_length = 255',
+        '',
+        '',
+    ]
+    assert encoding_definition(Encoding) == expected
+    assert encoding_declaration(Encoding) == ['encoding: Type[Encoding] = ContractEncoding']
+
+
+def test_generate_encoding_numeric_opcodes():
+    class Encoding(AsciiEncoding):
+        numeric_opcodes = True
+
+    expected = [
+        'class ContractEncoding(AsciiEncoding):',
+        PYTHON_INDENT + 'numeric_opcodes = True',
+        '',
+        '',
+    ]
+    assert encoding_definition(Encoding) == expected
+    assert encoding_declaration(Encoding) == ['encoding: Type[Encoding] = ContractEncoding']
+
+
+def test_generate_stream_function():
+    expected = [
+        'def stream_stream_voltage(self, rate_hz: float, channel: int) -> ContextManager[SampleStream]:',
+        PYTHON_INDENT + 'return self.stream(',
+        PYTHON_INDENT * 2 + 'request_values={"channel": channel},',
+        PYTHON_INDENT * 2 + 'exchange=StreamVoltage,',
+        PYTHON_INDENT * 2 + 'rate_hz=rate_hz,',
+        PYTHON_INDENT + ')',
+    ]
+    result = stream_function(StreamVoltage)
+    assert result == expected, f"Expected:\n{expected}\nGot:\n{result}"
+
+
+def test_generate_stream_function_async():
+    result = stream_function(StreamVoltage, is_async=True)
+    assert result[0] == (
+        'def stream_stream_voltage_async(self, rate_hz: float, channel: int) -> '
+        'AsyncContextManager[AsyncIterator[DecodedExchange]]:'
+    )
+
+
 def test_populate_template():
     module = ModuleType('hi')
     module.MeasureVoltage = MeasureVoltage
@@ -8,7 +8,10 @@ from hardsync.generators.common import (
     write,
     Language,
     comment_string,
-    preface_string
+    preface_string,
+    populate_template,
+    compile_template,
+    load_template,
 )
 
 from hardsync.utils import flatten
@@ -70,6 +73,18 @@ def test_write(tmp_path):
         assert actual == desired
 
 
+def test_write_unchanged_keeps_mtime(tmp_path):
+    file = PopulatedFile(filename='test_file.cpp', content='hello')
+    full_path = tmp_path / file.filename
+    write(file=file, dirname=tmp_path)
+    os.utime(full_path, ns=(0, 0))
+    write(file=file, dirname=tmp_path)
+    assert os.stat(full_path).st_mtime_ns == 0
+
+    write(file=file._replace(content='goodbye'), dirname=tmp_path)
+    assert os.stat(full_path).st_mtime_ns != 0
+
+
 @pytest.mark.parametrize(
     'language,desired',
     (
@@ -101,3 +116,45 @@ def test_preface_string(language, comment):
     assert version_in_any
     assert hash_in_any
     assert comment_in_all
+
+
+def test_populate_template_indents_lines():
+    template = 'void f() {\n    // {{body}}\n}\n'
+    actual = populate_template(template=template, replacements={'body': ['a();', '', 'b();']}, language=Language.CPP)
+    assert actual == 'void f() {\n    a();\n\n    b();\n}\n'
+
+
+def test_populate_template_empty_drops_line():
+    template = 'void f() {\n    // {{body}}\n}\n'
+    actual = populate_template(template=template, replacements={'body': []}, language=Language.CPP)
+    assert actual == 'void f() {\n}\n'
+
+
+def test_populate_template_missing_key_left_in_place():
+    template = '# {{first}}\n    # {{second}}\n'
+    actual = populate_template(template=template, replacements={'first': ['x = 1']}, language=Language.PYTHON)
+    assert actual == 'x = 1\n    # {{second}}\n'
+
+
+def test_populate_template_inline():
+    template = 'int x; // {{comment}} done\n'
+    actual = populate_template(template=template, replacements={'comment': ['y']}, language=Language.CPP)
+    assert actual == 'int x; y done\n'
+
+
+def test_compile_template_cached():
+    template = '// {{body}}\n'
+    assert compile_template(template, Language.CPP) is compile_template(template, Language.CPP)
+
+
+def test_load_template_reloads_modified(tmp_path):
+    path = tmp_path / 'template.cpp'
+    with open(path, 'w') as file:
+        file.write('// {{body}}\n')
+    assert load_template(path, Language.CPP) is load_template(path, Language.CPP)
+    assert load_template(path, Language.CPP).render({'body': ['a;']}) == 'a;\n'
+
+    with open(path, 'w') as file:
+        file.write('b;\n// {{body}}\n')
+    os.utime(path, ns=(1, 1))
+    assert load_template(path, Language.CPP).render({'body': ['a;']}) == 'b;\na;\n'
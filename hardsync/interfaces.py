@@ -2,12 +2,17 @@ from __future__ import annotations
 
 from dataclasses import dataclass, fields
 from abc import ABC, abstractmethod
-from typing import Mapping, Type, Dict, Protocol, Any
+from typing import Mapping, Type, Dict, Protocol, Any, Tuple, List
+from asyncio import StreamReader, StreamWriter
 from serial import Serial
+import logging
 
 from hardsync.types import DecodedExchange, BaudRateT
 
 
+logger = logging.getLogger(__name__)
+
+
 class ContractError(Exception):
     pass
 
@@ -30,6 +35,60 @@ class Encoding(ABC):
     def decode(exchange: Type[Exchange], contents: bytes) -> DecodedExchange:
         pass
 
+    @classmethod
+    def stream_decoder(cls, exchange: Type[Exchange]) -> StreamDecoder:
+        return StreamDecoder(encoding=cls, exchange=exchange)
+
+
+class StreamDecoder:
+    """
+    Incremental decoder for a stream of messages of one exchange. Bytes are pushed in chunks of any size, e.g. one
+    large read(in_waiting), and every message completed by the chunk is decoded. The tail of a partial message is
+    kept for the next chunk, so a high-rate stream is drained in a few reads instead of one read_until per message.
+    Messages that fail to decode are skipped and counted in discarded.
+    """
+    def __init__(self, encoding: Type[Encoding], exchange: Type[Exchange], max_buffer_size: int = 65536):
+        terminator = encoding.exchange_terminator
+        self.encoding = encoding
+        self.exchange = exchange
+        self.terminator = terminator if isinstance(terminator, bytes) else terminator.encode('ascii')
+        self.max_buffer_size = max_buffer_size
+        self.discarded = 0
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes | bytearray | memoryview) -> List[DecodedExchange]:
+        buffer = self._buffer
+        buffer += chunk
+        terminator = self.terminator
+        decoded = []
+        start = 0
+        end = buffer.find(terminator)
+        while end != -1:
+            end += len(terminator)
+            contents = bytes(buffer[start:end])
+            try:
+                decoded.append(self.encoding.decode(exchange=self.exchange, contents=contents))
+            except Exception as e:
+                logger.warning(f"Discarding undecodable message {contents} ({e})")
+                self.discarded += 1
+            start = end
+            end = buffer.find(terminator, start)
+        del buffer[:start]
+
+        if len(buffer) > self.max_buffer_size:
+            # No terminator in sight, so we are not framed. Drop the garbage and resynchronize on the next terminator
+            logger.warning(f"Discarding {len(buffer)} bytes without a message terminator")
+            self.discarded += 1
+            buffer.clear()
+        return decoded
+
+    def reset(self) -> None:
+        self._buffer.clear()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
 
 class TypeMapping:
 
@@ -44,6 +103,11 @@ class TypeMapping:
 
 
 class Exchange(ABC):
+    # Streaming exchanges are sent continuously by the device at a host-requested rate until the host stops them
+    streaming = False
+    # Small integer identifying the exchange on the wire for binary encodings. Assigned by dynamics.apply_exchange_ids
+    exchange_id: int | None = None
+
     @classmethod
     def identifier(cls):
         return cls.__name__
@@ -68,6 +132,12 @@ class Channel(ABC):
     def open(self) -> Serial:
         pass
 
+    def close(self) -> None:
+        pass
+
+    async def open_async(self) -> Tuple[StreamReader, StreamWriter]:
+        raise NotImplementedError(f"{type(self).__name__} does not support asyncio")
+
 
 @dataclass
 class Client(ABC):
@@ -0,0 +1,156 @@
+"""
+Bookkeeping for incremental code generation. The output directory keeps a manifest recording a fingerprint of
+everything that determines the generated code (the contract, the hardsync version and the generator templates and
+sources), along with a digest of each generated file. When neither has changed, generation is skipped altogether, and
+files are otherwise only rewritten when their contents change, so their mtimes do not trigger firmware rebuilds.
+"""
+import hashlib
+import inspect
+import json
+import os
+from dataclasses import fields
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+import hardsync
+from hardsync.defaults import DEFAULT_ENCODING, DEFAULT_CHANNEL, DEFAULT_TYPE_MAPPING
+from hardsync.dynamics import get_exchanges
+from hardsync.interfaces import Contract
+
+MANIFEST_FILENAME = '.hardsync-manifest.json'
+GENERATORS_DIR = hardsync.root_dir / 'generators'
+# Class attributes with these types are plain configuration, e.g. an Encoding's max_string_length
+DESCRIBED_VALUE_TYPES = (bool, int, float, str, bytes, tuple, list, dict, type(None))
+CONTRACT_HASH_LENGTH = 16
+
+
+class Manifest(NamedTuple):
+    fingerprint: str
+    # Digest of each generated file, keyed by its path relative to the output directory
+    files: Dict[str, str]
+    # Files the user is expected to edit, e.g. firmware.ino. Only their presence is checked.
+    main_files: List[str]
+
+
+def content_digest(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def file_digest(path: Path) -> Optional[str]:
+    try:
+        with open(path, 'r') as file:
+            return content_digest(file.read())
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def generator_digest() -> str:
+    """
+    Digest of the templates and generator modules. Editable installs change these without bumping the version.
+    """
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in sorted(os.walk(GENERATORS_DIR)):
+        dirnames[:] = sorted(d for d in dirnames if d not in ('__pycache__', 'test_data'))
+        for filename in sorted(filenames):
+            if filename.startswith('test_') or filename.endswith('.pyc'):
+                continue
+            path = Path(dirpath) / filename
+            digest.update(str(path.relative_to(GENERATORS_DIR)).encode('utf-8'))
+            with open(path, 'rb') as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+def describe_value(value: Any) -> Any:
+    if inspect.isclass(value):
+        return f'{value.__module__}.{value.__qualname__}'
+    if isinstance(value, dict):
+        return {repr(describe_value(key)): describe_value(val) for key, val in value.items()}
+    if isinstance(value, (tuple, list)):
+        return [describe_value(val) for val in value]
+    return value
+
+
+def describe_class(cls: type) -> Dict[str, Any]:
+    described = {}
+    for name in dir(cls):
+        value = getattr(cls, name)
+        if not name.startswith('_') and isinstance(value, DESCRIBED_VALUE_TYPES):
+            described[name] = describe_value(value)
+    return described
+
+
+def describe_contract(contract: Contract) -> Dict[str, Any]:
+    """
+    A JSON-serializable description of everything in a contract that the generators read.
+    """
+    exchanges = {}
+    for exchange in get_exchanges(contract):
+        exchanges[exchange.identifier()] = {
+            'exchange_id': exchange.exchange_id,
+            'streaming': exchange.streaming,
+            'request': [(field.name, describe_value(field.type)) for field in fields(exchange.Request)],
+            'response': [(field.name, describe_value(field.type)) for field in fields(exchange.Response)],
+        }
+
+    encoding = getattr(contract, 'Encoding', DEFAULT_ENCODING)
+    channel = getattr(contract, 'Channel', DEFAULT_CHANNEL)
+    type_mapping = getattr(contract, 'TypeMapping', DEFAULT_TYPE_MAPPING)
+    return {
+        'exchanges': exchanges,
+        'encoding': [describe_value(encoding), describe_class(encoding)],
+        'channel': [describe_value(channel), describe_class(channel)],
+        'type_mapping': describe_value(dict(getattr(type_mapping, '__annotations__', {}))),
+    }
+
+
+def contract_hash(contract: Contract) -> str:
+    """
+    Short digest of a contract's interface. Unlike the fingerprint, it does not change when hardsync is upgraded, so
+    it can identify which contract a device's firmware was generated from.
+    """
+    description = json.dumps(describe_contract(contract), sort_keys=True, default=repr)
+    return content_digest(description)[:CONTRACT_HASH_LENGTH]
+
+
+def contract_fingerprint(contract: Contract) -> str:
+    contents = {
+        'version': hardsync.__version__,
+        'hash': hardsync.__hash__,
+        'generators': generator_digest(),
+        'contract': describe_contract(contract),
+    }
+    return content_digest(json.dumps(contents, sort_keys=True, default=repr))
+
+
+def load_manifest(output_dir: Path) -> Optional[Manifest]:
+    try:
+        with open(output_dir / MANIFEST_FILENAME, 'r') as file:
+            contents = json.load(file)
+        return Manifest(
+            fingerprint=contents['fingerprint'], files=contents['files'], main_files=contents['main_files']
+        )
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        # A missing or unreadable manifest just means everything is regenerated
+        return None
+
+
+def save_manifest(output_dir: Path, manifest: Manifest) -> None:
+    contents = json.dumps(manifest._asdict(), indent=2, sort_keys=True) + '\n'
+    if file_digest(output_dir / MANIFEST_FILENAME) == content_digest(contents):
+        return
+    with open(output_dir / MANIFEST_FILENAME, 'w') as file:
+        file.write(contents)
+
+
+def is_up_to_date(output_dir: Path, manifest: Optional[Manifest], fingerprint: str) -> bool:
+    """
+    Whether the output directory already holds exactly what generating with this fingerprint would write. Generated
+    files that were edited or deleted since are regenerated.
+    """
+    if manifest is None or manifest.fingerprint != fingerprint:
+        return False
+    if not all(os.path.exists(output_dir / path) for path in manifest.main_files):
+        return False
+    return all(file_digest(output_dir / path) == digest for path, digest in manifest.files.items())
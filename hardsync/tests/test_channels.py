@@ -0,0 +1,278 @@
+import pytest
+from unittest.mock import Mock, patch
+from serial import SerialException
+from hardsync.channels import (
+    SerialChannel, PortIndex, PortWatcher, PortEvent, DeviceNotFoundError, PORT_ADDED, PORT_REMOVED,
+)
+from hardsync.config import DeviceCache, KnownDevice
+
+
+def test_open_closes_port_when_not_persistent():
+    mock_serial_class = Mock()
+    channel = SerialChannel(baud_rate=9600, channel_identifier='1234')
+    with (
+        patch('hardsync.channels.SerialChannel._find_port_by_serial', return_value='COM3'),
+        patch('hardsync.channels.Serial', mock_serial_class),
+    ):
+        with channel.open():
+            pass
+        with channel.open():
+            pass
+
+    assert mock_serial_class.call_count == 2
+    assert mock_serial_class.return_value.close.call_count == 2
+
+
+def test_open_reuses_port_when_persistent():
+    mock_serial_class = Mock()
+    channel = SerialChannel(baud_rate=9600, channel_identifier='1234', persistent=True)
+    with (
+        patch('hardsync.channels.SerialChannel._find_port_by_serial', return_value='COM3') as find_port,
+        patch('hardsync.channels.Serial', mock_serial_class),
+    ):
+        with channel.open() as first:
+            pass
+        with channel.open() as second:
+            pass
+
+    assert first is second
+    assert mock_serial_class.call_count == 1
+    assert find_port.call_count == 1
+    mock_serial_class.return_value.close.assert_not_called()
+
+
+def test_persistent_open_drops_handle_on_error():
+    mock_serial_class = Mock()
+    channel = SerialChannel(baud_rate=9600, channel_identifier='1234', persistent=True)
+    with (
+        patch('hardsync.channels.SerialChannel._find_port_by_serial', return_value='COM3'),
+        patch('hardsync.channels.Serial', mock_serial_class),
+    ):
+        with pytest.raises(SerialException):
+            with channel.open():
+                raise SerialException('device reset')
+        assert not channel.is_connected
+
+        with channel.open():
+            pass
+
+    assert mock_serial_class.call_count == 2
+
+
+def test_context_manager_closes_port():
+    mock_serial_class = Mock()
+    with (
+        patch('hardsync.channels.SerialChannel._find_port_by_serial', return_value='COM3'),
+        patch('hardsync.channels.Serial', mock_serial_class),
+    ):
+        with SerialChannel(baud_rate=9600, channel_identifier='1234') as channel:
+            with channel.open():
+                pass
+            assert channel.is_connected
+
+    assert mock_serial_class.call_count == 1
+    mock_serial_class.return_value.close.assert_called_once()
+    assert not channel.is_connected
+
+
+def _port(serial_number, device):
+    port = Mock()
+    port.serial_number = serial_number
+    port.device = device
+    return port
+
+
+def test_port_index_reuses_scan():
+    index = PortIndex()
+    ports = [_port('1234', '/dev/ttyACM0'), _port('5678', '/dev/ttyACM1')]
+    with (
+        patch('hardsync.channels.list_ports.comports', return_value=ports) as comports,
+        patch('hardsync.channels._device_present', return_value=True),
+    ):
+        assert index.lookup('1234') == '/dev/ttyACM0'
+        assert index.lookup('5678') == '/dev/ttyACM1'
+        assert index.lookup('1234') == '/dev/ttyACM0'
+
+    assert comports.call_count == 1
+
+
+def test_port_index_rescans_on_miss():
+    index = PortIndex()
+    with patch('hardsync.channels.list_ports.comports', return_value=[]) as comports:
+        assert index.lookup('1234') is None
+        assert index.lookup('1234') is None
+
+    assert comports.call_count == 2
+
+
+def test_port_index_rescans_when_device_disappears():
+    index = PortIndex()
+    index.refresh(ports=[_port('1234', '/dev/ttyACM0')])
+    with (
+        patch('hardsync.channels.list_ports.comports', return_value=[_port('1234', '/dev/ttyACM1')]) as comports,
+        patch('hardsync.channels._device_present', return_value=False),
+    ):
+        assert index.lookup('1234') == '/dev/ttyACM1'
+
+    assert comports.call_count == 1
+
+
+def test_port_index_rescans_when_another_device_takes_the_port():
+    index = PortIndex()
+    index.refresh(ports=[_port('1234', '/dev/ttyUSB0')])
+    moved = [_port('5678', '/dev/ttyUSB0'), _port('1234', '/dev/ttyUSB1')]
+    with (
+        patch('hardsync.channels.list_ports.comports', return_value=moved) as comports,
+        patch('hardsync.channels.os.path.exists', return_value=True),
+        patch('hardsync.channels._serial_number_at', side_effect={'/dev/ttyUSB0': '5678', '/dev/ttyUSB1': '1234'}.get),
+    ):
+        assert index.lookup('1234') == '/dev/ttyUSB1'
+
+    assert comports.call_count == 1
+
+
+def test_port_index_reports_changes():
+    index = PortIndex()
+    events = []
+    index.subscribe(events.append)
+    index.refresh(ports=[_port('1234', '/dev/ttyACM0'), _port('5678', '/dev/ttyACM1')])
+    index.refresh(ports=[_port('1234', '/dev/ttyACM2')])
+
+    assert events == [
+        PortEvent(kind=PORT_ADDED, serial_number='1234', device='/dev/ttyACM0'),
+        PortEvent(kind=PORT_ADDED, serial_number='5678', device='/dev/ttyACM1'),
+        PortEvent(kind=PORT_REMOVED, serial_number='1234', device='/dev/ttyACM0'),
+        PortEvent(kind=PORT_REMOVED, serial_number='5678', device='/dev/ttyACM1'),
+        PortEvent(kind=PORT_ADDED, serial_number='1234', device='/dev/ttyACM2'),
+    ]
+
+
+def test_port_watcher_only_rescans_when_ports_change():
+    index = PortIndex()
+    watcher = PortWatcher(index)
+    snapshots = iter([('ttyACM0',), ('ttyACM0',), ('ttyACM0', 'ttyACM1')])
+    ports = [_port('1234', '/dev/ttyACM0'), _port('5678', '/dev/ttyACM1')]
+    with (
+        patch('hardsync.channels._port_snapshot', side_effect=lambda: next(snapshots)),
+        patch('hardsync.channels.list_ports.comports', side_effect=[ports[:1], ports]) as comports,
+    ):
+        assert len(watcher.poll()) == 1
+        assert watcher.poll() == []
+        assert watcher.poll() == [PortEvent(kind=PORT_ADDED, serial_number='5678', device='/dev/ttyACM1')]
+
+    assert comports.call_count == 2
+
+
+def test_port_watcher_lookups_trust_index():
+    index = PortIndex()
+    with (
+        patch('hardsync.channels._port_snapshot', return_value=('ttyACM0',)),
+        patch('hardsync.channels.list_ports.comports', return_value=[_port('1234', '/dev/ttyACM0')]) as comports,
+        patch('hardsync.channels._device_present', return_value=True),
+    ):
+        with PortWatcher(index, interval=60) as watcher:
+            assert index.watched
+            assert index.lookup('1234') == '/dev/ttyACM0'
+            assert index.lookup('5678') is None
+        assert not watcher.is_running
+        assert not index.watched
+
+    assert comports.call_count == 1
+
+
+def test_persistent_channel_closes_handle_when_device_removed():
+    mock_serial_class = Mock()
+    mock_serial_class.return_value.port = '/dev/ttyACM0'
+    channel = SerialChannel(baud_rate=9600, channel_identifier='1234', persistent=True)
+    with (
+        patch('hardsync.channels.SerialChannel._find_port_by_serial', return_value='/dev/ttyACM0'),
+        patch('hardsync.channels.Serial', mock_serial_class),
+        patch('hardsync.channels.PORT_INDEX', PortIndex()) as index,
+    ):
+        index.refresh(ports=[_port('1234', '/dev/ttyACM0')])
+        channel.connect()
+        index.refresh(ports=[_port('5678', '/dev/ttyACM1')])
+        mock_serial_class.return_value.close.assert_called_once()
+
+
+def test_find_port_by_serial_not_found():
+    with patch('hardsync.channels.list_ports.comports', return_value=[]):
+        with pytest.raises(DeviceNotFoundError):
+            SerialChannel._find_port_by_serial(serial_number='does-not-exist')
+
+
+def test_known_port_skips_scan(tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600))
+    mock_serial_class = Mock()
+    channel = SerialChannel(baud_rate=9600, channel_identifier='1234', persistent=True, device_cache=cache)
+    with (
+        patch('hardsync.channels.SerialChannel._find_port_by_serial') as find_port,
+        patch('hardsync.channels._device_present', return_value=True),
+        patch('hardsync.channels.Serial', mock_serial_class),
+    ):
+        channel.connect()
+
+    find_port.assert_not_called()
+    mock_serial_class.assert_called_once_with(port='/dev/ttyACM0', baudrate=9600)
+
+
+def test_known_port_falls_back_to_scan(tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600))
+    mock_serial_class = Mock(side_effect=[SerialException('gone'), Mock()])
+    channel = SerialChannel(baud_rate=9600, channel_identifier='1234', persistent=True, device_cache=cache)
+    with (
+        patch('hardsync.channels.SerialChannel._find_port_by_serial', return_value='/dev/ttyACM1'),
+        patch('hardsync.channels._device_present', return_value=True),
+        patch('hardsync.channels.Serial', mock_serial_class),
+    ):
+        channel.connect()
+
+    assert mock_serial_class.call_args.kwargs['port'] == '/dev/ttyACM1'
+    assert DeviceCache(tmp_path / 'hardsync.ini').get('1234').port == '/dev/ttyACM1'
+
+
+def test_known_port_taken_by_another_device_falls_back_to_scan(tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600))
+    mock_serial_class = Mock()
+    channel = SerialChannel(baud_rate=9600, channel_identifier='1234', persistent=True, device_cache=cache)
+    with (
+        patch('hardsync.channels.SerialChannel._find_port_by_serial', return_value='/dev/ttyACM1'),
+        patch('hardsync.channels.os.path.exists', return_value=True),
+        patch('hardsync.channels._serial_number_at', return_value='5678'),
+        patch('hardsync.channels.Serial', mock_serial_class),
+    ):
+        channel.connect()
+
+    mock_serial_class.assert_called_once_with(port='/dev/ttyACM1', baudrate=9600)
+    assert DeviceCache(tmp_path / 'hardsync.ini').get('1234').port == '/dev/ttyACM1'
+
+
+def test_channel_remembers_port_and_uses_preferred_serial(tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.set_preferred_serial('1234')
+    channel = SerialChannel(baud_rate=115200, channel_identifier='', device_cache=cache)
+    with (
+        patch('hardsync.channels.SerialChannel._find_port_by_serial', return_value='COM3') as find_port,
+        patch('hardsync.channels.Serial', Mock()),
+    ):
+        with channel.open():
+            pass
+
+    find_port.assert_called_once_with(serial_number='1234')
+    assert DeviceCache(tmp_path / 'hardsync.ini').get('1234') == KnownDevice(
+        serial_number='1234', port='COM3', baud_rate=115200,
+    )
+
+
+def test_channel_uses_compatible_device(tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600, contract_hash='other'))
+    cache.remember(KnownDevice(serial_number='5678', port='/dev/ttyACM1', baud_rate=9600, contract_hash='abc'))
+    channel = SerialChannel(baud_rate=9600, channel_identifier='', device_cache=cache, contract_hash='abc')
+    assert channel.serial_number == '5678'
+
+    cache.set_preferred_serial('1234')
+    assert channel.serial_number == '1234'
@@ -1,11 +1,18 @@
 import pytest
+import asyncio
+import queue
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
 from hardsync.interfaces import Exchange
 from hardsync.types import ReceivedErrorResponse, DecodedExchange
-from unittest.mock import Mock, patch
-from hardsync.clients import BaseClient
+from unittest.mock import Mock, AsyncMock, patch
+from hardsync.clients import BaseClient, AsyncBaseClient, ThreadedBaseClient, ClientPool
+from hardsync.defaults import DEFAULT_CHANNEL
 from hardsync.channels import SerialChannel
 from hardsync.encodings import AsciiEncoding
 from dataclasses import dataclass
+from serial import SerialException
 
 
 class Ping(Exchange):
@@ -62,3 +69,541 @@ def test_error_with_client():
         client = BaseClient(channel=mock_channel, encoding=AsciiEncoding)
         response = client.request(request_values={}, exchange=Ping)
         assert response.name == "ErrorResponse"
+
+
+def test_reconnect_after_serial_error():
+    mock_serial_instance = Mock()
+    mock_serial_instance.read_until = Mock(side_effect=[SerialException('device reset'), b"PingResponse()\n"])
+
+    class MockOpenContextManager:
+        def __enter__(self):
+            return mock_serial_instance
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+
+    client = BaseClient(channel=mock_channel, encoding=AsciiEncoding)
+    response = client.request(request_values={}, exchange=Ping)
+    assert response == DecodedExchange(name='PingResponse', values={})
+    assert mock_serial_instance.write.call_count == 2
+
+
+def test_reconnect_gives_up():
+    mock_serial_instance = Mock()
+    mock_serial_instance.read_until = Mock(side_effect=SerialException('device unplugged'))
+
+    class MockOpenContextManager:
+        def __enter__(self):
+            return mock_serial_instance
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+
+    client = BaseClient(channel=mock_channel, encoding=AsciiEncoding, reconnect_attempts=2)
+    with pytest.raises(SerialException):
+        client.request(request_values={}, exchange=Ping)
+    assert mock_serial_instance.write.call_count == 3
+
+
+def test_client_context_manager_closes_channel():
+    mock_channel = Mock()
+    with BaseClient(channel=mock_channel, encoding=AsciiEncoding) as client:
+        assert client.channel is mock_channel
+    mock_channel.close.assert_called_once()
+
+
+class MeasureVoltage(Exchange):
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        voltage: float
+
+
+class RecordingSerial:
+    """
+    Answers every MeasureVoltageRequest with a response echoing its channel, and records the
+    maximum number of requests that were ever outstanding at once.
+    """
+    def __init__(self):
+        self.pending = []
+        self.max_pending = 0
+        self.max_pending_bytes = 0
+
+    def write(self, data):
+        self.pending.append(data)
+        self.max_pending = max(self.max_pending, len(self.pending))
+        self.max_pending_bytes = max(self.max_pending_bytes, sum(len(p) for p in self.pending))
+
+    def read_until(self, expected):
+        request = AsciiEncoding.decode(exchange=MeasureVoltage, contents=self.pending.pop(0))
+        return f"MeasureVoltageResponse(voltage={request.values['channel']}.5)\n".encode('ascii')
+
+
+def _recording_client(recording_serial, **kwargs):
+    class MockOpenContextManager:
+        def __enter__(self):
+            return recording_serial
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+    return BaseClient(channel=mock_channel, encoding=AsciiEncoding, **kwargs)
+
+
+def test_request_pipelined_matches_responses_in_order():
+    recording_serial = RecordingSerial()
+    client = _recording_client(recording_serial, rx_buffer_size=1024)
+    requests = [(MeasureVoltage, {'channel': i}) for i in range(10)]
+
+    responses = client.request_pipelined(requests=requests, max_in_flight=4)
+
+    assert [r.values['voltage'] for r in responses] == [i + 0.5 for i in range(10)]
+    assert recording_serial.max_pending == 4
+
+
+def test_request_pipelined_respects_rx_buffer():
+    recording_serial = RecordingSerial()
+    client = _recording_client(recording_serial, rx_buffer_size=100)
+    requests = [(MeasureVoltage, {'channel': i}) for i in range(10)]
+
+    responses = client.request_pipelined(requests=requests, max_in_flight=10)
+
+    assert len(responses) == 10
+    assert recording_serial.max_pending_bytes <= 100
+    assert recording_serial.max_pending == 3
+
+
+def test_request_columns():
+    np = pytest.importorskip('numpy')
+    client = _recording_client(RecordingSerial(), rx_buffer_size=1024)
+
+    columns = client.request_columns(exchange=MeasureVoltage, request_values=({'channel': i} for i in range(10)))
+
+    assert len(columns) == 10
+    np.testing.assert_array_equal(columns.columns()['voltage'], [i + 0.5 for i in range(10)])
+
+
+def test_request_pipelined_bad_depth():
+    client = _recording_client(RecordingSerial())
+    with pytest.raises(ValueError):
+        client.request_pipelined(requests=[], max_in_flight=0)
+
+
+def _async_channel(responses, chunks=()):
+    reader = Mock()
+    reader.readuntil = AsyncMock(side_effect=responses)
+    reader.read = AsyncMock(side_effect=chunks)
+    writer = Mock()
+    writer.drain = AsyncMock()
+    mock_channel = Mock()
+    mock_channel.open_async = AsyncMock(return_value=(reader, writer))
+    return mock_channel, writer
+
+
+def test_async_ping_with_client():
+    mock_channel, writer = _async_channel([b"PingResponse()\n"])
+
+    async def run():
+        async with AsyncBaseClient(channel=mock_channel, encoding=AsciiEncoding) as client:
+            return await client.request(request_values={}, exchange=Ping)
+
+    response = asyncio.run(run())
+    assert response == DecodedExchange(name='PingResponse', values={})
+    writer.write.assert_called_once_with(b"PingRequest()\n")
+    writer.close.assert_called_once()
+
+
+def test_async_client_connects_once():
+    mock_channel, writer = _async_channel([b"PingResponse()\n", b"PingResponse()\n"])
+
+    async def run():
+        client = AsyncBaseClient(channel=mock_channel, encoding=AsciiEncoding)
+        await asyncio.gather(
+            client.request(request_values={}, exchange=Ping),
+            client.request(request_values={}, exchange=Ping),
+        )
+
+    asyncio.run(run())
+    assert mock_channel.open_async.await_count == 1
+    assert writer.write.call_count == 2
+
+
+def test_async_client_reconnects():
+    mock_channel, writer = _async_channel([SerialException('device reset'), b"PingResponse()\n"])
+
+    async def run():
+        client = AsyncBaseClient(channel=mock_channel, encoding=AsciiEncoding)
+        return await client.request(request_values={}, exchange=Ping)
+
+    response = asyncio.run(run())
+    assert response.name == 'PingResponse'
+    assert mock_channel.open_async.await_count == 2
+
+
+class EchoingSerial:
+    """
+    Thread-safe stand-in for a serial port whose device answers each MeasureVoltageRequest in order.
+    """
+    def __init__(self):
+        self.responses = queue.Queue()
+        self.timeout = None
+
+    def write(self, data):
+        request = AsciiEncoding.decode(exchange=MeasureVoltage, contents=data)
+        self.responses.put(f"MeasureVoltageResponse(voltage={request.values['channel']}.5)\n".encode('ascii'))
+
+    def read_until(self, expected):
+        try:
+            return self.responses.get(timeout=self.timeout)
+        except queue.Empty:
+            return b''
+
+
+def test_threaded_client_resolves_futures_from_many_threads():
+    echoing_serial = EchoingSerial()
+
+    class MockOpenContextManager:
+        def __enter__(self):
+            return echoing_serial
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+
+    with ThreadedBaseClient(channel=mock_channel, encoding=AsciiEncoding, rx_buffer_size=1024) as client:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = list(executor.map(
+                lambda i: client.request(request_values={'channel': i}, exchange=MeasureVoltage),
+                range(50),
+            ))
+        voltages = [future.result(timeout=5).values['voltage'] for future in futures]
+
+    assert voltages == [i + 0.5 for i in range(50)]
+    mock_channel.close.assert_called_once()
+
+
+def test_threaded_client_fails_pending_on_close():
+    silent_serial = Mock()
+    silent_serial.read_until = lambda expected: b''
+
+    class MockOpenContextManager:
+        def __enter__(self):
+            return silent_serial
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+
+    client = ThreadedBaseClient(channel=mock_channel, encoding=AsciiEncoding, poll_interval=0.01)
+    future = client.request(request_values={'channel': 1}, exchange=MeasureVoltage)
+    client.close()
+
+    with pytest.raises((ConnectionError, CancelledError)):
+        future.result(timeout=5)
+    with pytest.raises(RuntimeError):
+        client.request(request_values={'channel': 1}, exchange=MeasureVoltage)
+
+
+def test_threaded_client_listen_shares_the_reader_connection():
+    silent_serial = Mock()
+    silent_serial.read_until = lambda expected: b''
+    opened = []
+
+    class MockOpenContextManager:
+        def __enter__(self):
+            opened.append(silent_serial)
+            return silent_serial
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+
+    with ThreadedBaseClient(channel=mock_channel, encoding=AsciiEncoding, poll_interval=0.01) as client:
+        with client.listen() as listening:
+            assert listening is client
+        assert opened == [silent_serial]
+
+
+class DroppingSerial:
+    """
+    Port whose device is unplugged as soon as the first request arrives, before it can answer.
+    """
+    def __init__(self):
+        self.written = []
+        self.received = threading.Event()
+        self.timeout = None
+
+    def write(self, data):
+        self.written.append(data)
+        self.received.set()
+
+    def read_until(self, expected):
+        if self.received.wait(timeout=self.timeout):
+            raise SerialException('device unplugged')
+        return b''
+
+
+def test_threaded_client_reconnects_without_mixing_up_responses():
+    dropping_serial = DroppingSerial()
+    echoing_serial = EchoingSerial()
+    echoing_serial_writes = []
+    echoing_write = echoing_serial.write
+    echoing_serial.write = lambda data: (echoing_serial_writes.append(data), echoing_write(data))
+    # The port cannot be reopened straight away, as while a board re-enumerates after being plugged back in
+    ports = iter([dropping_serial, None, None, echoing_serial])
+
+    class MockOpenContextManager:
+        def __enter__(self):
+            port = next(ports)
+            if port is None:
+                raise SerialException('could not open port')
+            return port
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+
+    client = ThreadedBaseClient(channel=mock_channel, encoding=AsciiEncoding, max_in_flight=1, poll_interval=0.01)
+    with client:
+        futures = [client.request(request_values={'channel': i}, exchange=MeasureVoltage) for i in range(5)]
+        with pytest.raises(SerialException):
+            futures[0].result(timeout=5)
+        voltages = [future.result(timeout=5).values['voltage'] for future in futures[1:]]
+
+    assert voltages == [i + 0.5 for i in range(1, 5)]
+    assert len(dropping_serial.written) == 1
+    # Nothing registered on the lost connection is sent again on the new one
+    assert len(echoing_serial_writes) == 4
+
+
+def test_threaded_client_resolves_responses_during_a_slow_write():
+    echoing_serial = EchoingSerial()
+    echoing_write = echoing_serial.write
+    futures = []
+    written = []
+    resolved_during_write = []
+
+    def slow_write(data):
+        written.append(data)
+        if len(written) == 2:
+            # The device answers the first request while it is still slow to accept the second
+            echoing_write(written[0])
+            resolved_during_write.append(futures[0].exception(timeout=1) is None)
+            echoing_write(data)
+
+    echoing_serial.write = slow_write
+
+    class MockOpenContextManager:
+        def __enter__(self):
+            return echoing_serial
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+
+    client = ThreadedBaseClient(channel=mock_channel, encoding=AsciiEncoding, max_in_flight=2, rx_buffer_size=1024)
+    with client:
+        with client.listen():
+            futures.extend(client.request(request_values={'channel': i}, exchange=MeasureVoltage) for i in range(2))
+            voltages = [future.result(timeout=5).values['voltage'] for future in futures]
+
+    assert voltages == [0.5, 1.5]
+    assert resolved_during_write == [True]
+
+
+def test_client_pool_broadcast_is_concurrent():
+    def slow_request(self, request_values, exchange):
+        time.sleep(0.2)
+        return DecodedExchange(name='PingResponse', values={'device': self.channel.channel_identifier})
+
+    serial_numbers = [f'device{i}' for i in range(8)]
+    with patch('hardsync.clients.BaseClient.request', slow_request):
+        with ClientPool(serial_numbers=serial_numbers, encoding=AsciiEncoding, channel=DEFAULT_CHANNEL) as pool:
+            start = time.monotonic()
+            results = pool.broadcast(exchange=Ping, values={})
+            elapsed = time.monotonic() - start
+
+    assert set(results) == set(serial_numbers)
+    assert all(results[sn].values['device'] == sn for sn in serial_numbers)
+    assert elapsed < 0.2 * len(serial_numbers) / 2
+
+
+def test_client_pool_map_per_device_values():
+    def echo_request(self, request_values, exchange):
+        return DecodedExchange(name='MeasureVoltageResponse', values={'voltage': request_values['channel'] + 0.5})
+
+    with patch('hardsync.clients.BaseClient.request', echo_request):
+        with ClientPool(serial_numbers=['a', 'b'], encoding=AsciiEncoding, channel=DEFAULT_CHANNEL) as pool:
+            results = pool.map(exchange=MeasureVoltage, per_device_values={'a': {'channel': 1}, 'b': {'channel': 2}})
+
+    assert results['a'].values['voltage'] == 1.5
+    assert results['b'].values['voltage'] == 2.5
+
+
+def test_client_pool_return_exceptions():
+    def failing_request(self, request_values, exchange):
+        if self.channel.channel_identifier == 'bad':
+            raise SerialException('device unplugged')
+        return DecodedExchange(name='PingResponse', values={})
+
+    with patch('hardsync.clients.BaseClient.request', failing_request):
+        with ClientPool(serial_numbers=['good', 'bad'], encoding=AsciiEncoding, channel=DEFAULT_CHANNEL) as pool:
+            results = pool.broadcast(exchange=Ping, values={}, return_exceptions=True)
+            with pytest.raises(SerialException):
+                pool.broadcast(exchange=Ping, values={})
+
+    assert results['good'].name == 'PingResponse'
+    assert isinstance(results['bad'], SerialException)
+
+
+class StreamVoltage(Exchange):
+    streaming = True
+
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        voltage: float
+
+
+class StreamingSerial:
+    """
+    Emits voltage samples once a stream is started, and acknowledges the stop request after the samples
+    already in transit. Samples pile up in the input buffer, so reads return many messages at once.
+    """
+    def __init__(self, samples_in_transit=3):
+        self.written = []
+        self.buffer = bytearray()
+        self.arrived = threading.Condition()
+        self.timeout = None
+        self.samples_in_transit = samples_in_transit
+        self.reads = 0
+
+    def write(self, data):
+        self.written.append(data)
+        if data.startswith(b'StreamVoltageStreamRequest'):
+            self._arrive(b''.join([f"StreamVoltageResponse(voltage={i}.5)\n".encode('ascii') for i in range(10)]))
+        elif data.startswith(b'StreamVoltageStopRequest'):
+            self._arrive(b"StreamVoltageResponse(voltage=99.5)\n" * self.samples_in_transit)
+            self._arrive(b"StreamVoltageStopResponse()\n")
+
+    def _arrive(self, data):
+        with self.arrived:
+            self.buffer += data
+            self.arrived.notify_all()
+
+    @property
+    def in_waiting(self):
+        return len(self.buffer)
+
+    def read(self, size=1):
+        with self.arrived:
+            self.arrived.wait_for(lambda: self.buffer, timeout=self.timeout)
+            self.reads += 1
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            return data
+
+    def reset_input_buffer(self):
+        self.buffer.clear()
+
+
+def test_stream_yields_samples_and_stops():
+    streaming_serial = StreamingSerial()
+
+    class MockOpenContextManager:
+        def __enter__(self):
+            return streaming_serial
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+    client = BaseClient(channel=mock_channel, encoding=AsciiEncoding)
+
+    with client.stream(request_values={'channel': 2}, exchange=StreamVoltage, rate_hz=1000) as samples:
+        voltages = [next(samples).values['voltage'] for _ in range(10)]
+        assert samples.dropped == 0
+
+    assert voltages == [i + 0.5 for i in range(10)]
+    assert streaming_serial.reads < 10
+    assert streaming_serial.written[0] == b'StreamVoltageStreamRequest(period_us=1000,channel=2)\n'
+    assert streaming_serial.written[-1] == b'StreamVoltageStopRequest()\n'
+    assert samples.acknowledged
+    assert streaming_serial.timeout is None
+
+
+def test_stream_drops_oldest_when_buffer_full():
+    streaming_serial = StreamingSerial()
+
+    class MockOpenContextManager:
+        def __enter__(self):
+            return streaming_serial
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            pass
+
+    mock_channel = Mock()
+    mock_channel.open = MockOpenContextManager
+    client = BaseClient(channel=mock_channel, encoding=AsciiEncoding)
+
+    with client.stream(request_values={'channel': 2}, exchange=StreamVoltage, rate_hz=1000, buffer_size=4) as samples:
+        pass
+
+    remaining = [sample.values['voltage'] for sample in samples]
+    assert len(remaining) == 4
+    assert samples.dropped == 13 - 4
+
+
+def test_stream_rejects_non_streaming_exchange():
+    client = BaseClient(channel=Mock(), encoding=AsciiEncoding)
+    with pytest.raises(ValueError):
+        with client.stream(request_values={'channel': 2}, exchange=MeasureVoltage, rate_hz=1000):
+            pass
+
+
+def test_async_stream_yields_samples_and_stops():
+    lines = [f"StreamVoltageResponse(voltage={i}.5)\n".encode('ascii') for i in range(5)]
+    lines += [b"StreamVoltageResponse(voltage=99.5)\n", b"StreamVoltageStopResponse()\n"]
+    # Several messages per read, with one split across reads
+    contents = b''.join(lines)
+    mock_channel, writer = _async_channel([], chunks=[contents[:50], contents[50:130], contents[130:]])
+
+    async def run():
+        client = AsyncBaseClient(channel=mock_channel, encoding=AsciiEncoding)
+        voltages = []
+        async with client.stream(request_values={'channel': 2}, exchange=StreamVoltage, rate_hz=100) as samples:
+            async for sample in samples:
+                voltages.append(sample.values['voltage'])
+                if len(voltages) == 5:
+                    break
+        return voltages
+
+    voltages = asyncio.run(run())
+    assert voltages == [i + 0.5 for i in range(5)]
+    assert writer.write.call_args_list[0].args[0] == b'StreamVoltageStreamRequest(period_us=10000,channel=2)\n'
+    assert writer.write.call_args_list[-1].args[0] == b'StreamVoltageStopRequest()\n'
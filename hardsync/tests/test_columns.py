@@ -0,0 +1,96 @@
+import pytest
+from dataclasses import dataclass
+from hardsync import columns as columns_module
+from hardsync.columns import ResponseColumns, collect, response_dtype
+from hardsync.interfaces import Exchange
+from hardsync.types import DecodedExchange, ReceivedErrorResponse, Array
+
+
+class MeasureIV(Exchange):
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        voltage: float
+        current: float
+        in_range: bool
+        label: str
+
+
+def sample(i: int) -> DecodedExchange:
+    return DecodedExchange(
+        name='MeasureIVResponse',
+        values={'voltage': i + 0.5, 'current': -i, 'in_range': i % 2 == 0, 'label': f'ch{i}'},
+    )
+
+
+def test_collect_grows_past_capacity():
+    np = pytest.importorskip('numpy')
+    columns = collect((sample(i) for i in range(10)), exchange=MeasureIV, capacity=3)
+
+    assert len(columns) == 10
+    assert columns.capacity == 12
+    values = columns.columns()
+    assert values['voltage'].dtype == np.float64
+    assert values['voltage'].tolist() == [i + 0.5 for i in range(10)]
+    assert values['in_range'].tolist() == [i % 2 == 0 for i in range(10)]
+    assert values['label'].tolist() == [f'ch{i}' for i in range(10)]
+
+
+def test_collect_limit():
+    columns = collect((sample(i) for i in range(10)), exchange=MeasureIV, limit=4)
+    assert len(columns) == 4
+
+
+def test_records():
+    np = pytest.importorskip('numpy')
+    columns = collect((sample(i) for i in range(3)), exchange=MeasureIV)
+
+    records = columns.records()
+    assert records.dtype == response_dtype(MeasureIV)
+    assert records.shape == (3,)
+    assert records[1]['current'] == -1.0
+    assert records['label'].tolist() == ['ch0', 'ch1', 'ch2']
+
+
+def test_array_fields_are_objects():
+    np = pytest.importorskip('numpy')
+
+    class Waveform(Exchange):
+        @dataclass
+        class Request:
+            pass
+
+        @dataclass
+        class Response:
+            samples: Array[float, 4]
+
+    decoded = [DecodedExchange(name='WaveformResponse', values={'samples': np.arange(i + 1.0)}) for i in range(3)]
+    samples = collect(decoded, exchange=Waveform).columns()['samples']
+    assert [s.tolist() for s in samples] == [[0.0], [0.0, 1.0], [0.0, 1.0, 2.0]]
+
+
+def test_collect_without_numpy(monkeypatch):
+    monkeypatch.setattr(columns_module, 'np', None)
+    columns = collect((sample(i) for i in range(3)), exchange=MeasureIV)
+
+    values = columns.columns()
+    assert values['voltage'].typecode == 'd'
+    assert list(values['voltage']) == [0.5, 1.5, 2.5]
+    assert values['label'] == ['ch0', 'ch1', 'ch2']
+    with pytest.raises(ImportError):
+        columns.records()
+
+
+def test_error_response_raises():
+    columns = ResponseColumns(exchange=MeasureIV)
+    with pytest.raises(ReceivedErrorResponse):
+        columns.append(DecodedExchange(name='ErrorResponse', values={'msg': 'Overrange'}))
+
+
+def test_unexpected_response_raises():
+    columns = ResponseColumns(exchange=MeasureIV)
+    with pytest.raises(ValueError):
+        columns.append(DecodedExchange(name='PingResponse', values={}))
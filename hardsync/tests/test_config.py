@@ -0,0 +1,71 @@
+import os
+from hardsync.config import DeviceCache, KnownDevice
+
+
+def test_device_cache_round_trip(tmp_path):
+    path = tmp_path / 'hardsync.ini'
+    device = KnownDevice(
+        serial_number='1234', port='/dev/ttyACM0', baud_rate=115200, contract_hash='abc', hardsync_version='0.3.0',
+        capabilities=('MeasureVoltage', 'DoAction'),
+    )
+    DeviceCache(path).remember(device)
+    assert DeviceCache(path).get('1234') == device
+    assert DeviceCache(path).get('5678') is None
+
+
+def test_device_cache_keeps_preferred_serial(tmp_path):
+    path = tmp_path / 'hardsync.ini'
+    cache = DeviceCache(path)
+    cache.set_preferred_serial('1234')
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600))
+    DeviceCache(path).set_preferred_serial('5678')
+
+    cache = DeviceCache(path)
+    assert cache.preferred_serial == '5678'
+    assert cache.get('1234').port == '/dev/ttyACM0'
+
+
+def test_device_cache_keeps_contract_hash_for_same_port(tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600, contract_hash='abc'))
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600))
+    assert cache.get('1234').contract_hash == 'abc'
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM1', baud_rate=9600))
+    assert cache.get('1234').contract_hash == ''
+
+
+def test_device_cache_unchanged_is_not_rewritten(tmp_path):
+    path = tmp_path / 'hardsync.ini'
+    device = KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600)
+    DeviceCache(path).remember(device)
+    os.utime(path, ns=(0, 0))
+    DeviceCache(path).remember(device)
+    assert os.stat(path).st_mtime_ns == 0
+
+
+def test_device_cache_forget(tmp_path):
+    path = tmp_path / 'hardsync.ini'
+    cache = DeviceCache(path)
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600))
+    cache.forget('1234')
+    assert DeviceCache(path).get('1234') is None
+
+
+def test_device_cache_missing_file(tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    assert cache.preferred_serial == ''
+    assert cache.get('1234') is None
+
+
+def test_device_cache_compatible(tmp_path):
+    path = tmp_path / 'hardsync.ini'
+    cache = DeviceCache(path)
+    cache.set_preferred_serial('1234')
+    cache.remember(KnownDevice(serial_number='1234', port='/dev/ttyACM0', baud_rate=9600, contract_hash='abc'))
+    cache.remember(KnownDevice(serial_number='5678', port='/dev/ttyACM1', baud_rate=9600, contract_hash='def'))
+    cache.remember(KnownDevice(serial_number='9012', port='/dev/ttyACM2', baud_rate=9600, contract_hash='abc'))
+
+    cache = DeviceCache(path)
+    assert [device.serial_number for device in cache.devices()] == ['1234', '5678', '9012']
+    assert [device.serial_number for device in cache.compatible('abc')] == ['1234', '9012']
+    assert cache.compatible('') == []
@@ -0,0 +1,273 @@
+import time
+from datetime import timedelta
+from typing import NamedTuple, Optional
+from unittest.mock import patch
+import pytest
+from serial import SerialException
+from hardsync.config import DeviceCache, KnownDevice
+from hardsync.defaults import DEFAULT_ENCODING, DEFAULT_CHANNEL
+from hardsync.channels import PortIndex
+from hardsync.discovery import (
+    pyserial_discover, _attempt_connection, DISCOVERY_BAUD_RATES, DiscoveredPort, DeviceDescription,
+)
+
+
+class FakePort(NamedTuple):
+    device: str
+    serial_number: Optional[str]
+
+
+class FakeSerial:
+    """
+    Stand-in for serial.Serial. Devices named ping-* answer Ping after reply_delay seconds, devices named garbage-*
+    answer with bytes that are not a hardsync message, busy-* cannot be opened, and every other device is silent. A
+    device named e.g. ping0@115200 only answers at that baud rate, and any other baud rate by default. Devices answer
+    Describe with contract_hash, or with an error when it is None, like firmware generated before Describe existed.
+    """
+    reply_delay = 0.0
+    contract_hash = None
+    opened = []
+
+    def __init__(self, port, baudrate, timeout=None):
+        if port.startswith('busy'):
+            raise SerialException(f'could not open port {port}')
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.opened_at = time.monotonic()
+        self.is_open = True
+        self.request = b''
+        FakeSerial.opened.append(self)
+
+    def write(self, data):
+        self.request = data
+
+    def reset_input_buffer(self):
+        pass
+
+    def read_until(self, expected):
+        reply_at = self.opened_at + self.reply_delay
+        device_name, _, baud_rate = self.port.partition('@')
+        answers = device_name.startswith('ping') and (not baud_rate or int(baud_rate) == self.baudrate)
+        if answers and time.monotonic() + self.timeout >= reply_at:
+            time.sleep(max(0.0, reply_at - time.monotonic()))
+            if not self.request.startswith(b'DescribeRequest'):
+                return b'PingResponse()\n'
+            if self.contract_hash is None:
+                return b'ErrorResponse(msg=Unidentified command: DescribeRequest)\n'
+            return f'DescribeResponse(contract_hash={self.contract_hash},hardsync_version=0.3.0)\n'.encode()
+        if self.port.startswith('garbage'):
+            return b'\xff\xfe\n'
+        time.sleep(self.timeout)
+        return b''
+
+    def close(self):
+        self.is_open = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+@pytest.fixture
+def fake_serial():
+    FakeSerial.opened = []
+    FakeSerial.reply_delay = 0.0
+    FakeSerial.contract_hash = None
+    with patch('hardsync.discovery.serial.Serial', FakeSerial):
+        yield FakeSerial
+
+
+def discover(ports, **kwargs):
+    with patch('hardsync.discovery.list_ports.comports', return_value=ports):
+        return pyserial_discover(encoding=DEFAULT_ENCODING, channel=DEFAULT_CHANNEL, **kwargs)
+
+
+def test_discover_scans_ports_in_parallel(fake_serial):
+    ports = [FakePort(f'silent{i}', f'S{i}') for i in range(16)] + [FakePort('ping0', 'P0')]
+    start = time.monotonic()
+    assert discover(ports, timeout=timedelta(milliseconds=300)) == ['P0']
+    assert time.monotonic() - start < 1.5
+    assert len(fake_serial.opened) == 17
+    assert not any(ser.is_open for ser in fake_serial.opened)
+
+
+def test_discover_returns_in_port_order(fake_serial):
+    ports = [FakePort('ping0', 'P0'), FakePort('silent0', 'S0'), FakePort('ping1', 'P1')]
+    assert discover(ports, timeout=timedelta(milliseconds=300)) == ['P0', 'P1']
+
+
+def test_discover_preferred_cancels_remaining(fake_serial):
+    ports = [FakePort(f'silent{i}', f'S{i}') for i in range(4)] + [FakePort('ping0', 'P0')]
+    start = time.monotonic()
+    assert discover(ports, preferred_serial='P0', timeout=timedelta(seconds=10)) == ['P0']
+    assert time.monotonic() - start < 2
+    assert not any(ser.is_open for ser in fake_serial.opened)
+
+
+def test_discover_skips_busy_and_incompatible_ports(fake_serial):
+    ports = [FakePort('busy0', 'B0'), FakePort('garbage0', 'G0'), FakePort('ping0', 'P0')]
+    assert discover(ports, timeout=timedelta(milliseconds=300)) == ['P0']
+
+
+def test_attempt_connection_retries_until_reset(fake_serial):
+    # The board misses the first pings while it resets, so the probe keeps pinging on the same handle
+    fake_serial.reply_delay = 0.6
+    deadline = time.monotonic() + 2
+    port = FakePort('ping0', 'P0')
+    discovered = _attempt_connection(port=port, channel=DEFAULT_CHANNEL, encoding=DEFAULT_ENCODING, deadline=deadline)
+    assert discovered == DiscoveredPort(port=port, baud_rate=DEFAULT_CHANNEL.baud_rate)
+    assert len(fake_serial.opened) == 1
+
+
+def test_attempt_connection_respects_subsecond_deadline(fake_serial):
+    start = time.monotonic()
+    port = FakePort('silent0', 'S0')
+    deadline = start + 0.2
+    assert _attempt_connection(port=port, channel=DEFAULT_CHANNEL, encoding=DEFAULT_ENCODING, deadline=deadline) is None
+    assert time.monotonic() - start < 0.5
+
+
+def test_discover_known_port_skips_scan(fake_serial, tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.remember(KnownDevice(serial_number='P0', port='ping0', baud_rate=DEFAULT_CHANNEL.baud_rate))
+    with (
+        patch('hardsync.discovery._device_present', return_value=True),
+        patch('hardsync.discovery.list_ports.comports') as comports,
+    ):
+        serial_numbers = pyserial_discover(
+            encoding=DEFAULT_ENCODING, channel=DEFAULT_CHANNEL, preferred_serial='P0', device_cache=cache,
+        )
+
+    assert serial_numbers == ['P0']
+    comports.assert_not_called()
+    assert len(fake_serial.opened) == 1
+
+
+def test_discover_known_port_taken_by_another_device_scans(fake_serial, tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.remember(KnownDevice(serial_number='P0', port='ping0', baud_rate=DEFAULT_CHANNEL.baud_rate))
+    with (
+        patch('hardsync.channels.os.path.exists', return_value=True),
+        patch('hardsync.channels._serial_number_at', return_value='P1'),
+        patch('hardsync.discovery.list_ports.comports', return_value=[FakePort('ping1', 'P0')]) as comports,
+    ):
+        serial_numbers = pyserial_discover(
+            encoding=DEFAULT_ENCODING, channel=DEFAULT_CHANNEL, preferred_serial='P0', device_cache=cache,
+        )
+
+    assert serial_numbers == ['P0']
+    comports.assert_called_once()
+    assert [ser.port for ser in fake_serial.opened] == ['ping1']
+
+
+def test_discover_known_port_miss_scans_and_records(fake_serial, tmp_path):
+    fake_serial.contract_hash = 'abc'
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.remember(KnownDevice(serial_number='P0', port='silent0', baud_rate=DEFAULT_CHANNEL.baud_rate))
+    ports = [FakePort('silent0', 'S0'), FakePort('ping0', 'P0')]
+    with patch('hardsync.discovery._device_present', return_value=True):
+        serial_numbers = discover(
+            ports, preferred_serial='P0', device_cache=cache, contract_hash='abc', timeout=timedelta(milliseconds=300),
+            capabilities=('MeasureVoltage',),
+        )
+
+    assert serial_numbers == ['P0']
+    assert DeviceCache(tmp_path / 'hardsync.ini').get('P0') == KnownDevice(
+        serial_number='P0', port='ping0', baud_rate=DEFAULT_CHANNEL.baud_rate, contract_hash='abc',
+        hardsync_version='0.3.0', capabilities=('MeasureVoltage',),
+    )
+
+
+def test_discover_uses_watched_ports(fake_serial):
+    index = PortIndex()
+    index.refresh(ports=[FakePort('silent0', 'S0'), FakePort('ping0', 'P0')])
+    with (
+        patch('hardsync.discovery.PORT_INDEX', index),
+        patch('hardsync.discovery.PORT_WATCHER') as watcher,
+        patch('hardsync.discovery.list_ports.comports') as comports,
+    ):
+        watcher.is_running = True
+        serial_numbers = pyserial_discover(
+            encoding=DEFAULT_ENCODING, channel=DEFAULT_CHANNEL, timeout=timedelta(milliseconds=300),
+        )
+
+    assert serial_numbers == ['P0']
+    comports.assert_not_called()
+
+
+def test_discover_survives_failing_probe(fake_serial):
+    def attempt_connection(port, **kwargs):
+        if port.serial_number == 'P0':
+            raise RuntimeError('driver bug')
+        return _attempt_connection(port=port, **kwargs)
+
+    ports = [FakePort('ping0', 'P0'), FakePort('ping1', 'P1')]
+    with patch('hardsync.discovery._attempt_connection', attempt_connection):
+        serial_numbers = discover(ports, timeout=timedelta(milliseconds=300))
+
+    assert serial_numbers == ['P1']
+
+
+def test_attempt_connection_cycles_baud_rates(fake_serial):
+    deadline = time.monotonic() + 3
+    port = FakePort('ping0@300', 'P0')
+    discovered = _attempt_connection(
+        port=port, channel=DEFAULT_CHANNEL, encoding=DEFAULT_ENCODING, deadline=deadline,
+        baud_rates=DISCOVERY_BAUD_RATES,
+    )
+    assert discovered.baud_rate == 300
+    assert len(fake_serial.opened) == 1
+
+
+def test_discover_records_answering_baud_rate(fake_serial, tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    ports = [FakePort('ping0@2000000', 'P0'), FakePort('ping1@9600', 'P1'), FakePort('silent0', 'S0')]
+    serial_numbers = discover(
+        ports, device_cache=cache, baud_rates=DISCOVERY_BAUD_RATES, timeout=timedelta(milliseconds=500),
+    )
+
+    assert serial_numbers == ['P0', 'P1']
+    assert cache.get('P0').baud_rate == 2_000_000
+    assert cache.get('P1').baud_rate == 9600
+
+
+def test_discover_known_port_at_any_baud_rate(fake_serial, tmp_path):
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    cache.remember(KnownDevice(serial_number='P0', port='ping0@115200', baud_rate=115_200))
+    with (
+        patch('hardsync.discovery._device_present', return_value=True),
+        patch('hardsync.discovery.list_ports.comports') as comports,
+    ):
+        serial_numbers = pyserial_discover(
+            encoding=DEFAULT_ENCODING, channel=DEFAULT_CHANNEL, preferred_serial='P0', device_cache=cache,
+            baud_rates=DISCOVERY_BAUD_RATES,
+        )
+
+    assert serial_numbers == ['P0']
+    comports.assert_not_called()
+    assert fake_serial.opened[0].baudrate == 115_200
+
+
+def test_attempt_connection_describes_device(fake_serial):
+    fake_serial.contract_hash = 'abc'
+    port = FakePort('ping0', 'P0')
+    deadline = time.monotonic() + 1
+    discovered = _attempt_connection(port=port, channel=DEFAULT_CHANNEL, encoding=DEFAULT_ENCODING, deadline=deadline)
+    assert discovered.description == DeviceDescription(contract_hash='abc', hardsync_version='0.3.0')
+
+
+def test_discover_records_other_contracts_without_capabilities(fake_serial, tmp_path):
+    fake_serial.contract_hash = 'def'
+    cache = DeviceCache(tmp_path / 'hardsync.ini')
+    serial_numbers = discover(
+        [FakePort('ping0', 'P0')], device_cache=cache, contract_hash='abc', capabilities=('MeasureVoltage',),
+        timeout=timedelta(milliseconds=300),
+    )
+
+    assert serial_numbers == ['P0']
+    assert cache.get('P0').contract_hash == 'def'
+    assert cache.get('P0').capabilities == ()
+    assert cache.compatible('abc') == []
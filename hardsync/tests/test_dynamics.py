@@ -10,8 +10,13 @@ from hardsync.dynamics import (
     input_types,
     validate_type_mapping,
     validate_channel,
+    validate_exchange,
     validate,
     SPECIAL_CLASS_NAMES,
+    stream_start_exchange,
+    stream_stop_exchange,
+    apply_exchange_ids,
+    validate_array_fields,
 )
 from hardsync.interfaces import (
     Exchange,
@@ -19,7 +24,8 @@ from hardsync.interfaces import (
     ContractError,
     Channel as ChannelI,
 )
-from hardsync.encodings import AsciiEncoding
+from hardsync.encodings import AsciiEncoding, BinaryEncoding
+from hardsync.types import Array
 from types import ModuleType
 from typing import List
 from dataclasses import is_dataclass, fields, field, dataclass
@@ -262,3 +268,155 @@ def test_validate_channel_bad():
     with pytest.raises(ContractError):
         validate_channel(channel=BadChannel)
 
+
+
+class StreamVoltage(Exchange):
+    streaming = True
+
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        voltage: float
+
+
+def test_stream_start_exchange():
+    start = stream_start_exchange(StreamVoltage)
+    assert start.identifier() == 'StreamVoltageStream'
+    assert [(f.name, f.type) for f in fields(start.Request)] == [('period_us', int), ('channel', int)]
+    assert stream_start_exchange(StreamVoltage) is start
+
+
+def test_stream_stop_exchange():
+    stop = stream_stop_exchange(StreamVoltage)
+    assert stop.identifier() == 'StreamVoltageStop'
+    assert fields(stop.Request) == ()
+
+
+def test_validate_exchange_stream_period_clash():
+    class BadStream(Exchange):
+        streaming = True
+
+        @dataclass
+        class Request:
+            period_us: int
+
+        @dataclass
+        class Response:
+            pass
+
+    with pytest.raises(ContractError):
+        validate_exchange(BadStream)
+
+
+def make_exchange(name: str, **attributes) -> type:
+    return type(name, (Exchange,), dict(attributes))
+
+
+def test_apply_exchange_ids_declaration_order():
+    module = ModuleType('contract')
+    module.Zeta = make_exchange('Zeta')
+    module.Alpha = make_exchange('Alpha')
+    module.Encoding = BinaryEncoding
+    apply_exchange_ids(module)
+    assert (module.Zeta.exchange_id, module.Alpha.exchange_id) == (1, 2)
+
+
+def test_apply_exchange_ids_explicit():
+    module = ModuleType('contract')
+    module.First = make_exchange('First')
+    module.Pinned = make_exchange('Pinned', exchange_id=1)
+    apply_exchange_ids(module)
+    assert (module.First.exchange_id, module.Pinned.exchange_id) == (2, 1)
+
+
+def test_apply_exchange_ids_duplicate():
+    module = ModuleType('contract')
+    module.First = make_exchange('First', exchange_id=5)
+    module.Second = make_exchange('Second', exchange_id=5)
+    with pytest.raises(ContractError):
+        apply_exchange_ids(module)
+
+
+def test_apply_exchange_ids_reserved_for_ping():
+    module = ModuleType('contract')
+    module.First = make_exchange('First', exchange_id=0)
+    with pytest.raises(ContractError):
+        apply_exchange_ids(module)
+
+
+def test_apply_exchange_ids_reserved_for_describe():
+    module = ModuleType('contract')
+    module.Last = make_exchange('Last', exchange_id=255)
+    with pytest.raises(ContractError):
+        apply_exchange_ids(module)
+
+    module = ModuleType('contract')
+    module.Describe = make_exchange('Describe')
+    with pytest.raises(ContractError):
+        apply_exchange_ids(module)
+
+
+def test_get_exchanges_permissive_skips_imported_bases():
+    module = ModuleType('contract')
+    module.BinaryEncoding = BinaryEncoding
+    module.First = make_exchange('First')
+    assert get_exchanges_permissive(module) == [module.First]
+
+
+class Waveform(Exchange):
+    @dataclass
+    class Request:
+        channel: int
+
+    @dataclass
+    class Response:
+        samples: Array[float, 64]
+
+
+def test_array_type_identity():
+    assert Array[float, 64] is Waveform.Response.__dataclass_fields__['samples'].type
+    assert Array[float, 64].__name__ == 'Array[float, 64]'
+    assert (Array[int, 3].element_type, Array[int, 3].max_length) == (int, 3)
+    with pytest.raises(TypeError):
+        Array[float, 0]
+
+
+def test_input_types_array():
+    assert input_types(Waveform) == [int, float]
+
+
+def test_validate_array_fields_requires_capacity():
+    class Unbounded(Exchange):
+        @dataclass
+        class Request:
+            samples: list[float]
+
+        @dataclass
+        class Response:
+            pass
+
+    assert validate_array_fields(Waveform) == []
+    assert len(validate_array_fields(Unbounded)) == 1
+
+
+def test_validate_array_fields_element_type():
+    class Labels(Exchange):
+        @dataclass
+        class Request:
+            pass
+
+        @dataclass
+        class Response:
+            labels: Array[str, 4]
+
+    assert len(validate_array_fields(Labels)) == 1
+
+
+def test_get_exchanges_permissive_skips_array():
+    module = ModuleType('contract')
+    module.Array = Array
+    module.First = make_exchange('First')
+    assert get_exchanges_permissive(module) == [module.First]
@@ -3,6 +3,7 @@ import os
 import shutil
 from hardsync import test_data_dir
 from hardsync.__main__ import generate, main_undecorated
+from hardsync.manifest import MANIFEST_FILENAME, load_manifest
 from hardsync.interfaces import Exchange, ContractError, Channel as ChannelI
 from dataclasses import dataclass
 from types import ModuleType
@@ -63,7 +64,7 @@ def test_good_contracts(tmp_path):
     paths = [contracts_dir / c for c in contracts]
     for path in paths:
         main_undecorated(output_dir=tmp_path, contract=path, force=False)
-        desired_files = set([fn for fn in desired_client_files + ('firmware',)])
+        desired_files = set([fn for fn in desired_client_files + ('firmware', MANIFEST_FILENAME)])
         actual_files = set(os.listdir(tmp_path))
         assert actual_files == desired_files
 
@@ -83,11 +84,41 @@ def test_bad_contracts(tmp_path):
             main_undecorated(output_dir=tmp_path, contract=path, force=False)
 
 
-def test_unsupported_contracts(tmp_path):
-    contracts_dir = test_data_dir / 'unsupported_contracts'
-    contracts = os.listdir(contracts_dir)
-    contracts = [c for c in contracts if c.endswith('.py')]
-    paths = [contracts_dir / c for c in contracts]
-    for path in paths:
-        with pytest.raises(AssertionError):
-            main_undecorated(output_dir=tmp_path, contract=path, force=False)
+def modification_times(directory):
+    return {
+        os.path.join(dirpath, filename): os.stat(os.path.join(dirpath, filename)).st_mtime_ns
+        for dirpath, _, filenames in os.walk(directory) for filename in filenames
+    }
+
+
+def test_generate_writes_manifest(tmp_path):
+    generate(contract=contract, output_dir=tmp_path)
+    manifest = load_manifest(tmp_path)
+    assert set(manifest.files) == {'firmware/client.h', 'firmware/client.cpp', 'firmware/parser.h',
+                                   'firmware/parser.cpp', 'client.py'}
+    assert set(manifest.main_files) == {'firmware/firmware.ino', 'application.py'}
+
+
+def test_regenerate_unchanged_leaves_files_alone(tmp_path):
+    generate(contract=contract, output_dir=tmp_path)
+    before = modification_times(tmp_path)
+    generate(contract=contract, output_dir=tmp_path)
+    generate(contract=contract, output_dir=tmp_path, force=True)
+    assert modification_times(tmp_path) == before
+
+
+def test_regenerate_restores_edited_files(tmp_path):
+    generate(contract=contract, output_dir=tmp_path)
+    client_path = tmp_path / 'firmware' / 'client.cpp'
+    with open(client_path, 'r') as file:
+        desired = file.read()
+    with open(client_path, 'w') as file:
+        file.write('// edited by hand\n')
+    os.remove(tmp_path / 'client.py')
+    parser_mtime = os.stat(tmp_path / 'firmware' / 'parser.cpp').st_mtime_ns
+
+    generate(contract=contract, output_dir=tmp_path)
+    with open(client_path, 'r') as file:
+        assert file.read() == desired
+    assert os.path.exists(tmp_path / 'client.py')
+    assert os.stat(tmp_path / 'firmware' / 'parser.cpp').st_mtime_ns == parser_mtime
@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+from types import ModuleType
+from unittest.mock import patch
+from hardsync.defaults import DEFAULT_TYPE_MAPPING, DEFAULT_ENCODING
+from hardsync.dynamics import apply_defaults
+from hardsync.manifest import (
+    Manifest,
+    contract_fingerprint,
+    contract_hash,
+    content_digest,
+    load_manifest,
+    save_manifest,
+    is_up_to_date,
+    MANIFEST_FILENAME,
+)
+from hardsync.types import Array
+
+
+def make_contract(response_type=float, max_string_length=None) -> ModuleType:
+    class MeasureVoltage:
+        @dataclass
+        class Request:
+            channel: int
+            samples: Array[float, 4]
+
+        @dataclass
+        class Response:
+            voltage: response_type
+
+    contract = ModuleType('contract')
+    contract.MeasureVoltage = MeasureVoltage
+    contract.TypeMapping = DEFAULT_TYPE_MAPPING
+    if max_string_length is not None:
+        contract.Encoding = type('Encoding', (DEFAULT_ENCODING,), {'max_string_length': max_string_length})
+    apply_defaults(contract)
+    return contract
+
+
+def test_contract_fingerprint_stable():
+    assert contract_fingerprint(make_contract()) == contract_fingerprint(make_contract())
+
+
+def test_contract_fingerprint_changes():
+    fingerprint = contract_fingerprint(make_contract())
+    assert contract_fingerprint(make_contract(response_type=int)) != fingerprint
+    assert contract_fingerprint(make_contract(max_string_length=32)) != fingerprint
+
+
+def test_contract_hash_ignores_version():
+    contract = make_contract()
+    digest = contract_hash(contract)
+    fingerprint = contract_fingerprint(contract)
+    assert len(digest) == 16
+    with patch('hardsync.__version__', '0.0.0-other'):
+        assert contract_hash(contract) == digest
+        assert contract_fingerprint(contract) != fingerprint
+    assert contract_hash(make_contract(response_type=int)) != digest
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = Manifest(fingerprint='abc', files={'client.py': content_digest('hi')}, main_files=['application.py'])
+    save_manifest(tmp_path, manifest)
+    assert load_manifest(tmp_path) == manifest
+
+
+def test_load_manifest_missing_or_corrupt(tmp_path):
+    assert load_manifest(tmp_path) is None
+    with open(tmp_path / MANIFEST_FILENAME, 'w') as file:
+        file.write('{not json')
+    assert load_manifest(tmp_path) is None
+
+
+def test_is_up_to_date(tmp_path):
+    with open(tmp_path / 'client.py', 'w') as file:
+        file.write('hi')
+    manifest = Manifest(fingerprint='abc', files={'client.py': content_digest('hi')}, main_files=[])
+    assert is_up_to_date(tmp_path, manifest=manifest, fingerprint='abc')
+    assert not is_up_to_date(tmp_path, manifest=manifest, fingerprint='def')
+    assert not is_up_to_date(tmp_path, manifest=None, fingerprint='abc')
+
+    with open(tmp_path / 'client.py', 'w') as file:
+        file.write('edited')
+    assert not is_up_to_date(tmp_path, manifest=manifest, fingerprint='abc')
+
+
+def test_is_up_to_date_missing_main_file(tmp_path):
+    manifest = Manifest(fingerprint='abc', files={}, main_files=['application.py'])
+    assert not is_up_to_date(tmp_path, manifest=manifest, fingerprint='abc')
@@ -1,7 +1,11 @@
-from hardsync.encodings import AsciiEncoding
-from hardsync.interfaces import Exchange
+from hardsync.encodings import AsciiEncoding, BinaryEncoding, MessageKind, cobs_encode, cobs_decode, ascii_codec
+from hardsync.types import FieldNotFoundError, Array
+from hardsync import encodings
+from hardsync.dynamics import stream_stop_exchange, stream_start_exchange
+import pytest
+from hardsync.interfaces import Exchange, ContractError
 from hardsync.types import DecodedExchange
-from dataclasses import dataclass, fields
+from dataclasses import dataclass
 from hardsync.defaults import Ping
 
 
@@ -16,28 +20,29 @@ class MeasureVoltage(Exchange):
         voltage: float
 
 
-class Ping(Exchange):
+class Configure(Exchange):
+    exchange_id = 3
+
     @dataclass
     class Request:
-        pass
+        label: str
+        gain: float
 
     @dataclass
     class Response:
-        pass
+        ok: bool
 
 
-def test_arg_string():
-    input_string = 'SomethingResponse(arg1=hi,arg2=4)'
-    desired = 'arg1=hi,arg2=4'
-    actual = AsciiEncoding._arg_string(input_string)
-    assert actual == desired
+class Ping(Exchange):
+    exchange_id = 0
 
+    @dataclass
+    class Request:
+        pass
 
-def test_encode_args():
-    values = {'arg1': 4, 'arg2': 'hello'}
-    desired = 'arg1=4,arg2=hello'
-    actual = AsciiEncoding._encode_args(exchange=MeasureVoltage, values=values)
-    assert actual == desired
+    @dataclass
+    class Response:
+        pass
 
 
 def test_encode_full():
@@ -47,43 +52,234 @@ def test_encode_full():
     assert actual == desired
 
 
-def test_decode_name():
-    to_decode = 'MeasureVoltageRequest(channel=4,integration_time=0.5)'
-    desired = 'MeasureVoltageRequest'
-    actual = AsciiEncoding._decode_name(contents=to_decode)
+def test_decode():
+    to_decode = b'MeasureVoltageRequest(channel=4,integration_time=0.5)\n'
+    desired = DecodedExchange(name='MeasureVoltageRequest', values={'channel': 4, 'integration_time': 0.5})
+    actual = AsciiEncoding.decode(contents=to_decode, exchange=MeasureVoltage)
     assert actual == desired
 
 
-def test_decode_args():
-    to_decode = 'MeasureVoltageRequest(channel=4,integration_time=0.5)'
-    desired = {'channel': 4, 'integration_time': 0.5}
-    actual = AsciiEncoding._decode_args(contents=to_decode, exchange=MeasureVoltage)
+def test_decode_ping_response():
+    to_decode = b'PingResponse()\n'
+    desired = DecodedExchange(name='PingResponse', values={})
+    actual = AsciiEncoding.decode(exchange=Ping, contents=to_decode)
     assert actual == desired
 
 
-def test_decode_args_none():
-    to_decode = 'PingRequest()'
-    desired = {}
-    actual = AsciiEncoding._decode_args(contents=to_decode, exchange=Ping)
+def test_ascii_codec_cached():
+    codec = ascii_codec(encoding=AsciiEncoding, exchange=MeasureVoltage)
+    assert ascii_codec(encoding=AsciiEncoding, exchange=MeasureVoltage) is codec
+
+
+def test_encode_declaration_order():
+    values = {'channel': 4, 'integration_time': 0.5}
+    desired = b'MeasureVoltageRequest(channel=4,integration_time=0.5)\n'
+    assert AsciiEncoding.encode(exchange=MeasureVoltage, values=values, is_request=True) == desired
+    reordered = {'integration_time': 0.5, 'channel': 4}
+    assert AsciiEncoding.encode(exchange=MeasureVoltage, values=reordered, is_request=True) == desired
+
+def test_decode_bool():
+    assert AsciiEncoding.decode(exchange=Configure, contents=b'ConfigureResponse(ok=0)\n').values == {'ok': False}
+    assert AsciiEncoding.decode(exchange=Configure, contents=b'ConfigureResponse(ok=True)\n').values == {'ok': True}
+
+
+def test_decode_error_response():
+    to_decode = b'ErrorResponse(msg=Unidentified command: FooRequest)\n'
+    desired = DecodedExchange(name='ErrorResponse', values={'msg': 'Unidentified command: FooRequest'})
+    actual = AsciiEncoding.decode(exchange=MeasureVoltage, contents=to_decode)
     assert actual == desired
 
 
-def test_decode():
-    to_decode = b'MeasureVoltageRequest(channel=4,integration_time=0.5)\n'
-    desired = DecodedExchange(name='MeasureVoltageRequest', values={'channel': 4, 'integration_time': 0.5})
-    actual = AsciiEncoding.decode(contents=to_decode, exchange=MeasureVoltage)
+def test_decode_unknown_field():
+    with pytest.raises(FieldNotFoundError):
+        AsciiEncoding.decode(exchange=MeasureVoltage, contents=b'MeasureVoltageResponse(current=4)\n')
+
+def test_cobs_encode():
+    assert cobs_encode(b'\x11\x22\x00\x33') == b'\x03\x11\x22\x02\x33'
+    assert cobs_encode(b'\x00') == b'\x01\x01'
+
+
+@pytest.mark.parametrize('data', [b'', b'\x00\x00', bytes(range(1, 255)), bytes(range(256)) * 3, b'\x01' * 254 + b'\x00'])
+def test_cobs_round_trip(data):
+    encoded = cobs_encode(data)
+    assert b'\x00' not in encoded
+    assert cobs_decode(encoded) == data
+
+
+def test_binary_encode():
+    desired = cobs_encode(b'\x03\x00\x02hi\x00\x00\x00\x40') + b'\x00'
+    actual = BinaryEncoding.encode(exchange=Configure, values={'label': 'hi', 'gain': 2.0}, is_request=True)
     assert actual == desired
 
 
-def test_lookup_field_type():
-    available_fields = fields(MeasureVoltage.Request)
-    desired = float
-    actual = AsciiEncoding._lookup_field_type(name='integration_time', available_fields=available_fields)
-    assert desired is actual
+def test_binary_round_trip():
+    contents = BinaryEncoding.encode(exchange=Configure, values={'ok': True}, is_request=False)
+    desired = DecodedExchange(name='ConfigureResponse', values={'ok': True})
+    actual = BinaryEncoding.decode(exchange=Configure, contents=contents)
+    assert actual == desired
 
 
-def test_decode_ping_response():
-    to_decode = b'PingResponse()\n'
-    desired = DecodedExchange(name='PingResponse', values={})
-    actual = AsciiEncoding.decode(exchange=Ping, contents=to_decode)
+def test_binary_decode_error_response():
+    contents = cobs_encode(bytes((0, MessageKind.ERROR_RESPONSE, 4)) + b'oops') + b'\x00'
+    desired = DecodedExchange(name='ErrorResponse', values={'msg': 'oops'})
+    actual = BinaryEncoding.decode(exchange=Configure, contents=contents)
     assert actual == desired
+
+
+def test_binary_decode_wrong_exchange():
+    contents = BinaryEncoding.encode(exchange=Ping, values={}, is_request=False)
+    with pytest.raises(ValueError):
+        BinaryEncoding.decode(exchange=Configure, contents=contents)
+
+
+def test_binary_decode_stop_response():
+    contents = BinaryEncoding.encode(exchange=stream_stop_exchange(Configure), values={}, is_request=False)
+    desired = DecodedExchange(name='ConfigureStopResponse', values={})
+    assert BinaryEncoding.decode(exchange=Configure, contents=contents) == desired
+    assert BinaryEncoding.decode(exchange=stream_stop_exchange(Configure), contents=contents) == desired
+
+
+def test_stream_decoder_chunks():
+    decoder = AsciiEncoding.stream_decoder(exchange=MeasureVoltage)
+    contents = b'MeasureVoltageResponse(voltage=1.5)\nMeasureVoltageResponse(voltage=2.5)\nMeasureVol'
+    assert [d.values['voltage'] for d in decoder.feed(memoryview(contents))] == [1.5, 2.5]
+    assert decoder.pending == len(b'MeasureVol')
+    assert decoder.feed(b'tageResponse(voltage=3.5)\n') == [
+        DecodedExchange(name='MeasureVoltageResponse', values={'voltage': 3.5})
+    ]
+    assert decoder.pending == 0
+
+
+def test_stream_decoder_byte_at_a_time():
+    decoder = BinaryEncoding.stream_decoder(exchange=Configure)
+    contents = BinaryEncoding.encode(exchange=Configure, values={'ok': False}, is_request=False) * 3
+    decoded = [d for byte in contents for d in decoder.feed(bytes((byte,)))]
+    assert decoded == [DecodedExchange(name='ConfigureResponse', values={'ok': False})] * 3
+
+
+def test_stream_decoder_discards_garbage():
+    decoder = AsciiEncoding.stream_decoder(exchange=MeasureVoltage)
+    decoded = decoder.feed(b'garbage\nMeasureVoltageResponse(voltage=1.5)\n')
+    assert decoded == [DecodedExchange(name='MeasureVoltageResponse', values={'voltage': 1.5})]
+    assert decoder.discarded == 1
+
+
+def test_stream_decoder_unframed_overflow():
+    decoder = AsciiEncoding.stream_decoder(exchange=MeasureVoltage)
+    decoder.max_buffer_size = 8
+    assert decoder.feed(b'x' * 9) == []
+    assert decoder.pending == 0
+    assert decoder.discarded == 1
+
+
+class CaptureWaveform(Exchange):
+    exchange_id = 5
+
+    @dataclass
+    class Request:
+        mask: Array[bool, 4]
+
+    @dataclass
+    class Response:
+        samples: Array[float, 8]
+        counts: Array[int, 2]
+
+
+def test_ascii_array_round_trip():
+    np = pytest.importorskip('numpy')
+    values = {'samples': np.array([0.5, 1.25, -2.0]), 'counts': [3, 4]}
+    contents = AsciiEncoding.encode(exchange=CaptureWaveform, values=values, is_request=False)
+    assert contents == b'CaptureWaveformResponse(samples=0.5 1.25 -2.0,counts=3 4)\n'
+    decoded = AsciiEncoding.decode(exchange=CaptureWaveform, contents=contents)
+    assert isinstance(decoded.values['samples'], np.ndarray)
+    assert decoded.values['samples'].tolist() == [0.5, 1.25, -2.0]
+    assert decoded.values['counts'].tolist() == [3, 4]
+
+
+def test_ascii_bool_array():
+    contents = AsciiEncoding.encode(exchange=CaptureWaveform, values={'mask': [True, False]}, is_request=True)
+    assert contents == b'CaptureWaveformRequest(mask=1 0)\n'
+    assert list(AsciiEncoding.decode(exchange=CaptureWaveform, contents=contents).values['mask']) == [True, False]
+
+
+def test_ascii_array_without_numpy(monkeypatch):
+    class Waveform(Exchange):
+        @dataclass
+        class Request:
+            pass
+
+        @dataclass
+        class Response:
+            samples: Array[float, 8]
+
+    monkeypatch.setattr(encodings, 'np', None)
+    decoded = AsciiEncoding.decode(exchange=Waveform, contents=b'WaveformResponse(samples=0.5 1.5)\n')
+    assert decoded.values == {'samples': [0.5, 1.5]}
+
+
+def test_array_too_long():
+    with pytest.raises(ValueError):
+        AsciiEncoding.encode(exchange=CaptureWaveform, values={'mask': [True] * 5}, is_request=True)
+    with pytest.raises(ValueError):
+        BinaryEncoding.encode(exchange=CaptureWaveform, values={'mask': [True] * 5}, is_request=True)
+
+
+def test_binary_array_round_trip():
+    np = pytest.importorskip('numpy')
+    values = {'samples': [0.5, 1.25, -2.0], 'counts': np.array([3, 4])}
+    contents = BinaryEncoding.encode(exchange=CaptureWaveform, values=values, is_request=False)
+    message = cobs_decode(contents[:-1])
+    assert message[2:4] == b'\x03\x00'
+    assert len(message) == 2 + 2 + 3 * 4 + 2 + 2 * 4
+    decoded = BinaryEncoding.decode(exchange=CaptureWaveform, contents=contents)
+    assert decoded.values['samples'].dtype == np.float32
+    assert decoded.values['samples'].tolist() == [0.5, 1.25, -2.0]
+    assert decoded.values['counts'].tolist() == [3, 4]
+
+
+def test_binary_array_without_numpy(monkeypatch):
+    monkeypatch.setattr(encodings, 'np', None)
+    contents = BinaryEncoding.encode(exchange=CaptureWaveform, values={'samples': [0.5], 'counts': []}, is_request=False)
+    assert BinaryEncoding.decode(exchange=CaptureWaveform, contents=contents).values == {'samples': [0.5], 'counts': []}
+
+
+def test_binary_array_truncated():
+    message = bytes((CaptureWaveform.exchange_id, MessageKind.RESPONSE)) + b'\x05\x00' + b'\x01' * 4
+    with pytest.raises(ValueError):
+        BinaryEncoding.decode(exchange=CaptureWaveform, contents=cobs_encode(message) + b'\x00')
+
+
+class NumericAsciiEncoding(AsciiEncoding):
+    numeric_opcodes = True
+
+
+def test_ascii_numeric_opcode_request():
+    contents = NumericAsciiEncoding.encode(exchange=Configure, values={'label': 'a', 'gain': 2.0}, is_request=True)
+    assert contents == b'#3(label=a,gain=2.0)\n'
+    # Responses are still named, so they decode the same as with name-based requests
+    response = NumericAsciiEncoding.encode(exchange=Configure, values={'ok': True}, is_request=False)
+    assert response == b'ConfigureResponse(ok=True)\n'
+
+
+def test_ascii_numeric_opcode_stream_control():
+    class SampleVoltage(Exchange):
+        exchange_id = 7
+        streaming = True
+
+        @dataclass
+        class Request:
+            channel: int
+
+        @dataclass
+        class Response:
+            voltage: float
+
+    start = NumericAsciiEncoding.encode(exchange=stream_start_exchange(SampleVoltage), values={'period_us': 10, 'channel': 1})
+    stop = NumericAsciiEncoding.encode(exchange=stream_stop_exchange(SampleVoltage), values={})
+    assert start == b'#7.2(period_us=10,channel=1)\n'
+    assert stop == b'#7.4()\n'
+
+
+def test_ascii_numeric_opcode_requires_id():
+    with pytest.raises(ContractError):
+        NumericAsciiEncoding.encode(exchange=MeasureVoltage, values={'channel': 1, 'integration_time': 0.5})
@@ -8,6 +8,7 @@ from hardsync.transpiler import (
     populate_template,
     transpile_template,
     transpile,
+    compile_rules,
     TARGETS,
     Targets,
     verify_template,
@@ -198,3 +199,24 @@ def test_verify_template_missing_replacement():
         verify_template(template=template, replacements=replacements)
 
 
+def test_compile_rules_cached():
+    mapping = TARGETS[Targets.ARDUINO]
+    assert compile_rules(mapping) is compile_rules(dict(mapping))
+
+
+def test_transpile_many_matches():
+    original_text = 'std::string a = b.substr(1, 2);\n' * 1000
+    desired = 'String a = b.substring(1, 1 + 2);\n' * 1000
+    actual = transpile(template_mapping=TARGETS[Targets.ARDUINO], input_text=original_text)
+    assert actual == desired
+
+
+def test_transpile_first_rule_wins():
+    mapping = {'.substr({{expr1}}, {{expr2}})': 'two', '.substr({{expr}})': 'one'}
+    actual = transpile(template_mapping=mapping, input_text='a.substr(1, 2) b.substr(3)')
+    assert actual == 'atwo bone'
+
+
+def test_transpile_template_undefined_variable_kept():
+    actual = transpile_template(template='f({{val}})', replacement_template='g({{val}}, {{other}})', input_text='f(1)')
+    assert actual == 'g(1, {{other}})'
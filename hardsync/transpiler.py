@@ -9,8 +9,9 @@ TODO: Figure out when exactly to throw errors in transpilation.
 from dataclasses import fields
 from hardsync.interfaces import Exchange, TypeMapping
 import inspect
-from typing import Mapping, Dict, List, Sequence, Type
+from typing import Mapping, Dict, List, Sequence, Tuple, Type
 from types import ModuleType
+from functools import lru_cache
 import re
 import enum
 
@@ -49,7 +50,8 @@ EXPRESSION_REGEX_LITERAL = EXPRESSION_REGEX.replace('\\', '\\\\')
 SOFTTAB = "    "
 
 
-def template_to_regex(template: str):
+def template_to_regex(template: str, group_prefix: str = ''):
+    # group_prefix keeps group names unique when the regexes of several templates are combined
     pattern = r'{{(?P<name>' + EXPRESSION_REGEX + r')}}'
     matches = re.finditer(pattern=pattern, string=template)
     new_string = template
@@ -61,7 +63,7 @@ def template_to_regex(template: str):
 
     for match in matches:
         name = match.group('name')
-        new_regex = r'(?P<' + name + r'>' + EXPRESSION_REGEX_LITERAL + r')'
+        new_regex = r'(?P<' + group_prefix + name + r'>' + EXPRESSION_REGEX_LITERAL + r')'
         new_string = re.sub(pattern=pattern, repl=new_regex, string=new_string, count=1)
 
     return new_string
@@ -100,23 +102,67 @@ def verify_template(template: str, replacements: Mapping[str, str]):
             f'Error: replacements missing variables {not_in_replacements} which is in replacements')
 
 
-def transpile_template(template: str, replacement_template: str, input_text: str) -> Dict[str, str]:
-    regex = template_to_regex(template)
-    matches = re.finditer(pattern=regex, string=input_text)
-    var_names = var_names_from_template(template)
-
-    modified_text = input_text
-    for match in reversed(list(matches)): # Reverse the list so we are mutating the string from the end
-        replacements = {var: match.group(var) for var in var_names}
-        replacement_string = populate_template(replacement_template, replacements=replacements)
-        modified_text = modified_text[0:match.start()] + replacement_string + modified_text[match.end():]
-
-    return modified_text
+class CompiledRule:
+    def __init__(self, template: str, replacement_template: str, group_prefix: str):
+        self.regex = template_to_regex(template, group_prefix=group_prefix)
+        var_names = set(var_names_from_template(template))
+        # Alternating literal text and variable names. Variables the template does not define are kept verbatim.
+        pieces = re.split(r'{{(\w+)}}', replacement_template)
+        self.segments: List[Tuple[bool, str]] = []
+        for index, piece in enumerate(pieces):
+            is_variable = index % 2 == 1
+            if is_variable and piece not in var_names:
+                is_variable, piece = False, '{{' + piece + '}}'
+            self.segments.append((is_variable, group_prefix + piece if is_variable else piece))
+
+    def render(self, match: re.Match) -> str:
+        return ''.join([match.group(piece) if is_variable else piece for is_variable, piece in self.segments])
+
+
+class CompiledRules:
+    """
+    A rule set combined into one regex, so that transpiling is a single scan of the input whose output is joined
+    once, rather than a pass per rule that splices the text at every match. Where rules could match at the same
+    place, the first one wins, as it does when the rules are applied one after another.
+    """
+    def __init__(self, rules: Tuple[Tuple[str, str], ...]):
+        self.rules: Dict[str, CompiledRule] = {}
+        alternatives = []
+        for index, (template, replacement_template) in enumerate(rules):
+            name = f'rule{index}'
+            rule = CompiledRule(template, replacement_template, group_prefix=name + '_')
+            self.rules[name] = rule
+            alternatives.append(f'(?P<{name}>{rule.regex})')
+        self.pattern = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def transpile(self, input_text: str) -> str:
+        if self.pattern is None:
+            return input_text
+
+        parts = []
+        position = 0
+        for match in self.pattern.finditer(input_text):
+            # The rule's own group encloses all its variables, so it is always the last group to close
+            rule = self.rules[match.lastgroup]
+            parts.append(input_text[position:match.start()])
+            parts.append(rule.render(match))
+            position = match.end()
+        parts.append(input_text[position:])
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def _compile_rules(rules: Tuple[Tuple[str, str], ...]) -> CompiledRules:
+    return CompiledRules(rules)
+
+
+def compile_rules(template_mapping: Mapping[str, str]) -> CompiledRules:
+    return _compile_rules(tuple(template_mapping.items()))
+
+
+def transpile_template(template: str, replacement_template: str, input_text: str) -> str:
+    return compile_rules({template: replacement_template}).transpile(input_text)
 
 
 def transpile(input_text: str, template_mapping: Mapping[str, str]) -> str:
-    modified_text = input_text
-    for template, replacement_template in template_mapping.items():
-        modified_text = transpile_template(template=template, replacement_template=replacement_template, input_text=modified_text)
-    return modified_text
-
+    return compile_rules(template_mapping).transpile(input_text)
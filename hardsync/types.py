@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import enum
-from typing import Dict, NamedTuple, Literal, Protocol
+import inspect
+from functools import lru_cache
+from typing import Dict, NamedTuple, Literal, Protocol, Tuple
 
 
 class FieldNotFoundError(Exception):
@@ -25,6 +27,33 @@ class DecodedExchange(NamedTuple):
     values: ResponseValues
 
 
+class Array:
+    """
+    Array field with a fixed capacity, declared in a contract as e.g. samples: Array[float, 64]. The capacity sizes
+    the buffers in the generated firmware; fewer elements may be sent. Decoded values are numpy arrays when numpy is
+    installed, and lists otherwise.
+    """
+    element_type: type = None
+    max_length: int = 0
+
+    def __class_getitem__(cls, item: Tuple[type, int]) -> type:
+        element_type, max_length = item
+        return _array_type(element_type, max_length)
+
+
+@lru_cache(maxsize=None)
+def _array_type(element_type: type, max_length: int) -> type:
+    # Cached so that equal declarations give the identical class, which can then key type mappings and codecs
+    if not isinstance(max_length, int) or max_length < 1:
+        raise TypeError(f'Array max_length must be a positive integer, got {max_length}')
+    name = f'Array[{element_type.__name__}, {max_length}]'
+    return type(name, (Array,), {'element_type': element_type, 'max_length': max_length})
+
+
+def is_array_type(field_type) -> bool:
+    return inspect.isclass(field_type) and issubclass(field_type, Array) and field_type is not Array
+
+
 class PopulatedFile(NamedTuple):
     filename: str
     content: str